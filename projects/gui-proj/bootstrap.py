@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import threading
+
+from kafka import TopicPartition
+
+from constants import BATCH_MAX_RECORDS, BOOTSTRAP_PROGRESS_INTERVAL_S, POLL_TIMEOUT_MS
+from ingest import tombstone_id
+from ordering import EventOrdering
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionLoader(threading.Thread):
+    """
+    Read one partition from a start offset up to a fixed end offset.
+
+    The loader owns its consumer, which is only used from its thread.
+    Events are validated and folded as they are read, so only the
+    latest event of each shipment is kept, together with its offset.
+    A tombstone is kept as a None event, so that a shipment deleted
+    after a snapshot is removed from the store.
+
+    Parameters
+    ----------
+    make_consumer : callable
+        Returns a new consumer that is neither subscribed nor assigned.
+    partition : TopicPartition
+        The partition to read.
+    start : int or None
+        The first offset to read, or None for the beginning.
+    end : int
+        The end offset of the partition when loading started.
+    is_valid : callable
+        Returns True for events that may be applied to the store.
+    poll_timeout_ms : int, optional
+        How long a single poll waits for records.
+    max_records : int, optional
+        Maximum number of records returned by one poll.
+    """
+
+    def __init__(
+        self,
+        make_consumer,
+        partition,
+        start,
+        end,
+        is_valid,
+        poll_timeout_ms=POLL_TIMEOUT_MS,
+        max_records=BATCH_MAX_RECORDS,
+    ):
+        super().__init__(name=f"shipment-bootstrap-{partition.partition}", daemon=True)
+        self.make_consumer = make_consumer
+        self.partition = partition
+        self.start_offset = start
+        self.end = end
+        self.is_valid = is_valid
+        self.poll_timeout_ms = poll_timeout_ms
+        self.max_records = max_records
+        self.position = start
+        self.latest = {}
+        self.invalid = 0
+        self.ordering = EventOrdering()
+        self.error = None
+        self._stopping = threading.Event()
+
+    @property
+    def loaded(self):
+        """int: Number of offsets read so far."""
+        if self.start_offset is None or self.position is None:
+            return 0
+        return max(0, self.position - self.start_offset)
+
+    @property
+    def total(self):
+        """int: Number of offsets to read, once the start is known."""
+        if self.start_offset is None:
+            return 0
+        return max(0, self.end - self.start_offset)
+
+    def run(self):
+        """Read the partition, keeping any exception in ``error``."""
+        try:
+            consumer = self.make_consumer()
+            try:
+                self._load(consumer)
+            finally:
+                consumer.close()
+        except Exception as e:
+            logger.exception("Loading %s failed", self.partition)
+            self.error = e
+
+    def stop(self):
+        """Ask the thread to stop after its current poll."""
+        self._stopping.set()
+
+    def _load(self, consumer):
+        consumer.assign([self.partition])
+        if self.start_offset is None:
+            consumer.seek_to_beginning(self.partition)
+        else:
+            consumer.seek(self.partition, self.start_offset)
+        self.position = consumer.position(self.partition)
+        if self.start_offset is None:
+            self.start_offset = self.position
+
+        while self.position < self.end and not self._stopping.is_set():
+            records = consumer.poll(
+                timeout_ms=self.poll_timeout_ms, max_records=self.max_records
+            )
+            for messages in records.values():
+                for message in messages:
+                    self._fold(message)
+            # Compaction leaves gaps, so ask for the position instead of
+            # counting records
+            self.position = consumer.position(self.partition)
+
+    def _fold(self, message):
+        event = message.value
+        if event is None:
+            shipment_id = tombstone_id(message)
+            if shipment_id is None:
+                self.invalid += 1
+            else:
+                self.ordering.forget(shipment_id)
+                self.latest[shipment_id] = (None, message.offset)
+        elif not self.is_valid(event):
+            self.invalid += 1
+        elif self.ordering.accept(event, message.partition, message.offset):
+            self.latest[event["shipment_id"]] = (event, message.offset)
+
+
+def end_offsets(make_consumer, topic):
+    """
+    Look up the partitions of a topic and their current end offsets.
+
+    Parameters
+    ----------
+    make_consumer : callable
+        Returns a new consumer that is neither subscribed nor assigned.
+    topic : str
+        The topic to look up.
+
+    Returns
+    -------
+    dict of TopicPartition to int
+        The offset after the last record of each partition.
+    """
+    consumer = make_consumer()
+    try:
+        partitions = [
+            TopicPartition(topic, partition)
+            for partition in sorted(consumer.partitions_for_topic(topic) or ())
+        ]
+        return consumer.end_offsets(partitions) if partitions else {}
+    finally:
+        consumer.close()
+
+
+async def bootstrap_partitions(
+    make_consumer,
+    topic,
+    offsets,
+    is_valid,
+    ordering,
+    on_progress=None,
+    progress_interval_s=BOOTSTRAP_PROGRESS_INTERVAL_S,
+):
+    """
+    Catch up on a compacted topic by reading all partitions in parallel.
+
+    Every partition is read by its own `PartitionLoader`, from its
+    stored offset, or the beginning, up to the end offset it had when
+    loading started. The event loop only waits and reports progress
+    while the loaders run. The latest events of all partitions are then
+    merged through ``ordering``, in one pass.
+
+    Parameters
+    ----------
+    make_consumer : callable
+        Returns a new consumer that is neither subscribed nor assigned.
+    topic : str
+        The compacted topic to load.
+    offsets : dict
+        The next offset to read, keyed by topic and partition, e.g.
+        from a snapshot. Missing partitions are read from the beginning.
+    is_valid : callable
+        Returns True for events that may be applied to the store.
+    ordering : EventOrdering
+        Decides between events of a shipment, and records the versions
+        that live tailing continues from.
+    on_progress : callable, optional
+        Called with the fraction of offsets read, between 0 and 1.
+    progress_interval_s : float, optional
+        How often progress is reported, in seconds.
+
+    Returns
+    -------
+    tuple of (dict, dict)
+        The latest valid event per shipment ID, or None for deleted
+        shipments, and the offset each partition was read up to, keyed
+        by topic and partition.
+
+    Raises
+    ------
+    Exception
+        The first exception raised by any of the loaders.
+    """
+    ends = await asyncio.to_thread(end_offsets, make_consumer, topic)
+    loaders = [
+        PartitionLoader(
+            make_consumer,
+            partition,
+            offsets.get((partition.topic, partition.partition)),
+            end,
+            is_valid,
+        )
+        for partition, end in ends.items()
+    ]
+    for loader in loaders:
+        loader.start()
+    try:
+        while any(loader.is_alive() for loader in loaders):
+            if on_progress is not None:
+                total = sum(loader.total for loader in loaders)
+                loaded = sum(loader.loaded for loader in loaders)
+                on_progress(loaded / total if total else 0.0)
+            await asyncio.sleep(progress_interval_s)
+    finally:
+        for loader in loaders:
+            loader.stop()
+        for loader in loaders:
+            await asyncio.to_thread(loader.join)
+    for loader in loaders:
+        if loader.error is not None:
+            raise loader.error
+
+    updates = {}
+    positions = {}
+    invalid = 0
+    for loader in loaders:
+        partition = loader.partition
+        if loader.position is not None:
+            positions[(partition.topic, partition.partition)] = loader.position
+        invalid += loader.invalid
+        for reason, count in loader.ordering.dropped.items():
+            ordering.dropped[reason] += count
+        for shipment_id, (event, offset) in loader.latest.items():
+            if event is None:
+                ordering.forget(shipment_id)
+                updates[shipment_id] = None
+            elif ordering.accept(event, partition.partition, offset):
+                updates[shipment_id] = event
+    if on_progress is not None:
+        on_progress(1.0)
+    deleted = sum(event is None for event in updates.values())
+    logger.info(
+        "Loaded %d shipments and %d deletes from %d partitions of %s, "
+        "%d invalid events",
+        len(updates) - deleted,
+        deleted,
+        len(loaders),
+        topic,
+        invalid,
+    )
+    return updates, positions
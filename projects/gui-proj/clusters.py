@@ -0,0 +1,187 @@
+import math
+from collections import defaultdict
+
+from constants import MAP_CLUSTER_CELL_DEGREES, MAP_POINT_CELL_DEGREES
+
+
+def _cell(lat, lon, size):
+    return math.floor(lat / size), math.floor(lon / size)
+
+
+def in_bounds(position, bounds):
+    """
+    Check whether a position lies within a viewport.
+
+    Parameters
+    ----------
+    position : tuple of float
+        Latitude and longitude.
+    bounds : tuple of float
+        Minimum latitude, maximum latitude, minimum longitude and
+        maximum longitude.
+
+    Returns
+    -------
+    bool
+        True if the position is inside the bounds.
+    """
+    lat, lon = position
+    lat_min, lat_max, lon_min, lon_max = bounds
+    return lat_min <= lat <= lat_max and lon_min <= lon <= lon_max
+
+
+class SpatialGrid:
+    """
+    Incrementally maintained grid index of shipment positions.
+
+    Every position is counted in one cell per cluster level, with running
+    coordinate sums per status so that cluster markers can be placed at
+    the centroid of their shipments. A finer grid of shipment IDs answers
+    viewport queries without looking at shipments outside the viewport.
+
+    Parameters
+    ----------
+    cluster_cells : tuple of float, optional
+        Cell size in degrees of each cluster level, coarsest first.
+    point_cell : float, optional
+        Cell size in degrees of the viewport index.
+    """
+
+    def __init__(
+        self,
+        cluster_cells=MAP_CLUSTER_CELL_DEGREES,
+        point_cell=MAP_POINT_CELL_DEGREES,
+    ):
+        self.cluster_cells = cluster_cells
+        self.point_cell = point_cell
+        self.positions = {}
+        # Per level: cell -> status -> [count, lat sum, lon sum]
+        self.levels = [defaultdict(dict) for _ in cluster_cells]
+        self.cells = defaultdict(set)
+
+    def move(self, shipment_id, position, status):
+        """
+        Set or clear the position of a shipment.
+
+        Parameters
+        ----------
+        shipment_id : str
+            The shipment that moved.
+        position : tuple of float or None
+            Its latitude and longitude, or None to remove it.
+        status : str
+            Its status.
+        """
+        previous = self.positions.pop(shipment_id, None)
+        if previous is not None:
+            self._count(shipment_id, *previous, -1)
+        if position is not None:
+            self.positions[shipment_id] = (*position, status)
+            self._count(shipment_id, *position, status, 1)
+
+    def update(self, shipments, shipment_ids):
+        """
+        Re-index the positions of changed shipments.
+
+        Shipments without a finite latitude and longitude are left out.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        shipment_ids : iterable
+            IDs of shipments that were inserted, updated or removed.
+        """
+        for shipment_id in shipment_ids:
+            shipment = shipments.get(shipment_id)
+            position = None
+            if shipment is not None:
+                try:
+                    position = (
+                        float(shipment["latitude"]),
+                        float(shipment["longitude"]),
+                    )
+                except (KeyError, TypeError, ValueError):
+                    pass
+            if position is None or not all(map(math.isfinite, position)):
+                # NaN or inf would break the cells, so leave them off the map
+                self.move(shipment_id, None, None)
+            elif self.positions.get(shipment_id) != (*position, shipment["status"]):
+                self.move(shipment_id, position, shipment["status"])
+
+    def clusters(self, level, status="All"):
+        """
+        List the non-empty cells of a cluster level.
+
+        Parameters
+        ----------
+        level : int
+            Index into ``cluster_cells``.
+        status : str, optional
+            Only count shipments with this status, or "All".
+
+        Returns
+        -------
+        list of tuple
+            Centroid latitude, centroid longitude and shipment count of
+            every non-empty cell.
+        """
+        clusters = []
+        for by_status in self.levels[level].values():
+            if status == "All":
+                stats = by_status.values()
+            elif status in by_status:
+                stats = [by_status[status]]
+            else:
+                continue
+            count = sum(stat[0] for stat in stats)
+            if count:
+                lat = sum(stat[1] for stat in stats) / count
+                lon = sum(stat[2] for stat in stats) / count
+                clusters.append((lat, lon, count))
+        return clusters
+
+    def ids_in(self, bounds):
+        """
+        Find the shipments inside a viewport.
+
+        Parameters
+        ----------
+        bounds : tuple of float
+            Minimum latitude, maximum latitude, minimum longitude and
+            maximum longitude.
+
+        Returns
+        -------
+        list
+            IDs of the shipments within the bounds.
+        """
+        lat_min, lat_max, lon_min, lon_max = bounds
+        row_min, col_min = _cell(lat_min, lon_min, self.point_cell)
+        row_max, col_max = _cell(lat_max, lon_max, self.point_cell)
+        found = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                for shipment_id in self.cells.get((row, col), ()):
+                    if in_bounds(self.positions[shipment_id][:2], bounds):
+                        found.append(shipment_id)
+        return found
+
+    def _count(self, shipment_id, lat, lon, status, sign):
+        for size, level in zip(self.cluster_cells, self.levels):
+            cell = _cell(lat, lon, size)
+            stat = level[cell].setdefault(status, [0, 0.0, 0.0])
+            stat[0] += sign
+            stat[1] += sign * lat
+            stat[2] += sign * lon
+            if not stat[0]:
+                del level[cell][status]
+                if not level[cell]:
+                    del level[cell]
+        cell = _cell(lat, lon, self.point_cell)
+        if sign > 0:
+            self.cells[cell].add(shipment_id)
+        else:
+            self.cells[cell].discard(shipment_id)
+            if not self.cells[cell]:
+                del self.cells[cell]
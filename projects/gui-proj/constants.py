@@ -1,3 +1,5 @@
+from pathlib import Path
+
 STATUS_OPTIONS = ["All", "In Transit", "Out for Delivery", "Delivered"]
 """
 list of str: Status options for filtering shipments.
@@ -5,3 +7,331 @@ list of str: Status options for filtering shipments.
 This list contains the possible statuses that can be used to filter
 shipments in the UI.
 """
+
+MAX_IN_FLIGHT_BATCHES = 8
+"""
+int: Maximum number of consumed batches waiting for the event loop.
+
+When this many batches are queued, the consumer thread blocks until the
+event loop has applied one, which applies backpressure to Kafka.
+"""
+
+POLL_TIMEOUT_MS = 100
+"""
+int: How long a single consumer poll waits for records, in milliseconds.
+
+This also bounds how long the consumer thread takes to notice a stop
+request.
+"""
+
+BATCH_MAX_RECORDS = 500
+"""
+int: Maximum number of Kafka records applied to the UI as one batch.
+"""
+
+BATCH_LINGER_MS = 50
+"""
+int: How long a batch keeps filling after its first record, in milliseconds.
+
+Higher values mean fewer, larger refreshes under load at the cost of
+added latency for the first event of each batch.
+"""
+
+SHIPMENT_VIEW = "grid"
+"""
+str: How the shipment list is shown, either "grid" or "rows".
+
+"grid" is a paginated table that only sends the visible page to the
+browser; "rows" renders one label per matching shipment.
+"""
+
+GRID_ROWS_PER_PAGE = 50
+"""
+int: Number of shipments per page of the shipment grid.
+"""
+
+ID_NGRAM_SIZE = 3
+"""
+int: Length of the shipment ID substrings kept in the ID search index.
+
+Searches of this length are a single index lookup and longer searches
+intersect the index entries of their substrings of this length. Shorter
+searches scan the distinct substrings, whose number does not grow with
+the fleet. Indexing only one length keeps the index to a few entries
+per shipment.
+"""
+
+INTERNED_FIELDS = ("status", "location", "mode")
+"""
+tuple of str: Shipment fields whose strings are shared between shipments.
+
+These fields take few distinct values, so the store keeps one copy of
+each value instead of one per shipment.
+"""
+
+ETA_DESTINATION = (40.7128, -74.0060)
+"""
+tuple of float: Default latitude and longitude shipments are headed to.
+
+Used for events without ``destination_lat`` and ``destination_lon``
+(New York City).
+"""
+
+SPEED_BY_MODE_KMH = {
+    "road": 60,
+    "courier": 35,
+    "rail": 50,
+    "ocean": 30,
+    "air": 700,
+}
+"""
+dict of str to float: Average speed of each transport mode, in km/h.
+
+The mode of a shipment is read from the ``mode`` field of its events.
+"""
+
+DEFAULT_MODE = "road"
+"""
+str: Transport mode assumed for events without a known ``mode``.
+"""
+
+ETA_PRECISE = False
+"""
+bool: Use ellipsoidal geodesic distances for ETAs instead of haversine.
+
+Haversine is vectorized and within about 0.5% of the geodesic distance.
+"""
+
+MAP_INITIAL_CAPACITY = 1024
+"""
+int: Number of shipment points the map arrays hold before they grow.
+"""
+
+MAP_LEVEL_OF_DETAIL = True
+"""
+bool: Show cluster markers instead of single shipments when zoomed out.
+
+When enabled, single shipments are only plotted for the part of the map
+in view once it is zoomed in to at least `MAP_POINTS_SCALE`.
+"""
+
+MAP_POINTS_SCALE = 8
+"""
+float: Map projection scale from which single shipments are plotted.
+"""
+
+MAP_CLUSTER_CELL_DEGREES = (20.0, 10.0, 5.0)
+"""
+tuple of float: Cluster cell size in degrees per zoom level, coarsest first.
+
+Zoom level ``n`` is used from projection scale ``2 ** n`` on.
+"""
+
+MAP_POINT_CELL_DEGREES = 1.0
+"""
+float: Cell size in degrees of the index used to find shipments in view.
+"""
+
+NOTIFY_INTERVAL_S = 1.0
+"""
+float: How often counted events are summarized into a toast, in seconds.
+"""
+
+NOTIFY_RATE = 1.0
+"""
+float: Summary toasts per second allowed for each notification category.
+"""
+
+NOTIFY_BURST = 3
+"""
+int: Summary toasts a notification category may show back to back.
+"""
+
+NOTIFY_DRILL_DOWN_LINES = 200
+"""
+int: Latest events kept per category for the notification details log.
+"""
+
+SHIPMENT_ENCODING = "json"
+"""
+str: Encoding of the shipment_updates topic: "json", "msgpack" or "avro".
+"""
+
+AVRO_SCHEMA_PATH = str(Path(__file__).parent / "schemas" / "shipment_update.avsc")
+"""
+str: Avro schema the shipment updates are written with, for "avro" encoding.
+"""
+
+SHIPMENT_TOPIC = "shipment_updates"
+"""
+str: Kafka topic the shipment updates are consumed from.
+"""
+
+KAFKA_BOOTSTRAP_SERVERS = "localhost:9092"
+"""
+str: Kafka brokers to connect to.
+"""
+
+SNAPSHOT_PATH = str(Path(__file__).parent / "shipments.snapshot")
+"""
+str: File the shipment store and consumer offsets are checkpointed to.
+"""
+
+SNAPSHOT_INTERVAL_S = 60.0
+"""
+float: Minimum time between two snapshots, in seconds.
+
+Restarting replays at most this much of the topic on top of the last
+snapshot.
+"""
+
+BOOTSTRAP_COMPACTED = False
+"""
+bool: Whether the shipment topic is log compacted and loaded in bulk at startup.
+
+When True, all partitions are read to their end in parallel before
+the dashboard switches to live updates; the UI is not refreshed until
+the whole topic is loaded.
+"""
+
+BOOTSTRAP_PROGRESS_INTERVAL_S = 0.25
+"""
+float: How often the loading progress is updated during bootstrap, in seconds.
+"""
+
+SHARED_VIEW_PATH = None
+"""
+str or None: SQLite file shared by an ingest worker and UI replicas.
+
+When None, the dashboard consumes Kafka itself. When set, only
+``ingest_worker.py`` consumes Kafka and writes the shipments to this
+file, and every dashboard process reads them from it, so replicas can
+be added without each one consuming the whole topic.
+"""
+
+SHARED_VIEW_POLL_S = 0.5
+"""
+float: How often UI replicas check the shared view for changes, in seconds.
+"""
+
+REFRESH_MIN_INTERVAL_S = 0.1
+"""
+float: Shortest time between two refreshes of a browser, in seconds.
+"""
+
+REFRESH_MAX_WAIT_S = 1.0
+"""
+float: Longest a change waits for its refresh under a steady stream, in seconds.
+"""
+
+REFRESH_RENDER_SHARE = 0.25
+"""
+float: Share of the time a browser's refreshes may spend rendering.
+
+The time between refreshes grows with the measured render time so that
+rendering takes at most this share of it, up to ``REFRESH_MAX_WAIT_S``.
+"""
+
+SEARCH_DEBOUNCE_S = 0.15
+"""
+float: How long typing in the search box must pause before it is searched, in seconds.
+"""
+
+SEARCH_CHUNK_SIZE = 500
+"""
+int: Shipments refined or listed at a time before yielding to the event loop.
+
+Large search results are built and streamed into the shipment list in
+chunks of this size, so typing stays responsive on a large fleet.
+"""
+
+RENDER_WORKERS = 2
+"""
+int: Threads that prepare list rows and map points for rendering.
+
+With 0, rendering is prepared on the event loop.
+"""
+
+HISTOGRAM_LOWEST_S = 1e-6
+"""
+float: Smallest latency the pipeline histograms tell apart from zero, in seconds.
+"""
+
+HISTOGRAM_HIGHEST_S = 60.0
+"""
+float: Largest latency the pipeline histograms count, in seconds.
+"""
+
+HISTOGRAM_SUB_BUCKETS = 64
+"""
+int: Resolution of the pipeline histograms, a power of two.
+
+Quantiles are accurate to within ``2 / HISTOGRAM_SUB_BUCKETS`` of their
+value.
+"""
+
+EVENT_LOG_EVERY = 1000
+"""
+int: Log one received shipment event in this many.
+
+Use 1 to log every event, which formats each one on the event loop,
+and 0 to log none.
+"""
+
+PING_MIN_INTERVAL_S = 5.0
+"""
+float: Shortest time between two applied location pings of a shipment, in seconds.
+
+Status changes and new shipments are always applied at once; pings that
+come sooner are held back and the latest one is applied when its time
+comes.
+"""
+
+PING_MIN_DISTANCE_KM = 0.05
+"""
+float: Smallest move a location ping must report to be applied, in kilometres.
+"""
+
+PING_SHED_BACKLOG = 10_000
+"""
+int: Records waiting to be applied above which location pings are shed.
+
+Beyond it the ping interval grows in proportion to the backlog, up to
+`PING_MAX_INTERVAL_S`, so that status changes keep up.
+"""
+
+PING_MAX_INTERVAL_S = 60.0
+"""
+float: Longest time between two applied location pings of a shipment, in seconds.
+"""
+
+IDLE_TICK_S = 1.0
+"""
+float: How often an empty batch is handed on while the topic is quiet, in seconds.
+
+Held-back location pings are released when a batch is applied, so the
+empty batches let them through when no records arrive.
+"""
+
+HISTORY_POINTS = 16
+"""
+int: Recent positions and statuses kept per shipment for trails and replay.
+"""
+
+HISTORY_WINDOW_S = 3600.0
+"""
+float: How far back the shipment history reaches, in seconds.
+
+Entries older than this before the newest event are dropped, and so are
+shipments without newer entries.
+"""
+
+HISTORY_INITIAL_CAPACITY = 1024
+"""
+int: Initial number of shipments the history has room for; it doubles when full.
+"""
+
+HISTORY_MAX_TRAILS = 500
+"""
+int: Most shipment trails drawn on a map, the most recently updated first.
+"""
@@ -0,0 +1,297 @@
+import dataclasses
+import io
+import json
+
+try:
+    import msgspec
+except ImportError:  # Falls back to building a dict per event
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from constants import AVRO_SCHEMA_PATH, SHIPMENT_ENCODING
+
+REQUIRED_FIELDS = frozenset({"shipment_id", "status", "location", "timestamp"})
+"""
+frozenset of str: Fields every shipment event must have.
+"""
+
+
+@dataclasses.dataclass(slots=True)
+class ShipmentEvent:
+    """
+    A decoded and validated shipment update.
+
+    Events can also be read like the dicts they replace:
+    ``event["status"]``, ``event.get("mode")`` and ``"latitude" in event``
+    all work, with fields that are None counting as missing.
+    """
+
+    shipment_id: str | int
+    status: str
+    location: str
+    timestamp: str
+    latitude: float | None = None
+    longitude: float | None = None
+    destination_lat: float | None = None
+    destination_lon: float | None = None
+    mode: str | None = None
+    eta_hours: float | None = None
+
+    def __getitem__(self, field):
+        try:
+            value = getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __setitem__(self, field, value):
+        setattr(self, field, value)
+
+    def __contains__(self, field):
+        return getattr(self, field, None) is not None
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build an event from a decoded dict.
+
+        Coordinates that are not finite or out of range are rejected.
+
+        Parameters
+        ----------
+        data : dict
+            The decoded payload.
+
+        Returns
+        -------
+        ShipmentEvent or InvalidShipment
+            The event, or the reason it was rejected.
+        """
+        if not isinstance(data, dict):
+            return InvalidShipment("payload is not an object", data)
+        missing = REQUIRED_FIELDS.difference(data)
+        if missing:
+            return InvalidShipment(f"missing {', '.join(sorted(missing))}", data)
+        try:
+            event = cls(
+                **{
+                    field: _coerce(field, data[field])
+                    for field in _FIELDS
+                    if data.get(field) is not None
+                }
+            )
+        except (TypeError, ValueError) as e:
+            return InvalidShipment(str(e), data)
+        return _check_coordinates(event, data)
+
+
+_FIELDS = tuple(field.name for field in dataclasses.fields(ShipmentEvent))
+_FLOAT_FIELDS = frozenset(
+    {"latitude", "longitude", "destination_lat", "destination_lon", "eta_hours"}
+)
+
+
+_COORDINATE_LIMITS = (
+    ("latitude", 90.0),
+    ("longitude", 180.0),
+    ("destination_lat", 90.0),
+    ("destination_lon", 180.0),
+)
+
+
+def _coerce(field, value):
+    return float(value) if field in _FLOAT_FIELDS else value
+
+
+def _check_coordinates(event, payload):
+    # NaN fails the comparison too, so only finite coordinates pass
+    for field, limit in _COORDINATE_LIMITS:
+        value = getattr(event, field)
+        if value is not None and not -limit <= value <= limit:
+            return InvalidShipment(f"{field} out of range: {value}", payload)
+    return event
+
+
+@dataclasses.dataclass(slots=True)
+class InvalidShipment:
+    """
+    A payload that could not be decoded into a `ShipmentEvent`.
+
+    Parameters
+    ----------
+    reason : str
+        Why the payload was rejected.
+    payload : object
+        The raw or partially decoded payload.
+    """
+
+    reason: str
+    payload: object
+
+    def __str__(self):
+        payload = self.payload
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            payload = bytes(payload[:200])
+        return f"{self.reason}: {payload!r}"
+
+
+class JsonDecoder:
+    """
+    Decode JSON payloads into `ShipmentEvent`.
+
+    With msgspec installed, payloads are decoded and validated straight
+    into events without an intermediate dict, and numeric strings are
+    accepted for coordinates. Otherwise orjson, or the standard library,
+    decodes a dict that is then validated. Either way, coordinates that
+    are not finite or out of range are rejected.
+    """
+
+    def __init__(self):
+        if msgspec is not None:
+            self._decoder = msgspec.json.Decoder(ShipmentEvent, strict=False)
+
+    def __call__(self, payload):
+        """
+        Decode one payload.
+
+        Parameters
+        ----------
+        payload : bytes, bytearray, memoryview or None
+            The Kafka record value; memoryviews are not copied.
+
+        Returns
+        -------
+        ShipmentEvent, InvalidShipment or None
+            The event, the reason it was rejected, or None for a
+            tombstone.
+        """
+        if payload is None:
+            return None  # A tombstone, which deletes the shipment of its key
+        if msgspec is not None:
+            try:
+                event = self._decoder.decode(payload)
+            except msgspec.DecodeError as e:
+                return InvalidShipment(str(e), payload)
+            return _check_coordinates(event, payload)
+        try:
+            if orjson is not None:
+                data = orjson.loads(payload)
+            else:
+                data = json.loads(bytes(payload))
+        except ValueError as e:
+            return InvalidShipment(str(e), payload)
+        return ShipmentEvent.from_dict(data)
+
+
+class MsgPackDecoder:
+    """
+    Decode MessagePack payloads into `ShipmentEvent`.
+
+    Requires msgspec. Fields are validated while decoding, and
+    coordinates that are not finite or out of range are rejected.
+    """
+
+    def __init__(self):
+        if msgspec is None:
+            raise ImportError("MessagePack decoding requires msgspec")
+        self._decoder = msgspec.msgpack.Decoder(ShipmentEvent, strict=False)
+
+    def __call__(self, payload):
+        """
+        Decode one payload.
+
+        Parameters
+        ----------
+        payload : bytes, bytearray, memoryview or None
+            The Kafka record value; memoryviews are not copied.
+
+        Returns
+        -------
+        ShipmentEvent, InvalidShipment or None
+            The event, the reason it was rejected, or None for a
+            tombstone.
+        """
+        if payload is None:
+            return None  # A tombstone, which deletes the shipment of its key
+        try:
+            event = self._decoder.decode(payload)
+        except msgspec.DecodeError as e:
+            return InvalidShipment(str(e), payload)
+        return _check_coordinates(event, payload)
+
+
+class AvroDecoder:
+    """
+    Decode schemaless Avro payloads into `ShipmentEvent`.
+
+    Requires fastavro.
+
+    Parameters
+    ----------
+    schema_path : str, optional
+        Path of the Avro schema the payloads were written with.
+    """
+
+    def __init__(self, schema_path=AVRO_SCHEMA_PATH):
+        import fastavro
+
+        self._read = fastavro.schemaless_reader
+        self._schema = fastavro.schema.load_schema(schema_path)
+
+    def __call__(self, payload):
+        """
+        Decode one payload.
+
+        Parameters
+        ----------
+        payload : bytes, bytearray, memoryview or None
+            The Kafka record value.
+
+        Returns
+        -------
+        ShipmentEvent, InvalidShipment or None
+            The event, the reason it was rejected, or None for a
+            tombstone.
+        """
+        if payload is None:
+            return None  # A tombstone, which deletes the shipment of its key
+        try:
+            data = self._read(io.BytesIO(payload), self._schema)
+        except (EOFError, ValueError, TypeError) as e:
+            return InvalidShipment(str(e), payload)
+        return ShipmentEvent.from_dict(data)
+
+
+DECODERS = {"json": JsonDecoder, "msgpack": MsgPackDecoder, "avro": AvroDecoder}
+"""
+dict of str to type: Decoder class for each supported shipment encoding.
+"""
+
+
+def make_decoder(encoding=SHIPMENT_ENCODING):
+    """
+    Create the decoder for an encoding.
+
+    Parameters
+    ----------
+    encoding : str, optional
+        One of the keys of `DECODERS`.
+
+    Returns
+    -------
+    callable
+        Turns a Kafka record value into a `ShipmentEvent` or an
+        `InvalidShipment`, and a tombstone into None; it never raises
+        on bad payloads.
+    """
+    return DECODERS[encoding]()
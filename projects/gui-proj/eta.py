@@ -0,0 +1,167 @@
+import numpy as np
+from geopy.distance import geodesic
+
+from constants import DEFAULT_MODE, ETA_DESTINATION, ETA_PRECISE, SPEED_BY_MODE_KMH
+
+EARTH_RADIUS_KM = 6371.0088
+"""
+float: Mean Earth radius used by the haversine distance, in kilometres.
+"""
+
+
+def haversine_km(lat, lon, dest_lat, dest_lon):
+    """
+    Compute great-circle distances for arrays of coordinates.
+
+    Parameters
+    ----------
+    lat, lon : numpy.ndarray
+        Start coordinates in degrees.
+    dest_lat, dest_lon : float or numpy.ndarray
+        Destination coordinates in degrees.
+
+    Returns
+    -------
+    numpy.ndarray
+        The distances in kilometres.
+    """
+    lat, lon, dest_lat, dest_lon = map(np.radians, (lat, lon, dest_lat, dest_lon))
+    a = (
+        np.sin((dest_lat - lat) / 2) ** 2
+        + np.cos(lat) * np.cos(dest_lat) * np.sin((dest_lon - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class EtaEngine:
+    """
+    Compute shipment ETAs in bulk and remember them per shipment.
+
+    Every shipment is headed to its own ``destination_lat`` and
+    ``destination_lon``, or the default destination, at the speed of its
+    transport ``mode``. Modes are resolved to a small integer index into
+    a speed array, so a whole batch is solved in one vectorized
+    haversine pass, or with geodesic distances in precise mode.
+
+    Each result is cached under the shipment ID together with the
+    inputs it was computed for, so only shipments that moved or changed
+    destination or mode since the last call are recomputed.
+
+    Parameters
+    ----------
+    destination : tuple of float, optional
+        Latitude and longitude of shipments without a destination.
+    speeds : dict of str to float, optional
+        Average speed of each transport mode, in km/h.
+    default_mode : str, optional
+        Mode of shipments without a known ``mode``.
+    precise : bool, optional
+        Use ellipsoidal geodesic distances instead of haversine.
+    """
+
+    def __init__(
+        self,
+        destination=ETA_DESTINATION,
+        speeds=SPEED_BY_MODE_KMH,
+        default_mode=DEFAULT_MODE,
+        precise=ETA_PRECISE,
+    ):
+        self.destination = destination
+        self.precise = precise
+        self._modes = {mode: index for index, mode in enumerate(speeds)}
+        self._speeds = np.array(list(speeds.values()), dtype=np.float64)
+        self._default_mode = self._modes[default_mode]
+        self._cache = {}
+
+    def hours(self, shipments):
+        """
+        Get the hours to arrival of several shipments.
+
+        Parameters
+        ----------
+        shipments : iterable of dict
+            Shipments with ``latitude`` and ``longitude`` fields, and
+            optionally ``destination_lat``, ``destination_lon`` and
+            ``mode``.
+
+        Returns
+        -------
+        list of float or None
+            The hours to arrival of each shipment, in input order, or
+            None for shipments without a valid position.
+        """
+        results = []
+        stale = []
+        for index, shipment in enumerate(shipments):
+            key = self._key(shipment)
+            if key is None:
+                results.append(None)
+                continue
+            cached = self._cache.get(shipment.get("shipment_id"))
+            if cached is not None and cached[0] == key:
+                results.append(cached[1])
+            else:
+                results.append(None)
+                stale.append((index, shipment.get("shipment_id"), key))
+
+        if stale:
+            for (index, shipment_id, key), hours in zip(
+                stale, self._solve([key for _, _, key in stale])
+            ):
+                results[index] = hours
+                if shipment_id is not None:
+                    self._cache[shipment_id] = (key, hours)
+        return results
+
+    def annotate(self, shipments):
+        """
+        Store the hours to arrival on each shipment as ``eta_hours``.
+
+        Parameters
+        ----------
+        shipments : iterable of dict
+            Shipments to compute and store the ETA of; None, for a
+            removed shipment, is skipped.
+        """
+        shipments = [shipment for shipment in shipments if shipment is not None]
+        for shipment, hours in zip(shipments, self.hours(shipments)):
+            shipment["eta_hours"] = hours
+
+    def forget(self, shipment_id):
+        """
+        Drop the cached ETA of a shipment.
+
+        Parameters
+        ----------
+        shipment_id : str
+            The shipment to forget.
+        """
+        self._cache.pop(shipment_id, None)
+
+    def _key(self, shipment):
+        try:
+            lat = float(shipment["latitude"])
+            lon = float(shipment["longitude"])
+            if "destination_lat" in shipment and "destination_lon" in shipment:
+                dest_lat = float(shipment["destination_lat"])
+                dest_lon = float(shipment["destination_lon"])
+            else:
+                dest_lat, dest_lon = self.destination
+        except (KeyError, TypeError, ValueError):
+            return None
+        mode = self._modes.get(shipment.get("mode"), self._default_mode)
+        return (lat, lon, dest_lat, dest_lon, mode)
+
+    def _solve(self, keys):
+        coordinates = np.array(keys, dtype=np.float64)
+        if self.precise:
+            distances = np.array(
+                [
+                    geodesic((lat, lon), (dest_lat, dest_lon)).kilometers
+                    for lat, lon, dest_lat, dest_lon, _ in keys
+                ]
+            )
+        else:
+            distances = haversine_km(*coordinates[:, :4].T)
+        speeds = self._speeds[coordinates[:, 4].astype(np.intp)]
+        return (distances / speeds).tolist()
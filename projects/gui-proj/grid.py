@@ -0,0 +1,307 @@
+import heapq
+
+from nicegui import ui
+
+from constants import GRID_ROWS_PER_PAGE
+
+COLUMNS = [
+    {"name": "shipment_id", "label": "Shipment ID", "field": "shipment_id"},
+    {"name": "status", "label": "Status", "field": "status", "sortable": True},
+    {"name": "location", "label": "Location", "field": "location"},
+    {"name": "timestamp", "label": "Timestamp", "field": "timestamp", "sortable": True},
+    {"name": "eta", "label": "ETA", "field": "eta", "sortable": True},
+]
+"""
+list of dict: Column definitions of the shipment grid.
+"""
+
+
+def query_page(
+    shipments,
+    status,
+    term,
+    sort_keys,
+    sort_by,
+    descending,
+    page,
+    rows_per_page,
+    matching=None,
+):
+    """
+    Select one sorted page of the shipments that pass the filters.
+
+    The matching shipments come from the store indexes, and only the
+    rows up to the end of the requested page are ordered, using a heap,
+    so the first pages of a large fleet are cheap to serve. Shipments
+    without a sort value are always listed last.
+
+    Parameters
+    ----------
+    shipments : ShipmentStore
+        The shipments store.
+    status : str
+        The status to filter by, or "All" for any status.
+    term : str
+        A substring of the shipment ID to search for.
+    sort_keys : dict
+        Maps a sortable column name to a callable that returns the sort
+        value of a shipment, or None if it has none.
+    sort_by : str or None
+        The column to sort by, or None to keep store order.
+    descending : bool
+        Whether to sort in descending order.
+    page : int
+        The 1-based page number.
+    rows_per_page : int
+        The number of shipments per page.
+    matching : iterable, optional
+        The IDs of the shipments that pass the filters, if they were
+        already looked up, e.g. by a `SearchPipeline`.
+
+    Returns
+    -------
+    tuple of (list, int)
+        The shipments on the page and the number of matching shipments.
+    """
+    if matching is None:
+        matching = shipments.select(status, term)
+    matching = [shipments[shipment_id] for shipment_id in matching]
+    return _page(matching, sort_keys, sort_by, descending, page, rows_per_page)
+
+
+def _page(matching, sort_keys, sort_by, descending, page, rows_per_page):
+    start = (page - 1) * rows_per_page
+    end = start + rows_per_page
+    sort_key = sort_keys.get(sort_by)
+    if sort_key is None:
+        return matching[start:end], len(matching)
+
+    def key(shipment):
+        value = sort_key(shipment)
+        return (value is not None, value) if descending else (value is None, value)
+
+    select = heapq.nlargest if descending else heapq.nsmallest
+    return select(end, matching, key=key)[start:], len(matching)
+
+
+class ShipmentGrid:
+    """
+    Paginated shipment table with server-side sorting and filtering.
+
+    The browser only ever receives the rows of the page it shows. Page,
+    sort and filter changes are answered from the shipments store on the
+    server.
+
+    Parameters
+    ----------
+    format_row : callable
+        Returns the row dict of a shipment, with a key per column.
+    sort_keys : dict
+        Maps a sortable column name to a callable returning the sort
+        value of a shipment.
+    rows_per_page : int, optional
+        The number of shipments per page.
+    """
+
+    def __init__(self, format_row, sort_keys, rows_per_page=GRID_ROWS_PER_PAGE):
+        self.format_row = format_row
+        self.sort_keys = sort_keys
+        self.pagination = {
+            "page": 1,
+            "rowsPerPage": rows_per_page,
+            "sortBy": "timestamp",
+            "descending": True,
+            "rowsNumber": 0,
+        }
+        self.table = ui.table(
+            columns=COLUMNS,
+            rows=[],
+            row_key="shipment_id",
+            pagination=self.pagination,
+        ).props(f":rows-per-page-options=[{rows_per_page}]")
+        self.table.on("request", self._on_request)
+        self.changed = True  # A new grid shows the first page of the store
+        self.generation = 0
+        self._shipments = None
+        self._filters = ("All", "")
+
+    def mark_changed(self, shipment_ids):
+        """
+        Record that shipments changed since the last render.
+
+        Parameters
+        ----------
+        shipment_ids : iterable
+            IDs of shipments that were inserted, updated or removed.
+        """
+        if shipment_ids:
+            self.changed = True
+
+    def invalidate(self):
+        """Go back to the first page and re-query it on the next render."""
+        self.pagination["page"] = 1
+        self.changed = True
+        self.generation += 1
+
+    def render(self, shipments, status, term):
+        """
+        Re-query and send the current page if anything changed.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        status : str
+            The status to filter by, or "All" for any status.
+        term : str
+            A substring of the shipment ID to search for.
+
+        Returns
+        -------
+        int
+            The number of rows sent to the browser.
+        """
+        return self.apply(self.prepare(self.snapshot(shipments, status, term)))
+
+    def snapshot(self, shipments, status, term):
+        """
+        Take the matching shipments if the page must be re-queried.
+
+        Runs on the event loop; sorting and formatting the page is left
+        to `prepare`.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        status : str
+            The status to filter by, or "All" for any status.
+        term : str
+            A substring of the shipment ID to search for.
+
+        Returns
+        -------
+        tuple or None
+            The job to pass to `prepare`, or None if nothing changed.
+        """
+        self._shipments = shipments
+        self._filters = (status, term)
+        if not self.changed:
+            return None
+        self.changed = False
+        matching = [
+            shipments[shipment_id] for shipment_id in shipments.select(status, term)
+        ]
+        return (
+            self.generation,
+            matching,
+            self.pagination.get("sortBy"),
+            self.pagination.get("descending", False),
+            self.pagination["page"],
+            self.pagination["rowsPerPage"],
+        )
+
+    def prepare(self, job):
+        """
+        Sort and format the page of a job.
+
+        Touches neither the UI nor the store, so it may run on any
+        thread.
+
+        Parameters
+        ----------
+        job : tuple or None
+            A job returned by `snapshot`.
+
+        Returns
+        -------
+        tuple or None
+            The payload to pass to `apply`.
+        """
+        if job is None:
+            return None
+        generation, matching, *pagination = job
+        page, total = _page(matching, self.sort_keys, *pagination)
+        return generation, [self.format_row(shipment) for shipment in page], total
+
+    def apply(self, payload):
+        """
+        Send a prepared page to the browser.
+
+        A page prepared before the grid was invalidated or a search was
+        streamed is dropped; the grid is re-queried on the next render.
+
+        Parameters
+        ----------
+        payload : tuple or None
+            A payload returned by `prepare`.
+
+        Returns
+        -------
+        int
+            The number of rows sent to the browser.
+        """
+        if payload is None:
+            return 0
+        generation, rows, total = payload
+        if generation != self.generation:
+            self.changed = True
+            return 0
+        self.pagination["rowsNumber"] = total
+        self.table.rows = rows
+        self.table.pagination = dict(self.pagination)
+        return len(rows)
+
+    async def stream(self, shipments, status, term, matching, chunk_size=None):
+        """
+        Show the first rows of a search result.
+
+        Only the current page is sent to the browser, so the result is
+        not split into chunks.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        status : str
+            The status to filter by, or "All" for any status.
+        term : str
+            A substring of the shipment ID to search for.
+        matching : dict or list
+            The IDs of the shipments that pass the filters.
+        chunk_size : int, optional
+            Unused; accepted for the same signature as `ShipmentRows.stream`.
+
+        Returns
+        -------
+        int
+            The number of rows sent to the browser.
+        """
+        self._shipments = shipments
+        self._filters = (status, term)
+        self.changed = False
+        self.generation += 1
+        self.pagination["page"] = 1
+        return self._send_page(matching)
+
+    def _on_request(self, e):
+        self.pagination.update(e.args["pagination"])
+        self.generation += 1
+        if self._shipments is not None:
+            self._send_page()
+
+    def _send_page(self, matching=None):
+        page, total = query_page(
+            self._shipments,
+            *self._filters,
+            self.sort_keys,
+            self.pagination.get("sortBy"),
+            self.pagination.get("descending", False),
+            self.pagination["page"],
+            self.pagination["rowsPerPage"],
+            matching,
+        )
+        self.pagination["rowsNumber"] = total
+        self.table.rows = [self.format_row(shipment) for shipment in page]
+        self.table.pagination = dict(self.pagination)
+        return len(page)
@@ -0,0 +1,327 @@
+import time
+from datetime import datetime
+
+import numpy as np
+
+from constants import HISTORY_INITIAL_CAPACITY, HISTORY_POINTS, HISTORY_WINDOW_S
+
+
+def parse_time(timestamp):
+    """
+    Read an event timestamp as seconds since the epoch.
+
+    Parameters
+    ----------
+    timestamp : str
+        An ISO 8601 timestamp.
+
+    Returns
+    -------
+    float or None
+        The time, or None if it is not ISO 8601.
+    """
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _coordinate(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class ShipmentHistory:
+    """
+    Recent positions and statuses of every shipment, in compact arrays.
+
+    Each shipment owns a row of fixed-size ring buffers: event times as
+    float64, latitudes and longitudes as float32 and status codes as
+    uint16, so a shipment costs ``18 * points`` bytes however many events
+    it had. Statuses past the 65535 distinct ones the codes can hold
+    are recorded as unknown. Unused entries have a time of minus
+    infinity. Rows double when the fleet outgrows them.
+
+    Entries older than ``window_s`` before the newest recorded time are
+    evicted for all shipments at once, and a shipment without entries
+    left gives its row to the next new shipment.
+
+    Trails and past fleet states are read with whole-array NumPy
+    operations, so they take milliseconds for a large fleet.
+
+    Parameters
+    ----------
+    points : int, optional
+        Entries kept per shipment.
+    window_s : float, optional
+        How far back entries are kept, in seconds.
+    capacity : int, optional
+        Initial number of shipment rows.
+
+    Attributes
+    ----------
+    newest : float
+        The latest recorded time, in seconds since the epoch.
+    """
+
+    def __init__(
+        self,
+        points=HISTORY_POINTS,
+        window_s=HISTORY_WINDOW_S,
+        capacity=HISTORY_INITIAL_CAPACITY,
+    ):
+        self.points = points
+        self.window_s = window_s
+        self.times = np.full((capacity, points), -np.inf)
+        self.lat = np.full((capacity, points), np.nan, dtype=np.float32)
+        self.lon = np.full((capacity, points), np.nan, dtype=np.float32)
+        self.status = np.zeros((capacity, points), dtype=np.uint16)
+        self.heads = np.zeros(capacity, dtype=np.int32)
+        self.rows = {}
+        self.ids = []
+        self.free_rows = []
+        self.statuses = [None]
+        self._codes = {None: 0}
+        self.newest = -np.inf
+        self._evicted = -np.inf
+
+    def __len__(self):
+        return len(self.rows)
+
+    def record(self, updates):
+        """
+        Append the position and status of updated shipments.
+
+        Events without a position are recorded with NaN coordinates,
+        and events without an ISO 8601 timestamp at the time they are
+        recorded.
+
+        Parameters
+        ----------
+        updates : dict
+            The applied events, by shipment ID.
+        """
+        if not updates:
+            return
+        now = None
+        rows = []
+        times = []
+        for shipment_id, event in updates.items():
+            recorded_at = parse_time(event.get("timestamp"))
+            if recorded_at is None:
+                recorded_at = now = now or time.time()
+            row = self.rows.get(shipment_id)
+            rows.append(self._allocate(shipment_id) if row is None else row)
+            times.append(recorded_at)
+        rows = np.array(rows, dtype=np.intp)
+        heads = self.heads[rows]
+        self.times[rows, heads] = times
+        self.lat[rows, heads] = [
+            _coordinate(event.get("latitude")) for event in updates.values()
+        ]
+        self.lon[rows, heads] = [
+            _coordinate(event.get("longitude")) for event in updates.values()
+        ]
+        self.status[rows, heads] = [
+            self._code(event["status"]) for event in updates.values()
+        ]
+        self.heads[rows] = (heads + 1) % self.points
+        self.newest = max(self.newest, max(times))
+        if self.newest - self._evicted >= self.window_s / 10:
+            self.evict(self.newest - self.window_s)
+
+    def evict(self, before):
+        """
+        Drop every entry older than a time.
+
+        Parameters
+        ----------
+        before : float
+            Entries recorded before this time are dropped, in seconds
+            since the epoch.
+        """
+        self._evicted = before + self.window_s
+        used = len(self.ids)
+        times = self.times[:used]
+        times[times < before] = -np.inf
+        emptied = np.flatnonzero(np.isneginf(times).all(axis=1))
+        for row in emptied.tolist():
+            shipment_id = self.ids[row]
+            if shipment_id is not None:
+                del self.rows[shipment_id]
+                self.ids[row] = None
+                self.free_rows.append(row)
+
+    def forget(self, shipment_id):
+        """
+        Drop the history of a shipment, e.g. after it was removed.
+
+        Parameters
+        ----------
+        shipment_id : str
+            The shipment to forget.
+        """
+        row = self.rows.pop(shipment_id, None)
+        if row is not None:
+            self.times[row] = -np.inf
+            self.ids[row] = None
+            self.free_rows.append(row)
+
+    def span(self):
+        """
+        Get the times the history covers.
+
+        Returns
+        -------
+        tuple of float or None
+            The oldest and the newest recorded time, in seconds since
+            the epoch, or None if nothing is recorded.
+        """
+        times = self.times[: len(self.ids)]
+        recorded = times[~np.isneginf(times)]
+        if not recorded.size:
+            return None
+        return float(recorded.min()), float(recorded.max())
+
+    def trail(self, shipment_id):
+        """
+        Get the recent positions of one shipment, oldest first.
+
+        Parameters
+        ----------
+        shipment_id : str
+            The shipment.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            The times, latitudes and longitudes; empty if the shipment
+            has no history.
+        """
+        row = self.rows.get(shipment_id)
+        if row is None:
+            return np.empty(0), np.empty(0), np.empty(0)
+        order = (self.heads[row] + np.arange(self.points)) % self.points
+        times = self.times[row, order]
+        kept = ~np.isneginf(times)
+        return times[kept], self.lat[row, order][kept], self.lon[row, order][kept]
+
+    def trails(self, status=None, limit=None, since=None):
+        """
+        Get the trails of the most recently updated shipments as one polyline.
+
+        Parameters
+        ----------
+        status : str, optional
+            Only shipments whose latest status this is.
+        limit : int, optional
+            The most shipments to include.
+        since : float, optional
+            Leave out positions recorded before this time.
+
+        Returns
+        -------
+        tuple
+            The latitudes and longitudes of every trail, oldest first,
+            with NaN between trails so that they are drawn apart, and
+            the IDs of the shipments included.
+        """
+        rows = self._latest_rows(status)
+        if limit is not None and rows.size > limit:
+            newest = self._newest_times(rows)
+            rows = rows[np.argpartition(-newest, limit - 1)[:limit]]
+        order = (self.heads[rows, None] + np.arange(self.points)) % self.points
+        times = np.take_along_axis(self.times[rows], order, axis=1)
+        kept = times >= (-np.inf if since is None else since)
+        kept &= ~np.isneginf(times)
+        gap = np.full((rows.size, 1), np.nan)
+        lat = np.where(kept, np.take_along_axis(self.lat[rows], order, axis=1), np.nan)
+        lon = np.where(kept, np.take_along_axis(self.lon[rows], order, axis=1), np.nan)
+        return (
+            np.hstack([lat, gap]).ravel(),
+            np.hstack([lon, gap]).ravel(),
+            [self.ids[row] for row in rows.tolist()],
+        )
+
+    def at(self, instant, status=None):
+        """
+        Replay the fleet as it was at a past instant.
+
+        Parameters
+        ----------
+        instant : float
+            The time, in seconds since the epoch.
+        status : str, optional
+            Only shipments that had this status at the time.
+
+        Returns
+        -------
+        tuple
+            The IDs, latitudes, longitudes and statuses of the shipments
+            with an entry at or before ``instant``.
+        """
+        used = len(self.ids)
+        times = np.where(self.times[:used] <= instant, self.times[:used], -np.inf)
+        columns = times.argmax(axis=1)
+        rows = np.arange(used)
+        known = ~np.isneginf(times[rows, columns])
+        codes = self.status[rows, columns]
+        if status is not None:
+            known &= codes == self._codes.get(status, -1)
+        rows, columns = rows[known], columns[known]
+        return (
+            [self.ids[row] for row in rows.tolist()],
+            self.lat[rows, columns],
+            self.lon[rows, columns],
+            [self.statuses[code] for code in codes[known].tolist()],
+        )
+
+    def _allocate(self, shipment_id):
+        if self.free_rows:
+            row = self.free_rows.pop()
+            self.ids[row] = shipment_id
+        else:
+            row = len(self.ids)
+            if row == len(self.heads):
+                self._grow()
+            self.ids.append(shipment_id)
+        self.times[row] = -np.inf
+        self.heads[row] = 0
+        self.rows[shipment_id] = row
+        return row
+
+    def _grow(self):
+        capacity = 2 * len(self.heads)
+        for name, fill in (("times", -np.inf), ("lat", np.nan), ("lon", np.nan)):
+            old = getattr(self, name)
+            grown = np.full((capacity, self.points), fill, dtype=old.dtype)
+            grown[: len(old)] = old
+            setattr(self, name, grown)
+        status = np.zeros((capacity, self.points), dtype=self.status.dtype)
+        status[: len(self.status)] = self.status
+        self.status = status
+        self.heads = np.resize(self.heads, capacity)
+
+    def _code(self, status):
+        code = self._codes.get(status)
+        if code is None:
+            if len(self.statuses) > np.iinfo(self.status.dtype).max:
+                return self._codes[None]  # The code table is full
+            code = self._codes[status] = len(self.statuses)
+            self.statuses.append(status)
+        return code
+
+    def _latest_rows(self, status):
+        # The newest entry of a row is the last to be evicted, so rows
+        # in use are those whose newest entry is still recorded
+        rows = np.arange(len(self.ids))
+        latest = (self.heads[rows] - 1) % self.points
+        kept = ~np.isneginf(self.times[rows, latest])
+        if status is not None:
+            kept &= self.status[rows, latest] == self._codes.get(status, -1)
+        return rows[kept]
+
+    def _newest_times(self, rows):
+        return self.times[rows, (self.heads[rows] - 1) % self.points]
@@ -0,0 +1,279 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+
+from kafka import KafkaConsumer
+
+from constants import (
+    BATCH_LINGER_MS,
+    BATCH_MAX_RECORDS,
+    KAFKA_BOOTSTRAP_SERVERS,
+    MAX_IN_FLIGHT_BATCHES,
+    POLL_TIMEOUT_MS,
+)
+from decoding import InvalidShipment, make_decoder
+
+logger = logging.getLogger(__name__)
+
+
+def make_consumer(bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS, decoder=None):
+    """
+    Create a Kafka consumer for shipment updates.
+
+    Parameters
+    ----------
+    bootstrap_servers : str, optional
+        The Kafka brokers to connect to.
+    decoder : callable, optional
+        Decodes the record values, by default one from `make_decoder`.
+
+    Returns
+    -------
+    KafkaConsumer
+        A consumer that is neither subscribed nor assigned.
+    """
+    return KafkaConsumer(
+        bootstrap_servers=bootstrap_servers,
+        value_deserializer=make_decoder() if decoder is None else decoder,
+    )
+
+
+class ConsumerThread(threading.Thread):
+    """
+    Poll a Kafka consumer on a dedicated thread and hand batches to asyncio.
+
+    The blocking ``poll`` calls never run on the event loop. Records are
+    gathered into batches of up to ``max_records``, waiting at most
+    ``linger_ms`` after the first record for the batch to fill. Each
+    batch is put on a bounded ``asyncio.Queue``; when the queue is full
+    the thread waits, so Kafka is only read as fast as the event loop
+    can apply the batches.
+
+    Parameters
+    ----------
+    consumer : KafkaConsumer
+        The consumer to poll. It is only used from this thread until
+        the thread has stopped.
+    loop : asyncio.AbstractEventLoop
+        The event loop that reads the batches.
+    max_in_flight : int, optional
+        Maximum number of batches queued for the event loop.
+    poll_timeout_ms : int, optional
+        How long to wait for the first record of a batch.
+    max_records : int, optional
+        Maximum number of records in one batch.
+    linger_ms : int, optional
+        How long to keep filling a batch after its first record arrived.
+    idle_tick_s : float, optional
+        While no records arrive, queue an empty batch this often, in
+        seconds, so that the reader can still release held-back work.
+        None queues only batches with records.
+
+    Attributes
+    ----------
+    lag : dict
+        Records left to read in each partition after the last poll, by
+        topic and partition, as far as the consumer knows the end of the
+        partition.
+    """
+
+    def __init__(
+        self,
+        consumer,
+        loop,
+        max_in_flight=MAX_IN_FLIGHT_BATCHES,
+        poll_timeout_ms=POLL_TIMEOUT_MS,
+        max_records=BATCH_MAX_RECORDS,
+        linger_ms=BATCH_LINGER_MS,
+        idle_tick_s=None,
+    ):
+        super().__init__(name="shipment-consumer", daemon=True)
+        self.consumer = consumer
+        self.loop = loop
+        self.poll_timeout_ms = poll_timeout_ms
+        self.max_records = max_records
+        self.linger_ms = linger_ms
+        self.idle_tick_s = idle_tick_s
+        self.queue = asyncio.Queue(maxsize=max_in_flight)
+        self.lag = {}
+        self._stopping = threading.Event()
+
+    def run(self):
+        """
+        Poll the consumer until stopped and queue every non-empty batch.
+
+        With ``idle_tick_s`` set, an empty batch is also queued when
+        nothing was queued for that long.
+
+        An exception raised by the consumer is forwarded to the event
+        loop and re-raised by `batches`.
+        """
+        try:
+            queued_at = time.monotonic()
+            while not self._stopping.is_set():
+                batch = self._poll_batch()
+                if batch or self._idle_for(queued_at):
+                    self._put(batch)
+                    queued_at = time.monotonic()
+        except Exception as e:
+            logger.exception("Shipment consumer thread failed")
+            self._submit(e)
+        finally:
+            self._submit(None)
+
+    def _idle_for(self, queued_at):
+        if self.idle_tick_s is None:
+            return False
+        return time.monotonic() - queued_at >= self.idle_tick_s
+
+    def _poll_batch(self):
+        batch = []
+        deadline = None
+        while len(batch) < self.max_records and not self._stopping.is_set():
+            if deadline is None:
+                timeout_ms = self.poll_timeout_ms
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                timeout_ms = int(remaining * 1000)
+            records = self.consumer.poll(
+                timeout_ms=timeout_ms, max_records=self.max_records - len(batch)
+            )
+            for partition, messages in records.items():
+                batch.extend(messages)
+                highwater = self.consumer.highwater(partition)
+                if highwater is not None and messages:
+                    self.lag[(partition.topic, partition.partition)] = (
+                        highwater - messages[-1].offset - 1
+                    )
+            if not batch:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self.linger_ms / 1000
+        return batch
+
+    def backlog(self):
+        """
+        Estimate the records that are waiting to be applied.
+
+        Returns
+        -------
+        int
+            The records left in Kafka after the last poll, plus the
+            queued batches counted as full.
+        """
+        return sum(self.lag.values()) + self.queue.qsize() * self.max_records
+
+    def stop(self):
+        """Ask the thread to stop after its current poll."""
+        self._stopping.set()
+
+    async def batches(self):
+        """
+        Yield batches of consumer records as the thread produces them.
+
+        Yields
+        ------
+        list
+            Up to ``max_records`` consumer records, in partition order,
+            or none for an idle tick.
+
+        Raises
+        ------
+        Exception
+            Any exception raised by the consumer on the polling thread.
+        """
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def _submit(self, item):
+        try:
+            return asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop)
+        except RuntimeError:  # The event loop is already closed
+            return None
+
+    def _put(self, item):
+        # Block while the queue is full, but keep checking for a stop request
+        future = self._submit(item)
+        while future is not None and not self._stopping.is_set():
+            try:
+                future.result(timeout=self.poll_timeout_ms / 1000)
+                return
+            except concurrent.futures.TimeoutError:
+                continue
+        if future is not None:
+            future.cancel()
+
+
+def tombstone_id(message):
+    """
+    Get the shipment a tombstone record deletes.
+
+    Producers key shipment records by shipment ID, so a tombstone, a
+    record whose value is None, deletes the shipment of its key.
+
+    Parameters
+    ----------
+    message : ConsumerRecord
+        The tombstone.
+
+    Returns
+    -------
+    str or None
+        The shipment ID, or None if the record has no key.
+    """
+    key = message.key
+    if isinstance(key, (bytes, bytearray, memoryview)):
+        key = bytes(key).decode("utf-8", errors="replace")
+    return key
+
+
+def fold_batch(batch, is_valid, ordering=None):
+    """
+    Validate a batch of records and keep the latest event per shipment.
+
+    A tombstone is kept as None under the ID of the shipment it deletes,
+    unless a later event of the shipment follows it in the batch.
+
+    Parameters
+    ----------
+    batch : list
+        Consumer records whose ``value`` is a decoded shipment event,
+        or None for a tombstone.
+    is_valid : callable
+        Returns True for events that may be applied to the store.
+    ordering : EventOrdering, optional
+        Drops valid events that are stale or duplicates, so they never
+        reach the store.
+
+    Returns
+    -------
+    tuple of (dict, list)
+        The latest valid event, or None if deleted, for each shipment ID
+        in the batch, and the invalid events in arrival order.
+    """
+    updates = {}
+    invalid = []
+    for message in batch:
+        event = message.value
+        if event is None:
+            shipment_id = tombstone_id(message)
+            if shipment_id is None:
+                invalid.append(InvalidShipment("tombstone without a key", None))
+            else:
+                updates[shipment_id] = None
+        elif not is_valid(event):
+            invalid.append(event)
+        elif ordering is None or ordering.accept(
+            event, message.partition, message.offset
+        ):
+            updates[event["shipment_id"]] = event
+    return updates, invalid
@@ -0,0 +1,141 @@
+"""
+Headless ingest worker for running several dashboard replicas.
+
+The worker is the only process that consumes the shipment topic. It
+folds, orders and annotates every batch exactly like the dashboard
+does on its own, and writes the result to a `SharedView` that the
+dashboard processes started with ``SHARED_VIEW_PATH`` read from.
+
+Run it with the path of the shared view::
+
+    python ingest_worker.py shipments.db
+"""
+
+import argparse
+import asyncio
+import logging
+
+from constants import IDLE_TICK_S, SHARED_VIEW_PATH, SHIPMENT_TOPIC
+from decoding import ShipmentEvent
+from eta import EtaEngine
+from ingest import ConsumerThread, fold_batch, make_consumer
+from lanes import PriorityLanes
+from ordering import EventOrdering
+from sharedview import SharedView
+from snapshot import seek_to_offsets
+
+logger = logging.getLogger(__name__)
+
+
+def is_decoded(event):
+    """
+    Check that an event was decoded and validated by the deserializer.
+
+    Parameters
+    ----------
+    event : ShipmentEvent or InvalidShipment
+        The consumed event.
+
+    Returns
+    -------
+    bool
+        True for a `ShipmentEvent`.
+    """
+    return isinstance(event, ShipmentEvent)
+
+
+async def run_worker(consumer, view, topic=SHIPMENT_TOPIC):
+    """
+    Consume shipment updates into a shared view until the consumer stops.
+
+    The view keeps the offsets it was written up to in the same
+    transaction as the shipments, so a restarted worker resumes exactly
+    where the view left off, and rebuilds its ordering from the stored
+    shipments. Tombstones delete shipments from the view. Location
+    pings are rate-limited by `PriorityLanes` against the latest written
+    state of each shipment, as in the dashboard, and the stored offsets
+    stay at the earliest held ping so that a restart reads it again.
+
+    Parameters
+    ----------
+    consumer : KafkaConsumer
+        A consumer that is neither subscribed nor assigned.
+    view : SharedView
+        The view to write.
+    topic : str, optional
+        The topic to consume.
+    """
+    ordering = EventOrdering()
+    eta_engine = EtaEngine()
+    lanes = PriorityLanes()
+    written = await asyncio.to_thread(view.changes)
+    written = {
+        shipment_id: event
+        for shipment_id, event in written.items()
+        if event is not None
+    }
+    for event in written.values():
+        ordering.accept(event)
+    offsets = await asyncio.to_thread(view.offsets)
+    if offsets:
+        await asyncio.to_thread(seek_to_offsets, consumer, topic, offsets)
+    else:
+        consumer.subscribe([topic])
+
+    ingest_thread = ConsumerThread(
+        consumer, asyncio.get_running_loop(), idle_tick_s=IDLE_TICK_S
+    )
+    ingest_thread.start()
+    try:
+        async for batch in ingest_thread.batches():
+            updates, invalid = fold_batch(batch, is_decoded, ordering)
+            updates = lanes.admit(updates, written, ingest_thread.backlog())
+            eta_engine.annotate(updates.values())
+            for shipment_id, event in updates.items():
+                if event is not None:
+                    written[shipment_id] = event
+                else:
+                    written.pop(shipment_id, None)
+                    ordering.forget(shipment_id)
+                    lanes.forget(shipment_id)
+                    eta_engine.forget(shipment_id)
+            for message in batch:
+                offsets[(message.topic, message.partition)] = message.offset + 1
+            if updates or batch:  # Idle ticks mostly release nothing
+                await asyncio.to_thread(
+                    view.write, updates, lanes.committable(offsets, ordering)
+                )
+            if invalid:
+                logger.warning("Skipped %d invalid shipment events", len(invalid))
+    finally:
+        ingest_thread.stop()
+        await asyncio.to_thread(ingest_thread.join)
+
+
+def main():
+    """Run the worker on the shared view given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default=SHARED_VIEW_PATH,
+        help="SQLite file of the shared view (default: SHARED_VIEW_PATH)",
+    )
+    args = parser.parse_args()
+    if args.path is None:
+        parser.error("no shared view path given and SHARED_VIEW_PATH is not set")
+
+    logging.basicConfig(level=logging.INFO)
+    consumer = make_consumer()
+    view = SharedView(args.path)
+    try:
+        asyncio.run(run_worker(consumer, view))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        consumer.close()
+        view.close()
+
+
+if __name__ == "__main__":
+    main()
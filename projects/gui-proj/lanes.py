@@ -0,0 +1,258 @@
+import heapq
+import math
+import time
+
+import numpy as np
+
+from constants import (
+    PING_MAX_INTERVAL_S,
+    PING_MIN_DISTANCE_KM,
+    PING_MIN_INTERVAL_S,
+    PING_SHED_BACKLOG,
+)
+from eta import haversine_km
+
+FAST_LANE_FIELDS = ("status", "location", "destination_lat", "destination_lon", "mode")
+"""
+tuple of str: Fields whose change puts an event in the fast lane.
+
+A location ping only moves a shipment and updates its timestamp.
+"""
+
+
+def is_ping(previous, event):
+    """
+    Check whether an event only reports a new position of a known shipment.
+
+    Parameters
+    ----------
+    previous : ShipmentEvent or dict
+        The stored state of the shipment.
+    event : ShipmentEvent or dict
+        The new event.
+
+    Returns
+    -------
+    bool
+        False if the event changes any of `FAST_LANE_FIELDS`.
+    """
+    for field in FAST_LANE_FIELDS:
+        if previous.get(field) != event.get(field):
+            return False
+    return True
+
+
+class PriorityLanes:
+    """
+    Let status changes through at once and rate-limit location pings.
+
+    New shipments, deletes and events that change a shipment's status,
+    location, destination or mode take the fast lane: they are always
+    applied with the batch they arrived in. Pure location pings are applied at most
+    once per ``min_interval_s`` per shipment, and only if the shipment
+    moved at least ``min_distance_km`` since its stored position.
+
+    A ping that comes too early is held back rather than lost: the
+    latest held ping of each shipment is released with the first batch
+    after its interval has passed, unless a newer event replaced it
+    first. So a truck that stops reporting still ends up at its last
+    reported position.
+
+    A held ping is not in the store yet, so the consumer offsets stored
+    with a snapshot or a shared view must not move past it; `committable`
+    holds them back to the earliest held ping. The apply time of a
+    shipment is dropped once it is ``max_interval_s`` old, so shipments
+    that stopped reporting do not pile up.
+
+    When more than ``shed_backlog`` records wait to be applied, the
+    interval grows with the backlog, up to ``max_interval_s``. Pings
+    are then down-sampled harder and the time saved goes to catching
+    up, so the lag on status changes stays bounded.
+
+    Parameters
+    ----------
+    min_interval_s : float, optional
+        Shortest time between two applied pings of a shipment, in seconds.
+    min_distance_km : float, optional
+        Smallest move a ping must report to be applied, in kilometres.
+    shed_backlog : int, optional
+        Records waiting to be applied above which pings are shed.
+    max_interval_s : float, optional
+        Longest time between two applied pings of a shipment when
+        shedding, in seconds.
+
+    Attributes
+    ----------
+    held : dict
+        The latest held-back ping of each shipment, by ID.
+    dropped : dict of str to int
+        Number of pings dropped because a newer event "superseded" them,
+        or because the shipment stood "still".
+    """
+
+    def __init__(
+        self,
+        min_interval_s=PING_MIN_INTERVAL_S,
+        min_distance_km=PING_MIN_DISTANCE_KM,
+        shed_backlog=PING_SHED_BACKLOG,
+        max_interval_s=PING_MAX_INTERVAL_S,
+    ):
+        self.min_interval_s = min_interval_s
+        self.min_distance_km = min_distance_km
+        self.shed_backlog = shed_backlog
+        self.max_interval_s = max(max_interval_s, min_interval_s)
+        self.interval_s = min_interval_s
+        self.held = {}
+        self.dropped = {"superseded": 0, "still": 0}
+        self.applied = {}
+        self._due = []
+        self._swept_at = time.monotonic()
+
+    def admit(self, updates, shipments, backlog=0):
+        """
+        Pick the events of a batch to apply now.
+
+        Parameters
+        ----------
+        updates : dict
+            The latest valid event of each shipment in the batch, or None
+            for a deleted shipment, by ID.
+        shipments : ShipmentStore
+            The store, before the batch is applied.
+        backlog : int, optional
+            Records waiting to be applied after this batch.
+
+        Returns
+        -------
+        dict
+            The events to apply, by shipment ID: the fast lane first,
+            then the pings that are due, including held ones.
+        """
+        now = time.monotonic()
+        self.interval_s = self._interval(backlog)
+        admitted = {}
+        pings = []
+        for shipment_id, event in updates.items():
+            previous = shipments.get(shipment_id)
+            if event is None or previous is None or not is_ping(previous, event):
+                self._supersede(shipment_id)
+                admitted[shipment_id] = event
+                self.applied[shipment_id] = now
+            elif now - self.applied.get(shipment_id, -math.inf) >= self.interval_s:
+                self._supersede(shipment_id)
+                pings.append((shipment_id, event, previous))
+            else:
+                self._hold(shipment_id, event)
+
+        while self._due and self._due[0][0] <= now - self.interval_s:
+            applied_at, shipment_id = heapq.heappop(self._due)
+            if self.applied.get(shipment_id) != applied_at:
+                continue  # Released or applied since it was held
+            event = self.held.pop(shipment_id, None)
+            previous = shipments.get(shipment_id)
+            if event is not None and previous is not None:
+                pings.append((shipment_id, event, previous))
+
+        for (shipment_id, event, _), moved in zip(pings, self._moved(pings)):
+            if moved:
+                admitted[shipment_id] = event
+                self.applied[shipment_id] = now
+            else:
+                self.dropped["still"] += 1
+
+        if now - self._swept_at >= self.max_interval_s:
+            self._sweep(now)
+        return admitted
+
+    def committable(self, offsets, ordering):
+        """
+        Hold consumer offsets back to the earliest held ping.
+
+        A restart then reads the held pings again, instead of resuming
+        after them. The events read again before them are already
+        applied, so ``ordering`` drops them as duplicates or stale.
+
+        Parameters
+        ----------
+        offsets : dict
+            The next offset to consume, keyed by topic and partition.
+        ordering : EventOrdering
+            The ordering that accepted the held pings, and knows the
+            partition and offset each was read from.
+
+        Returns
+        -------
+        dict
+            The offsets that are safe to store, keyed by topic and
+            partition.
+        """
+        earliest = {}
+        for shipment_id in self.held:
+            _, partition, offset = ordering.versions.get(
+                shipment_id, (None, None, None)
+            )
+            if offset is not None:
+                earliest[partition] = min(offset, earliest.get(partition, offset))
+        return {
+            (topic, partition): min(offset, earliest.get(partition, offset))
+            for (topic, partition), offset in offsets.items()
+        }
+
+    def forget(self, shipment_id):
+        """
+        Drop what is kept of a shipment, e.g. after it was removed.
+
+        Parameters
+        ----------
+        shipment_id : str
+            The shipment to forget.
+        """
+        self.held.pop(shipment_id, None)
+        self.applied.pop(shipment_id, None)
+
+    def _interval(self, backlog):
+        if backlog <= self.shed_backlog:
+            return self.min_interval_s
+        return min(
+            self.min_interval_s * backlog / self.shed_backlog, self.max_interval_s
+        )
+
+    def _sweep(self, now):
+        # A ping after the longest interval is let through anyway, so
+        # older times only need keeping while a ping waits on them
+        self.applied = {
+            shipment_id: applied_at
+            for shipment_id, applied_at in self.applied.items()
+            if now - applied_at < self.max_interval_s or shipment_id in self.held
+        }
+        self._swept_at = now
+
+    def _supersede(self, shipment_id):
+        if self.held.pop(shipment_id, None) is not None:
+            self.dropped["superseded"] += 1
+
+    def _hold(self, shipment_id, event):
+        if shipment_id in self.held:
+            self.dropped["superseded"] += 1
+        else:
+            heapq.heappush(self._due, (self.applied[shipment_id], shipment_id))
+        self.held[shipment_id] = event
+
+    def _moved(self, pings):
+        if not pings:
+            return []
+        positions = np.array(
+            [
+                (
+                    event.get("latitude", math.nan),
+                    event.get("longitude", math.nan),
+                    previous.get("latitude", math.nan),
+                    previous.get("longitude", math.nan),
+                )
+                for _, event, previous in pings
+            ],
+            dtype=np.float64,
+        )
+        distance = haversine_km(*positions.T)
+        # Pings without a position to compare are not judged by distance
+        return ~(distance < self.min_distance_km)
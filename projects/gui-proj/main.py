@@ -1,122 +1,576 @@
 import asyncio
-import json
 import logging
 import signal
-from asyncio import sleep
-
-import plotly.graph_objects as go
-from geopy.distance import geodesic
-from kafka import KafkaConsumer
-from nicegui import ui
+import sqlite3
+
+from fastapi.responses import PlainTextResponse
+from nicegui import app, background_tasks, ui
+
+from bootstrap import bootstrap_partitions
+from clusters import SpatialGrid
+from constants import (
+    BOOTSTRAP_COMPACTED,
+    HISTORY_MAX_TRAILS,
+    IDLE_TICK_S,
+    MAP_LEVEL_OF_DETAIL,
+    NOTIFY_INTERVAL_S,
+    SHARED_VIEW_PATH,
+    SHIPMENT_TOPIC,
+    SHIPMENT_VIEW,
+)
+from decoding import REQUIRED_FIELDS, InvalidShipment, ShipmentEvent, make_decoder
+from eta import EtaEngine
+from grid import ShipmentGrid
+from history import ShipmentHistory
+from ingest import ConsumerThread, fold_batch, make_consumer
+from lanes import PriorityLanes
+from mapview import ShipmentMap
+from metrics import LogSampler, Metrics, timed
+from notify import NotificationAggregator
+from ordering import EventOrdering
+from refresh import RefreshScheduler
+from render import RenderPool
+from rows import ShipmentRows
+from sessions import Session, SessionHub
+from sharedview import SharedView
+from snapshot import Checkpointer
+from store import ShipmentStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+event_log = LogSampler()
 
-# Kafka consumer to listen for shipment updates
-consumer = KafkaConsumer(
-    "shipment_updates",
-    bootstrap_servers="localhost:9092",
-    value_deserializer=lambda x: json.loads(x.decode("utf-8")),
+# Pipeline metrics, served on /metrics
+metrics = Metrics()
+decode_seconds = metrics.histogram(
+    "shipment_decode_seconds", "Time to decode one shipment record."
+)
+validate_seconds = metrics.histogram(
+    "shipment_validate_seconds",
+    "Time to validate, order, fold and prioritize one batch.",
+)
+eta_seconds = metrics.histogram(
+    "shipment_eta_seconds", "Time to compute the ETAs of one batch."
+)
+upsert_seconds = metrics.histogram(
+    "shipment_upsert_seconds", "Time to apply one batch to the store and sessions."
+)
+refresh_wait_seconds = metrics.histogram(
+    "refresh_wait_seconds", "Time a change waited for the refresh showing it."
+)
+list_seconds = metrics.histogram(
+    "update_shipment_list_seconds", "Time to refresh the shipment list of a browser."
+)
+map_seconds = metrics.histogram(
+    "update_shipment_map_seconds", "Time to refresh the map of a browser."
+)
+received_total = metrics.counter(
+    "shipment_events_received_total", "Shipment records consumed."
+)
+invalid_total = metrics.counter(
+    "shipment_events_invalid_total", "Shipment records rejected as invalid."
 )
 
-shipments = {}
-selected_status = "All"
-update_task = None
+# Kafka consumer to listen for shipment updates; it is created, and
+# subscribed or positioned after the last snapshot, when consuming
+# starts. Replicas of a shared view leave consuming to the ingest worker.
+consumer = None
+
+shipments = ShipmentStore()
+eta_engine = EtaEngine()
+ordering = EventOrdering()
+lanes = PriorityLanes()
+history = ShipmentHistory()
+checkpointer = Checkpointer(
+    hold_back=lambda offsets: lanes.committable(offsets, ordering)
+)
+hub = SessionHub(SpatialGrid() if MAP_LEVEL_OF_DETAIL else None)
+render_pool = RenderPool()
+ingest_thread = None
+
+metrics.counter(
+    "shipment_events_dropped_total",
+    "Shipment events dropped as stale or redelivered.",
+    lambda: {
+        (("reason", reason),): count for reason, count in ordering.dropped.items()
+    },
+)
+metrics.gauge(
+    "shipment_consumer_lag",
+    "Records left to consume per partition.",
+    lambda: {
+        (("topic", topic), ("partition", partition)): lag
+        for (topic, partition), lag in (
+            ingest_thread.lag if ingest_thread else {}
+        ).items()
+    },
+)
+metrics.counter(
+    "shipment_pings_dropped_total",
+    "Location pings dropped as superseded or standing still.",
+    lambda: {(("reason", reason),): count for reason, count in lanes.dropped.items()},
+)
+metrics.gauge(
+    "shipment_pings_held", "Location pings held back.", lambda: len(lanes.held)
+)
+metrics.gauge(
+    "shipment_ping_interval_seconds",
+    "Current shortest time between two pings of a shipment.",
+    lambda: lanes.interval_s,
+)
+metrics.gauge("shipments", "Shipments in the store.", lambda: len(shipments))
+metrics.gauge(
+    "shipment_history_shipments",
+    "Shipments with positions in the history window.",
+    lambda: len(history),
+)
+metrics.gauge("dashboard_sessions", "Connected browsers.", lambda: len(hub.sessions))
 
 
 async def consume_shipment_updates():
+    """
+    Consume shipment updates from Kafka and apply them to the UI.
+
+    Polling runs on a dedicated `ConsumerThread`, so the event loop only
+    waits on a bounded queue of batches and stays free to serve the UI.
+    Each batch is validated and folded into `shipments` in one pass and
+    schedules a single refresh of the sessions it matters to, see
+    `apply_updates`. Stale and redelivered events are dropped
+    by `ordering` before they reach the store, and counted in
+    ``ordering.dropped``. Status changes and new shipments are applied
+    at once while location pings are rate-limited per shipment by
+    `lanes`, more strictly as the backlog of the consumer grows. While
+    the topic is quiet the consumer hands on an empty batch every
+    ``IDLE_TICK_S`` seconds, so held-back pings are still applied.
+
+    The Kafka consumer is created first, on a worker thread, as it
+    connects to the brokers. The last snapshot is then loaded, a
+    compacted topic is caught up on with `catch_up`, and the consumer
+    resumes from where loading stopped. The spinner shows until then.
+    `checkpointer` then takes a new snapshot between batches every
+    ``SNAPSHOT_INTERVAL_S`` seconds.
+
+    Every stage is timed into the `metrics` histograms, and one event
+    in ``EVENT_LOG_EVERY`` is logged.
+    """
+    global consumer, ingest_thread
     try:
-        await asyncio.sleep(0)
-        for message in consumer:
-            event = message.value
-            shipment_id = event["shipment_id"]
-            if is_valid_shipment(event):
-                shipments[shipment_id] = event
-                ui.notify(
-                    f"Shipment {shipment_id} updated: {event['status']} at {event['location']}"
-                )
-                logger.info("Shipment update received: %s", event)
-                await (
-                    debounce_update()
-                )  # Await debounce_update to ensure proper execution
-            else:
-                ui.notify(f"Invalid shipment data received: {event}", type="error")
+        if consumer is None:
+            consumer = await asyncio.to_thread(
+                make_consumer, decoder=timed(decode_seconds, make_decoder())
+            )
+        restored = await asyncio.to_thread(checkpointer.load)
+        if restored:
+            await apply_snapshot(restored)
+        if BOOTSTRAP_COMPACTED:
+            await catch_up()
+        await asyncio.to_thread(checkpointer.position, consumer, SHIPMENT_TOPIC)
+        hub.loading = False
+        ingest_thread = ConsumerThread(
+            consumer, asyncio.get_running_loop(), idle_tick_s=IDLE_TICK_S
+        )
+        ingest_thread.start()
+        async for batch in ingest_thread.batches():
+            received_total.inc(len(batch))
+            with validate_seconds.time():
+                updates, invalid = fold_batch(batch, is_valid_shipment, ordering)
+                updates = lanes.admit(updates, shipments, ingest_thread.backlog())
+            invalid_total.inc(len(invalid))
+            with eta_seconds.time():
+                eta_engine.annotate(updates.values())  # Compute new ETAs in bulk
+            for event in event_log.pick(updates.values()):
+                if event is not None:  # Not a delete
+                    logger.info("Shipment update received: %s", event)
+            with upsert_seconds.time():
+                await apply_updates(updates, invalid)
+            checkpointer.track(batch)
+            checkpointer.maybe_save(shipments)
+            await asyncio.sleep(0)  # Let the UI run between batches
     except Exception as e:
-        ui.notify(f"Error consuming shipment updates: {e}", type="error")
+        broadcast(f"Error consuming shipment updates: {e}", type="error")
 
 
-async def debounce_update():
+async def apply_updates(updates, invalid=(), notify=True):
     """
-    Debounce UI updates to avoid frequent refreshes.
+    Apply shipment events to the store and refresh the sessions they match.
+
+    The store, the shipment history and the shared map index are
+    updated once; `hub` then marks the change only in the sessions whose
+    filters matched an updated shipment before or after the change, and
+    only those sessions schedule a refresh. A deleted shipment is also
+    forgotten by `ordering`, `lanes`, `eta_engine` and `history`.
 
-    Cancels any ongoing update task and schedules a new one after a
-    short delay.
+    Parameters
+    ----------
+    updates : dict
+        The latest valid event per shipment ID, or None for a shipment
+        deleted by a tombstone.
+    invalid : list, optional
+        Rejected events, counted in every session's notifications.
+    notify : bool, optional
+        Whether to count the events in the sessions' notifications.
     """
-    global update_task
-    if update_task:
-        update_task.cancel()
-    update_task = asyncio.create_task(update_ui())
+    previous = {shipment_id: shipments.get(shipment_id) for shipment_id in updates}
+    shipments.update(updates)
+    events = {}
+    for shipment_id, event in updates.items():
+        if event is not None:
+            events[shipment_id] = event
+        else:
+            forget_shipment(shipment_id)
+    history.record(events)
+    for session in hub.publish(shipments, updates, previous, invalid, notify):
+        schedule_update(session)  # One refresh request per batch
+
+
+def forget_shipment(shipment_id):
+    """
+    Drop what the pipeline keeps of a deleted shipment.
+
+    Parameters
+    ----------
+    shipment_id : str
+        The shipment that was deleted.
+    """
+    ordering.forget(shipment_id)
+    lanes.forget(shipment_id)
+    eta_engine.forget(shipment_id)
+    history.forget(shipment_id)
 
 
-async def update_ui():
+async def apply_snapshot(restored):
     """
-    Update the UI components, including the shipment list and map.
+    Load restored shipments into the store and sessions.
 
-    This function waits for a short delay before refreshing the UI to
-    reduce the frequency of updates.
+    Parameters
+    ----------
+    restored : list of ShipmentEvent
+        The shipments of the last snapshot.
     """
-    await sleep(0.5)  # Wait for 500ms before updating
-    await update_shipment_list()
-    await update_shipment_map()
+    for event in restored:
+        ordering.accept(event)
+    await apply_updates(
+        {event["shipment_id"]: event for event in restored}, notify=False
+    )
 
 
-async def update_shipment_list():
+async def follow_shared_view(path=SHARED_VIEW_PATH):
     """
-    Refresh the shipment list in the UI based on the selected status.
+    Apply the shipments an ingest worker writes to a shared view.
+
+    This replaces `consume_shipment_updates` in a UI replica. The whole
+    view is loaded first, which ends the spinner even if the view is
+    still empty. Then only the shipments written since the previous
+    check are applied, each time with a single refresh.
 
-    The function clears the current shipment table and repopulates it
-    with shipments matching the selected status filter.
+    Parameters
+    ----------
+    path : str, optional
+        The shared view database.
     """
-    with ui.loading():
-        shipment_table.clear()
-        with shipment_table:
-            ui.label("Shipment ID | Status | Location | Timestamp | ETA").style(
-                "font-weight: bold;"
-            )
-            for shipment in shipments.values():
-                if selected_status == "All" or shipment["status"] == selected_status:
-                    eta = calculate_eta(shipment)
-                    ui.label(
-                        f"{shipment['shipment_id']} | {shipment['status']} | {shipment['location']} | {shipment['timestamp']} | {eta}"
-                    )
-
-
-async def update_shipment_map():
-    """
-    Update the map with current shipment locations based on the selected status.
-
-    Filters shipments by the selected status and updates the map with
-    their locations.
-    """
-    filtered_shipments = [
-        s
-        for s in shipments.values()
-        if selected_status == "All" or s["status"] == selected_status
-    ]
-    locations = [
-        go.Scattergeo(
-            lon=[float(s["longitude"]) for s in filtered_shipments if "longitude" in s],
-            lat=[float(s["latitude"]) for s in filtered_shipments if "latitude" in s],
-            text=[s["shipment_id"] for s in filtered_shipments],
-            mode="markers",
-            marker=dict(size=10, color="blue"),
+    view = SharedView(path)
+    try:
+        await apply_updates(await asyncio.to_thread(view.changes), notify=False)
+        hub.loading = False
+        async for updates in view.follow():
+            await apply_updates(updates)
+    except (sqlite3.Error, OSError) as e:
+        broadcast(f"Error reading shared shipment view: {e}", type="error")
+    finally:
+        view.close()
+
+
+async def catch_up():
+    """
+    Load the compacted shipment topic in parallel before tailing it.
+
+    Every partition is read to its current end on its own thread and
+    consumer, starting after the snapshot if there is one. The store
+    and sessions are not touched until all partitions are loaded, so
+    nothing is rendered during catch-up; ``hub.progress`` drives a
+    progress bar under the spinner instead.
+    """
+
+    def show_progress(fraction):
+        hub.progress = fraction
+
+    show_progress(0.0)
+    try:
+        updates, positions = await bootstrap_partitions(
+            make_consumer,
+            SHIPMENT_TOPIC,
+            checkpointer.offsets,
+            is_valid_shipment,
+            ordering,
+            on_progress=show_progress,
         )
-    ]
-    shipment_map.figure = go.Figure(
-        data=locations, layout=go.Layout(title="Real-Time Shipment Locations")
+    finally:
+        hub.progress = None
+    eta_engine.annotate(updates.values())
+    await apply_updates(updates, notify=False)
+    checkpointer.offsets.update(positions)
+
+
+def format_update_notice(event):
+    """
+    Format a shipment update for the notification details log.
+
+    Parameters
+    ----------
+    event : dict
+        The applied shipment event.
+
+    Returns
+    -------
+    str
+        The log line.
+    """
+    return f"Shipment {event['shipment_id']} updated: {event['status']} at {event['location']}"
+
+
+def format_invalid_notice(event):
+    """
+    Format an invalid shipment event for the notification details log.
+
+    Parameters
+    ----------
+    event : dict
+        The rejected event.
+
+    Returns
+    -------
+    str
+        The log line.
+    """
+    return f"Invalid shipment data received: {event}"
+
+
+def make_notifications():
+    """
+    Create the notifications of one browser.
+
+    Returns
+    -------
+    NotificationAggregator
+        Aggregates shipment updates and invalid events.
+    """
+    return NotificationAggregator(
+        {
+            "updated": ("{count} shipments updated", "info", format_update_notice),
+            "invalid": ("{count} invalid", "warning", format_invalid_notice),
+        }
     )
 
 
+def broadcast(message, type="info"):
+    """
+    Show a toast in every connected browser.
+
+    Parameters
+    ----------
+    message : str
+        The message to show.
+    type : str, optional
+        The toast type.
+    """
+    for session in list(hub.sessions):
+        with session.client:
+            ui.notify(message, type=type)
+
+
+def schedule_update(session, immediate=False):
+    """
+    Ask for a refresh of a browser.
+
+    Requests are coalesced by the session's `RefreshScheduler`: the
+    first one after a quiet period renders right away, later ones wait
+    for a lull in the traffic, at most ``REFRESH_MAX_WAIT_S``.
+
+    Parameters
+    ----------
+    session : Session
+        The browser to refresh.
+    immediate : bool, optional
+        Refresh as soon as possible, e.g. after the user changed a filter.
+
+    Returns
+    -------
+    asyncio.Task
+        The task that will refresh the browser.
+    """
+    return session.refresh.request(immediate)
+
+
+async def update_ui(session):
+    """
+    Update the UI components, including the shipment list and map.
+
+    Only called by the session's `RefreshScheduler`, which decides how
+    often this runs.
+
+    Parameters
+    ----------
+    session : Session
+        The browser to refresh.
+    """
+    await update_shipment_list(session)
+    await update_shipment_map(session)
+
+
+async def update_shipment_list(session):
+    """
+    Refresh the shipment list of a browser based on its filters.
+
+    In the rows view only the rows of shipments that changed since the
+    last refresh are patched, inserted or removed. In the grid view the
+    current page is re-queried from the store. Rows are formatted, and
+    pages sorted, on a `render_pool` thread.
+
+    Parameters
+    ----------
+    session : Session
+        The browser to refresh.
+    """
+    with list_seconds.time():
+        await render_pool.render(session.view, shipments, session.status, session.term)
+
+
+def format_shipment_row(shipment):
+    """
+    Format a shipment as a row of the shipment table.
+
+    Parameters
+    ----------
+    shipment : dict
+        The shipment to format.
+
+    Returns
+    -------
+    str
+        The row text, including the ETA.
+    """
+    eta = calculate_eta(shipment)
+    return f"{shipment['shipment_id']} | {shipment['status']} | {shipment['location']} | {shipment['timestamp']} | {eta}"
+
+
+def format_grid_row(shipment):
+    """
+    Format a shipment as a row of the shipment grid.
+
+    Parameters
+    ----------
+    shipment : dict
+        The shipment to format.
+
+    Returns
+    -------
+    dict
+        The row, with a key per grid column.
+    """
+    return {
+        "shipment_id": shipment["shipment_id"],
+        "status": shipment["status"],
+        "location": shipment["location"],
+        "timestamp": shipment["timestamp"],
+        "eta": calculate_eta(shipment),
+    }
+
+
+async def update_shipment_map(session):
+    """
+    Update the map of a browser with current shipment locations based on its status filter.
+
+    Only the points of shipments that changed since the last refresh are
+    sent to the browser; the figure itself is not rebuilt. Positions are
+    worked out on a `render_pool` thread. If the browser shows trails,
+    those of the most recently updated shipments are sent along.
+
+    Parameters
+    ----------
+    session : Session
+        The browser to refresh.
+    """
+    with map_seconds.time():
+        await render_pool.render(session.map, shipments, session.status)
+        if session.trails:
+            push_trails(session)
+
+
+def history_status(session):
+    """Get the status filter of a browser as a `ShipmentHistory` filter."""
+    return None if session.status == "All" else session.status
+
+
+def push_trails(session):
+    """
+    Draw the recent trails of the shipments a browser shows.
+
+    Parameters
+    ----------
+    session : Session
+        The browser to draw the trails of.
+    """
+    lat, lon, _ = history.trails(history_status(session), HISTORY_MAX_TRAILS)
+    session.map.show_trails(lat, lon)
+
+
+def show_trails(session, enabled):
+    """
+    Turn the shipment trails of a browser's map on or off.
+
+    Parameters
+    ----------
+    session : Session
+        The browser whose switch changed.
+    enabled : bool
+        Whether to draw the trails.
+    """
+    session.trails = enabled
+    if enabled:
+        push_trails(session)
+    else:
+        session.map.show_trails([], [])
+
+
+def replay(session, position):
+    """
+    Show the fleet of a browser's map as it was at a past instant.
+
+    The instant is read from the shipment history in memory, so the
+    slider can be dragged freely.
+
+    Parameters
+    ----------
+    session : Session
+        The browser whose slider moved.
+    position : float
+        How far into the history window to replay, from 0 to
+        `REPLAY_STEPS`; `REPLAY_STEPS` shows the live fleet.
+    """
+    span = history.span()
+    if position >= REPLAY_STEPS or span is None:
+        if session.replay_at is not None:
+            session.replay_at = None
+            session.map.show_replay()
+        return
+    oldest, newest = span
+    session.replay_at = oldest + (newest - oldest) * position / REPLAY_STEPS
+    push_replay(session)
+
+
+def push_replay(session):
+    """
+    Draw the shipments a browser shows as they were at its replay instant.
+
+    Parameters
+    ----------
+    session : Session
+        The browser to draw the past fleet of.
+    """
+    shipment_ids, lat, lon, _ = history.at(session.replay_at, history_status(session))
+    session.map.show_replay(lat, lon, shipment_ids)
+
+
 def calculate_eta(shipment):
     """
     Calculate the estimated time of arrival (ETA) for a shipment.
@@ -133,32 +587,62 @@ def calculate_eta(shipment):
         The estimated time of arrival in hours, or "Unknown ETA" if
         required data is missing.
     """
-    try:
-        current_location = (float(shipment["latitude"]), float(shipment["longitude"]))
-        destination = (40.7128, -74.0060)  # Example: New York City coordinates
-        distance = geodesic(current_location, destination).kilometers
-        average_speed = 60  # Assume 60 km/h
-        eta_hours = distance / average_speed
-        return f"{eta_hours:.1f} hours"
-    except KeyError:
+    hours = eta_hours(shipment)
+    if hours is None:
         return "Unknown ETA"
+    return f"{hours:.1f} hours"
+
+
+def eta_hours(shipment):
+    """
+    Calculate the hours until a shipment arrives.
+
+    Parameters
+    ----------
+    shipment : dict
+        A dictionary containing shipment details, including latitude
+        and longitude.
 
+    Returns
+    -------
+    float or None
+        The estimated hours to arrival, or None if required data is
+        missing.
+
+    Notes
+    -----
+    Stored shipments carry the ``eta_hours`` computed at ingest. For
+    other shipments the ETA comes from the `eta_engine` cache unless
+    the shipment moved since it was last computed.
+    """
+    if "eta_hours" in shipment:
+        return shipment["eta_hours"]
+    return eta_engine.hours([shipment])[0]
 
-def set_status_filter(status):
+
+SORT_KEYS = {
+    "status": lambda shipment: shipment["status"],
+    "timestamp": lambda shipment: shipment["timestamp"],
+    "eta": eta_hours,
+}
+
+
+def set_status_filter(session, status):
     """
-    Update the selected status filter and refresh the UI.
+    Update the status filter of a browser and refresh its UI.
 
     Parameters
     ----------
+    session : Session
+        The browser whose filter changed.
     status : str
         The status to filter shipments by.
     """
-    global selected_status
-    selected_status = status
-    asyncio.create_task(
-        update_shipment_list()
-    )  # Retain asyncio.create_task for background updates
-    asyncio.create_task(update_shipment_map())
+    session.status = status
+    session.invalidate()
+    if session.replay_at is not None:
+        push_replay(session)
+    schedule_update(session, immediate=True)
 
 
 def is_valid_shipment(event):
@@ -167,80 +651,195 @@ def is_valid_shipment(event):
 
     Parameters
     ----------
-    event : dict
+    event : ShipmentEvent, InvalidShipment or dict
         The shipment event data to validate.
 
     Returns
     -------
     bool
         True if the event contains all required fields, False otherwise.
+
+    Notes
+    -----
+    Events decoded by `make_decoder` were validated while decoding, so
+    only plain dicts are checked here.
     """
-    required_fields = {"shipment_id", "status", "location", "timestamp"}
-    return required_fields.issubset(event.keys())
+    if isinstance(event, ShipmentEvent):
+        return True
+    if isinstance(event, InvalidShipment):
+        return False
+    return REQUIRED_FIELDS.issubset(event.keys())
 
 
-def filter_shipments(shipment_id):
+def filter_shipments(session, shipment_id):
     """
-    Filter shipments by the given shipment ID and update the UI.
+    Filter the shipments of a browser by the given shipment ID and update its UI.
+
+    Called on every keystroke. The search runs once typing pauses, and
+    a newer keystroke cancels a search that has not finished; see
+    `SearchPipeline`.
 
     Parameters
     ----------
+    session : Session
+        The browser that searched.
     shipment_id : str
         The shipment ID to filter by.
+
+    Returns
+    -------
+    asyncio.Task
+        The task that searches and shows the result.
     """
-    filtered_shipments = {k: v for k, v in shipments.items() if shipment_id in k}
-    with ui.loading():
-        shipment_table.clear()
-        with shipment_table:
-            ui.label("Shipment ID | Status | Location | Timestamp | ETA").style(
-                "font-weight: bold;"
-            )
-            for shipment in filtered_shipments.values():
-                eta = calculate_eta(shipment)
-                ui.label(
-                    f"{shipment['shipment_id']} | {shipment['status']} | {shipment['location']} | {shipment['timestamp']} | {eta}"
-                )
+    return session.search.submit(
+        shipment_id or "", lambda term: show_search(session, term)
+    )
+
+
+async def show_search(session, term):
+    """
+    Search the shipments of a browser and stream the result into its list.
+
+    The search is combined with the selected status filter; rows that
+    no longer match are removed and newly matching rows are inserted,
+    a chunk at a time.
+
+    Parameters
+    ----------
+    session : Session
+        The browser that searched.
+    term : str
+        The shipment ID to filter by.
+    """
+    status = session.status
+    matching = await session.search.query(shipments, status, term)
+    if session.status != status:
+        return  # The status filter changed while searching
+    session.term = term
+    await session.view.stream(shipments, status, term, matching)
 
 
 def shutdown():
     """
     Shut down the application gracefully.
 
-    Closes the Kafka consumer and notifies the user of the shutdown.
+    Stops the consumer thread, snapshots the shipments so that the next
+    start resumes from here, closes the Kafka consumer, stops the render
+    threads and notifies the user of the shutdown.
     """
-    consumer.close()
-    ui.notify("Application shutting down...", type="info")
+    if ingest_thread:
+        ingest_thread.stop()
+        ingest_thread.join(timeout=1)
+        try:
+            checkpointer.save(shipments)
+        except OSError as e:
+            logger.error("Could not write the shutdown snapshot: %s", e)
+    if consumer is not None:
+        consumer.close()
+    render_pool.shutdown()
+    broadcast("Application shutting down...", type="info")
+
 
 def start_task(routine):
     """Start the background task and show a loading spinner."""
-    spinner.visible = True  # Show spinner
-    ui.run_task(routine, on_done=lambda _: spinner.visible = False)
+    hub.loading = True  # Show spinner
+    task = background_tasks.create(routine, name=routine.__name__)
+    task.add_done_callback(lambda _: setattr(hub, "loading", False))
+    return task
+
 
 # Register signal handlers for graceful shutdown
 signal.signal(signal.SIGINT, lambda *_: shutdown())
 signal.signal(signal.SIGTERM, lambda *_: shutdown())
 
-# UI layout
-ui.label("📦 Real-Time Shipment Tracking").classes("text-2xl font-bold")
-ui.label("Filter by Status:")
-
 STATUS_OPTIONS = ["All", "In Transit", "Out for Delivery", "Delivered"]
+REPLAY_STEPS = 1000
 
-status_filter = ui.select(
-    STATUS_OPTIONS,
-    value="All",
-    on_change=lambda e: set_status_filter(e.value),
-)
 
-ui.button("Refresh", on_click=lambda: asyncio.create_task(update_ui()))
-ui.input("Search by Shipment ID", on_change=lambda e: filter_shipments(e.value))
-shipment_table = ui.column()
-figure = go.Figure(data=[], layout=go.Layout(title="Real-Time Shipment Locations"))
-shipment_map = ui.plotly(figure)
+@ui.page("/")
+async def index(client):
+    """
+    Build the dashboard for one browser.
+
+    Every browser gets its own `Session` with its own filters, list, map
+    and notifications, registered with `hub` once it is connected. The
+    shipments and their ingest are shared by all browsers.
+
+    Parameters
+    ----------
+    client : nicegui.Client
+        The connecting browser.
+    """
+    ui.label("📦 Real-Time Shipment Tracking").classes("text-2xl font-bold")
+    ui.label("Filter by Status:")
+
+    ui.select(
+        STATUS_OPTIONS,
+        value="All",
+        on_change=lambda e: set_status_filter(session, e.value),
+    )
+
+    ui.button("Refresh", on_click=lambda: schedule_update(session, immediate=True))
+    ui.input(
+        "Search by Shipment ID", on_change=lambda e: filter_shipments(session, e.value)
+    )
+    ui.switch("Show trails", on_change=lambda e: show_trails(session, e.value))
+    ui.label("Replay:")
+    ui.slider(
+        min=0,
+        max=REPLAY_STEPS,
+        value=REPLAY_STEPS,
+        on_change=lambda e: replay(session, e.value),
+    )
+    if SHIPMENT_VIEW == "grid":
+        shipment_view = ShipmentGrid(format_grid_row, SORT_KEYS)
+    else:
+        shipment_table = ui.column()
+        with shipment_table:
+            ui.label("Shipment ID | Status | Location | Timestamp | ETA").style(
+                "font-weight: bold;"
+            )
+        shipment_view = ShipmentRows(shipment_table, format_shipment_row)
+    shipment_map = ShipmentMap(spatial=hub.spatial)
+    session = Session(shipment_view, shipment_map, make_notifications(), client)
+    session.refresh = RefreshScheduler(
+        lambda: update_ui(session),
+        on_render=lambda waited, _: refresh_wait_seconds.record(waited),
+    )
+    session.notifications.drill_down()
+    ui.timer(NOTIFY_INTERVAL_S, session.notifications.flush)
+    ui.spinner(size="lg").bind_visibility_from(hub, "loading")
+    ui.linear_progress(show_value=False).bind_value_from(
+        hub, "progress", backward=lambda progress: progress or 0
+    ).bind_visibility_from(hub, "progress", backward=lambda p: p is not None)
+
+    await client.connected()
+    hub.add(session)
+    client.on_delete(lambda: hub.remove(session))
+    schedule_update(session, immediate=True)
+
+
+@app.get("/metrics")
+def serve_metrics():
+    """
+    Serve the pipeline metrics in the Prometheus text format.
+
+    Returns
+    -------
+    PlainTextResponse
+        Histograms as summaries with their quantiles, counters and gauges.
+    """
+    return PlainTextResponse(
+        metrics.exposition(), media_type="text/plain; version=0.0.4"
+    )
 
-# Start consuming shipment updates in the background
-nTask = start_task(consume_shipment_updates())
 
-logger.info("Application started.")
+# Start consuming shipment updates in the background once the loop runs
+if SHARED_VIEW_PATH is None:
+    app.on_startup(lambda: start_task(consume_shipment_updates()))
+else:
+    app.on_startup(lambda: start_task(follow_shared_view()))
 
-ui.run(title="Shipment Tracking Dashboard")
+if __name__ in {"__main__", "__mp_main__"}:
+    logger.info("Application started.")
+    ui.run(title="Shipment Tracking Dashboard")
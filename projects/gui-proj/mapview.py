@@ -0,0 +1,479 @@
+import math
+
+import numpy as np
+from nicegui import ui
+
+from clusters import SpatialGrid, in_bounds
+from constants import MAP_INITIAL_CAPACITY, MAP_LEVEL_OF_DETAIL, MAP_POINTS_SCALE
+from store import ShipmentStore
+
+
+def _to_json_list(values):
+    # NaN is not valid JSON; Plotly skips null points instead
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+class ShipmentMap:
+    """
+    Shipment map that pushes incremental updates to the browser.
+
+    Every plotted shipment owns a slot in preallocated NumPy coordinate
+    arrays, which back the figure's points trace. New shipments are
+    appended with Plotly ``extendTraces``, which only sends their points.
+    Moved or removed shipments are pushed with a ``restyle``, which
+    replaces whole attributes: it sends the coordinate arrays of every
+    plotted shipment, and the labels only when points were added or
+    removed. The whole figure is only sent again when
+    the layout changes.
+
+    Two more traces show the recent trails of shipments as lines, see
+    `show_trails`, and the fleet at a past instant in place of the live
+    points, see `show_replay`.
+
+    With level of detail enabled, the positions of the shipments passed
+    to `mark_changed` are also kept in a `SpatialGrid`, or read from one
+    that is shared between maps and kept up to date by its owner. Below
+    ``points_scale`` the map shows one cluster marker with a count per
+    grid cell in a second trace; zoomed in, it only plots the shipments
+    inside the viewport.
+
+    Parameters
+    ----------
+    title : str, optional
+        Title of the map.
+    capacity : int, optional
+        Initial number of slots; the arrays double when full.
+    level_of_detail : bool, optional
+        Whether to cluster shipments when zoomed out.
+    points_scale : float, optional
+        Projection scale from which single shipments are plotted.
+    spatial : SpatialGrid, optional
+        A shared position index to use instead of one of its own; the
+        map then does not update it.
+    """
+
+    def __init__(
+        self,
+        title="Real-Time Shipment Locations",
+        capacity=MAP_INITIAL_CAPACITY,
+        level_of_detail=MAP_LEVEL_OF_DETAIL,
+        points_scale=MAP_POINTS_SCALE,
+        spatial=None,
+    ):
+        self.lat = np.full(capacity, np.nan)
+        self.lon = np.full(capacity, np.nan)
+        self.text = []
+        self.slots = {}
+        self.free_slots = []
+        self.changed = set()
+        self.full_render = True
+        self.generation = 0
+        self.layout_changed = False
+        self.owns_spatial = spatial is None
+        if not level_of_detail:
+            self.spatial = None
+        elif spatial is None:
+            self.spatial = SpatialGrid()
+        else:
+            self.spatial = spatial
+        self.points_scale = points_scale
+        self.scale = 1.0
+        self.center = (0.0, 0.0)
+        self.clustered = False
+        self._shipments = None
+        self._status = "All"
+        self.figure = {
+            "data": [
+                {
+                    "type": "scattergeo",
+                    "lat": self.lat[:0],
+                    "lon": self.lon[:0],
+                    "text": self.text,
+                    "mode": "markers",
+                    "marker": {"size": 10, "color": "blue"},
+                },
+                {
+                    "type": "scattergeo",
+                    "lat": [],
+                    "lon": [],
+                    "text": [],
+                    "mode": "markers+text",
+                    "marker": {"size": [], "color": "orange", "opacity": 0.7},
+                    "hoverinfo": "text",
+                },
+                {
+                    "type": "scattergeo",
+                    "lat": [],
+                    "lon": [],
+                    "mode": "lines",
+                    "line": {"width": 1, "color": "gray"},
+                    "hoverinfo": "skip",
+                },
+                {
+                    "type": "scattergeo",
+                    "lat": [],
+                    "lon": [],
+                    "text": [],
+                    "mode": "markers",
+                    "marker": {"size": 10, "color": "purple"},
+                    "visible": False,
+                },
+            ],
+            "layout": {"title": {"text": title}},
+        }
+        self.plot = ui.plotly(self.figure)
+        if self.spatial is not None:
+            self.plot.on("plotly_relayout", self._on_relayout)
+
+    def mark_changed(self, shipment_ids):
+        """
+        Record shipments whose points must be checked on the next render.
+
+        Parameters
+        ----------
+        shipment_ids : iterable
+            IDs of shipments that were inserted, updated or removed.
+        """
+        self.changed.update(shipment_ids)
+
+    def invalidate(self):
+        """Re-check every point on the next render, e.g. after a filter change."""
+        self.full_render = True
+        self.generation += 1
+
+    def set_layout(self, **layout):
+        """
+        Change the figure layout, which sends the whole figure on the next render.
+
+        Parameters
+        ----------
+        **layout
+            Plotly layout attributes to set.
+        """
+        self.figure["layout"].update(layout)
+        self.layout_changed = True
+
+    def show_trails(self, lat, lon):
+        """
+        Draw shipment trails, replacing the ones drawn before.
+
+        Parameters
+        ----------
+        lat, lon : numpy.ndarray
+            The coordinates of every trail, with NaN between trails as
+            returned by `ShipmentHistory.trails`; empty to clear them.
+        """
+        trace = self.figure["data"][2]
+        trace["lat"] = _to_json_list(np.asarray(lat, dtype=np.float64))
+        trace["lon"] = _to_json_list(np.asarray(lon, dtype=np.float64))
+        self.plot.run_plot_method(
+            "restyle", {"lat": [trace["lat"]], "lon": [trace["lon"]]}, [2]
+        )
+
+    def show_replay(self, lat=None, lon=None, text=None):
+        """
+        Show shipments at a past instant in place of the live points.
+
+        Live changes keep being applied to the hidden points, so going
+        back to live shows the current fleet at once.
+
+        Parameters
+        ----------
+        lat, lon : numpy.ndarray, optional
+            The past positions, as returned by `ShipmentHistory.at`;
+            None to go back to the live points.
+        text : list of str, optional
+            The shipment IDs of the positions.
+        """
+        replaying = lat is not None
+        trace = self.figure["data"][3]
+        if replaying:
+            trace["lat"] = _to_json_list(np.asarray(lat, dtype=np.float64))
+            trace["lon"] = _to_json_list(np.asarray(lon, dtype=np.float64))
+            trace["text"] = [str(shipment_id) for shipment_id in text]
+        else:
+            trace["lat"], trace["lon"], trace["text"] = [], [], []
+        self.plot.run_plot_method(
+            "restyle",
+            {"lat": [trace["lat"]], "lon": [trace["lon"]], "text": [trace["text"]]},
+            [3],
+        )
+        for index in (0, 1, 3):
+            self.figure["data"][index]["visible"] = replaying == (index == 3)
+        self.plot.run_plot_method(
+            "restyle",
+            {"visible": [not replaying, not replaying, replaying]},
+            [0, 1, 3],
+        )
+
+    def viewport(self):
+        """
+        Estimate the part of the map in view from the projection.
+
+        Returns
+        -------
+        tuple of float
+            Minimum latitude, maximum latitude, minimum longitude and
+            maximum longitude.
+        """
+        lat, lon = self.center
+        half_lat = 90 / self.scale
+        half_lon = 180 / self.scale
+        return lat - half_lat, lat + half_lat, lon - half_lon, lon + half_lon
+
+    def render(self, shipments, status):
+        """
+        Bring the map in line with the shipments store.
+
+        This runs `snapshot`, `prepare` and `apply` in a row; a
+        `RenderPool` runs `prepare` on a worker thread instead.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        status : str
+            The status to filter by, or "All" for any status.
+
+        Returns
+        -------
+        int
+            The number of points that were inserted, moved or removed.
+        """
+        return self.apply(self.prepare(self.snapshot(shipments, status)))
+
+    def snapshot(self, shipments, status):
+        """
+        Take the shipments the next render looks at.
+
+        Runs on the event loop, and updates the position index if the
+        map owns it.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        status : str
+            The status to filter by, or "All" for any status.
+
+        Returns
+        -------
+        tuple
+            The job to pass to `prepare`.
+        """
+        self._shipments = shipments
+        self._status = status
+        changed, self.changed = self.changed, set()
+        bounds = None
+        clustered = False
+        if self.spatial is not None:
+            if self.owns_spatial:
+                self.spatial.update(shipments, changed)
+            clustered = self.scale < self.points_scale
+            bounds = self.viewport()
+
+        full_render = self.full_render
+        if full_render:
+            self.full_render = False
+            if clustered:
+                shipment_ids = set(self.slots)
+            elif bounds is not None:
+                shipment_ids = set(self.spatial.ids_in(bounds)) | set(self.slots)
+            else:
+                shipment_ids = dict.fromkeys(shipments.select(status))
+                shipment_ids.update(dict.fromkeys(self.slots))
+        else:
+            shipment_ids = changed
+        return (
+            self.generation,
+            status,
+            clustered,
+            bounds,
+            full_render,
+            bool(changed),
+            dict(zip(shipment_ids, map(shipments.get, shipment_ids))),
+        )
+
+    def prepare(self, job):
+        """
+        Work out where the points of a job go.
+
+        Touches neither the UI nor the store, so it may run on any
+        thread.
+
+        Parameters
+        ----------
+        job : tuple
+            A job returned by `snapshot`.
+
+        Returns
+        -------
+        tuple
+            The payload to pass to `apply`: the position of each point,
+            or None for points to remove.
+        """
+        generation, status, clustered, bounds, full_render, changed, snapshot = job
+        positions = {}
+        for shipment_id, shipment in snapshot.items():
+            position = None
+            if (
+                not clustered
+                and shipment is not None
+                and ShipmentStore.matches(shipment, status)
+            ):
+                position = self._position(shipment)
+                if (
+                    bounds is not None
+                    and position is not None
+                    and not in_bounds(position, bounds)
+                ):
+                    position = None
+            positions[shipment_id] = position
+        return generation, status, clustered, full_render, changed, positions
+
+    def apply(self, payload):
+        """
+        Move, add or remove the points of a prepared payload.
+
+        A payload prepared before the map was invalidated, panned or
+        zoomed is dropped, and its shipments are checked again on the
+        next render.
+
+        Parameters
+        ----------
+        payload : tuple
+            A payload returned by `prepare`.
+
+        Returns
+        -------
+        int
+            The number of points that were inserted, moved or removed.
+        """
+        generation, status, clustered, full_render, changed, positions = payload
+        if generation != self.generation:
+            self.changed.update(positions)
+            return 0
+        push_clusters = (
+            clustered != self.clustered
+            or (clustered and changed)
+            or (clustered and full_render)
+        )
+        self.clustered = clustered
+
+        size = len(self.text)
+        appended = []
+        restyle = relabel = False
+        patched = 0
+        for shipment_id, position in positions.items():
+            slot = self.slots.get(shipment_id)
+            if position is not None:
+                if slot is None:
+                    slot = self._allocate(shipment_id)
+                    if slot >= size:
+                        appended.append(slot)
+                    else:
+                        restyle = relabel = True
+                elif (self.lat[slot], self.lon[slot]) != position:
+                    restyle = True
+                else:
+                    continue
+                self.lat[slot], self.lon[slot] = position
+                patched += 1
+            elif slot is not None:
+                self._release(shipment_id)
+                restyle = relabel = True
+                patched += 1
+
+        if patched or self.layout_changed:
+            self._push(appended, restyle, relabel)
+        if push_clusters:
+            self._push_clusters(status if clustered else None)
+        return patched
+
+    def _position(self, shipment):
+        try:
+            return float(shipment["latitude"]), float(shipment["longitude"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _allocate(self, shipment_id):
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.text[slot] = str(shipment_id)
+        else:
+            slot = len(self.text)
+            if slot == len(self.lat):
+                grow = np.full(max(slot, 1), np.nan)
+                self.lat = np.concatenate([self.lat, grow])
+                self.lon = np.concatenate([self.lon, grow])
+            self.text.append(str(shipment_id))
+        self.slots[shipment_id] = slot
+        return slot
+
+    def _release(self, shipment_id):
+        slot = self.slots.pop(shipment_id)
+        self.lat[slot] = self.lon[slot] = np.nan
+        self.text[slot] = ""
+        self.free_slots.append(slot)
+
+    def _push(self, appended, restyle, relabel):
+        # Keep the figure in line so that newly connected clients get it
+        trace = self.figure["data"][0]
+        trace["lat"] = self.lat[: len(self.text)]
+        trace["lon"] = self.lon[: len(self.text)]
+
+        if self.layout_changed:
+            self.layout_changed = False
+            self.plot.update()
+        elif restyle:
+            update = {
+                "lat": [_to_json_list(trace["lat"])],
+                "lon": [_to_json_list(trace["lon"])],
+            }
+            if relabel or appended:  # New points need their labels too
+                update["text"] = [self.text]
+            self.plot.run_plot_method("restyle", update, [0])
+        else:
+            self.plot.run_plot_method(
+                "extendTraces",
+                {
+                    "lat": [self.lat[appended].tolist()],
+                    "lon": [self.lon[appended].tolist()],
+                    "text": [[self.text[slot] for slot in appended]],
+                },
+                [0],
+            )
+
+    def _push_clusters(self, status):
+        clusters = []
+        if status is not None:
+            level = min(
+                int(math.log2(max(self.scale, 1))), len(self.spatial.levels) - 1
+            )
+            clusters = self.spatial.clusters(level, status)
+        update = {
+            "lat": [lat for lat, _, _ in clusters],
+            "lon": [lon for _, lon, _ in clusters],
+            "text": [str(count) for _, _, count in clusters],
+            "marker.size": [12 + 4 * math.log2(count) for _, _, count in clusters],
+        }
+        trace = self.figure["data"][1]
+        trace.update({key: update[key] for key in ("lat", "lon", "text")})
+        trace["marker"]["size"] = update["marker.size"]
+        self.plot.run_plot_method(
+            "restyle", {key: [values] for key, values in update.items()}, [1]
+        )
+
+    def _on_relayout(self, e):
+        scale = e.args.get("geo.projection.scale", self.scale)
+        center = (
+            e.args.get("geo.center.lat", self.center[0]),
+            e.args.get("geo.center.lon", self.center[1]),
+        )
+        if (scale, center) == (self.scale, self.center):
+            return
+        self.scale, self.center = scale, center
+        self.full_render = True
+        self.generation += 1
+        if self._shipments is not None:
+            self.render(self._shipments, self._status)
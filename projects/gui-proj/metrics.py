@@ -0,0 +1,394 @@
+import math
+import time
+from itertools import islice
+
+from constants import (
+    EVENT_LOG_EVERY,
+    HISTOGRAM_HIGHEST_S,
+    HISTOGRAM_LOWEST_S,
+    HISTOGRAM_SUB_BUCKETS,
+)
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+"""
+tuple of float: Quantiles of each histogram exposed on ``/metrics``.
+"""
+
+
+class Histogram:
+    """
+    Latency histogram with log-linear buckets, like an HdrHistogram.
+
+    Values are counted in units of ``lowest_s``. Below ``sub_buckets``
+    units every value has a bucket of its own; above, each power of two
+    is split into ``sub_buckets / 2`` equal buckets. The relative error
+    of a quantile is therefore at most ``2 / sub_buckets``, from the
+    lowest to the highest value, at the cost of a few hundred integers.
+    Recording is a few arithmetic operations and a list increment.
+
+    Parameters
+    ----------
+    name : str
+        The metric name.
+    help : str
+        The metric description.
+    lowest_s : float, optional
+        The smallest value told apart from zero, in seconds.
+    highest_s : float, optional
+        Larger values are counted as this value, in seconds.
+    sub_buckets : int, optional
+        A power of two setting the resolution.
+    """
+
+    type = "summary"
+
+    def __init__(
+        self,
+        name,
+        help,
+        lowest_s=HISTOGRAM_LOWEST_S,
+        highest_s=HISTOGRAM_HIGHEST_S,
+        sub_buckets=HISTOGRAM_SUB_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.lowest_s = lowest_s
+        self.sub_buckets = sub_buckets
+        self._sub_bits = sub_buckets.bit_length() - 1
+        self._highest = int(highest_s / lowest_s)
+        self.counts = [0] * (self._index(self._highest) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value_s):
+        """
+        Count one value.
+
+        Parameters
+        ----------
+        value_s : float
+            The value, in seconds.
+        """
+        units = min(int(value_s / self.lowest_s), self._highest)
+        self.counts[self._index(max(units, 0))] += 1
+        self.count += 1
+        self.sum += value_s
+        self.max = max(self.max, value_s)
+
+    def time(self):
+        """
+        Time a block of code into the histogram.
+
+        Returns
+        -------
+        context manager
+            Records the time spent in its ``with`` block.
+        """
+        return _Timer(self)
+
+    def quantile(self, q):
+        """
+        Estimate a quantile of the recorded values.
+
+        Parameters
+        ----------
+        q : float
+            The quantile, between 0 and 1.
+
+        Returns
+        -------
+        float
+            The middle of the bucket the quantile falls in, in seconds,
+            or 0.0 if nothing was recorded.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                low, high = self._bounds(index)
+                return min((low + high) / 2 * self.lowest_s, self.max)
+        return self.max
+
+    def samples(self):
+        """
+        Describe the histogram in the Prometheus text format.
+
+        Returns
+        -------
+        list of str
+            The exposition lines, as a summary.
+        """
+        lines = [
+            f'{self.name}{{quantile="{q}"}} {self.quantile(q):.9g}' for q in QUANTILES
+        ]
+        lines.append(f"{self.name}_sum {self.sum:.9g}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+    def _index(self, units):
+        if units < self.sub_buckets:
+            return units
+        shift = units.bit_length() - self._sub_bits
+        half = self.sub_buckets // 2
+        return self.sub_buckets + (shift - 1) * half + (units >> shift) - half
+
+    def _bounds(self, index):
+        if index < self.sub_buckets:
+            return index, index + 1
+        half = self.sub_buckets // 2
+        shift, offset = divmod(index - self.sub_buckets, half)
+        shift += 1
+        low = (offset + half) << shift
+        return low, low + (1 << shift)
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.record(time.perf_counter() - self.started)
+
+
+class Counter:
+    """
+    Monotonic count, kept here or read from elsewhere.
+
+    Parameters
+    ----------
+    name : str
+        The metric name, ending in ``_total``.
+    help : str
+        The metric description.
+    read : callable, optional
+        Returns the current value, or a dict mapping label dicts, as
+        tuples of (label, value) pairs, to values; used instead of
+        `inc` for counts that are kept elsewhere.
+    """
+
+    type = "counter"
+
+    def __init__(self, name, help, read=None):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.value = 0
+
+    def inc(self, amount=1):
+        """
+        Add to the count.
+
+        Parameters
+        ----------
+        amount : int, optional
+            How much to add.
+        """
+        self.value += amount
+
+    def samples(self):
+        """
+        Describe the counter in the Prometheus text format.
+
+        Returns
+        -------
+        list of str
+            The exposition lines.
+        """
+        return _samples(self.name, self.value if self.read is None else self.read())
+
+
+class Gauge(Counter):
+    """
+    Current value that can go up and down, read when it is exposed.
+
+    Parameters
+    ----------
+    name : str
+        The metric name.
+    help : str
+        The metric description.
+    read : callable
+        Returns the current value, or a dict mapping label dicts, as
+        tuples of (label, value) pairs, to values.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, help, read):
+        super().__init__(name, help, read)
+
+
+def _samples(name, value):
+    if not isinstance(value, dict):
+        return [f"{name} {value:.9g}"]
+    lines = []
+    for labels, labelled in value.items():
+        pairs = ",".join(f'{key}="{label}"' for key, label in labels)
+        lines.append(f"{name}{{{pairs}}} {labelled:.9g}")
+    return lines
+
+
+class Metrics:
+    """
+    Registry of the metrics exposed on ``/metrics``.
+
+    Metrics are registered once and recorded by the pipeline without
+    any locking: each one is only written by one thread.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def histogram(self, name, help, **kwargs):
+        """
+        Register a latency histogram.
+
+        Parameters
+        ----------
+        name : str
+            The metric name, ending in ``_seconds``.
+        help : str
+            The metric description.
+        **kwargs
+            Passed on to `Histogram`.
+
+        Returns
+        -------
+        Histogram
+            The new histogram.
+        """
+        return self._add(Histogram(name, help, **kwargs))
+
+    def counter(self, name, help, read=None):
+        """
+        Register a counter.
+
+        Parameters
+        ----------
+        name : str
+            The metric name, ending in ``_total``.
+        help : str
+            The metric description.
+        read : callable, optional
+            Returns the current value of a count kept elsewhere.
+
+        Returns
+        -------
+        Counter
+            The new counter.
+        """
+        return self._add(Counter(name, help, read))
+
+    def gauge(self, name, help, read):
+        """
+        Register a gauge.
+
+        Parameters
+        ----------
+        name : str
+            The metric name.
+        help : str
+            The metric description.
+        read : callable
+            Returns the current value.
+
+        Returns
+        -------
+        Gauge
+            The new gauge.
+        """
+        return self._add(Gauge(name, help, read))
+
+    def exposition(self):
+        """
+        Describe all metrics in the Prometheus text format.
+
+        Returns
+        -------
+        str
+            The body of a ``/metrics`` response.
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+
+def timed(histogram, function):
+    """
+    Wrap a function so that every call is timed into a histogram.
+
+    Parameters
+    ----------
+    histogram : Histogram
+        Records the time of each call.
+    function : callable
+        The function to time.
+
+    Returns
+    -------
+    callable
+        Calls ``function`` with the same arguments.
+    """
+
+    def call(*args):
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            histogram.record(time.perf_counter() - started)
+
+    return call
+
+
+class LogSampler:
+    """
+    Let one in every ``every`` events through to a per-event log.
+
+    Parameters
+    ----------
+    every : int, optional
+        Log one event in this many; 1 logs every event and 0 none.
+    """
+
+    def __init__(self, every=EVENT_LOG_EVERY):
+        self.every = every
+        self.seen = 0
+
+    def pick(self, events):
+        """
+        Pick the events of a batch to log.
+
+        Parameters
+        ----------
+        events : collection
+            The events of a batch, in order.
+
+        Returns
+        -------
+        iterator
+            The sampled events; the others are skipped without being
+            looked at.
+        """
+        seen, self.seen = self.seen, self.seen + len(events)
+        if not self.every:
+            return iter(())
+        return islice(events, (self.every - 1 - seen) % self.every, None, self.every)
@@ -0,0 +1,171 @@
+import time
+from collections import deque
+
+from nicegui import ui
+
+from constants import NOTIFY_BURST, NOTIFY_DRILL_DOWN_LINES, NOTIFY_RATE
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+    burst : int
+        Maximum number of tokens held.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Take a token if one is available.
+
+        Returns
+        -------
+        bool
+            True if a token was taken.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class NotificationAggregator:
+    """
+    Coalesce per-event notifications into rate-limited summary toasts.
+
+    Events are only counted when they arrive. `flush`, called on a
+    timer, turns the counts into a single toast such as "312 shipments
+    updated, 4 invalid in the last second". Each category has its own
+    token bucket; a category without a token keeps counting until a
+    later flush. The latest events of each category are formatted into
+    a drill-down log.
+
+    Parameters
+    ----------
+    categories : dict
+        Maps a category name to a tuple of its summary template, which
+        is formatted with ``count``, its toast type and a callable that
+        formats one event for the drill-down log.
+    rate : float, optional
+        Summary toasts per second allowed for each category.
+    burst : int, optional
+        Summary toasts each category may show back to back.
+    drill_down_lines : int, optional
+        Latest events kept per category for the drill-down log.
+    """
+
+    def __init__(
+        self,
+        categories,
+        rate=NOTIFY_RATE,
+        burst=NOTIFY_BURST,
+        drill_down_lines=NOTIFY_DRILL_DOWN_LINES,
+    ):
+        self.categories = categories
+        self.buckets = {name: TokenBucket(rate, burst) for name in categories}
+        self.counts = dict.fromkeys(categories, 0)
+        self.totals = dict.fromkeys(categories, 0)
+        self.recent = {name: deque(maxlen=drill_down_lines) for name in categories}
+        self.since = dict.fromkeys(categories, 0.0)
+        self.log = None
+
+    def add(self, category, event):
+        """
+        Count an event of a category.
+
+        Parameters
+        ----------
+        category : str
+            One of the configured category names.
+        event : object
+            The event, kept unformatted for the drill-down log.
+        """
+        if not self.counts[category]:
+            self.since[category] = time.monotonic()
+        self.counts[category] += 1
+        self.recent[category].append(event)
+
+    def add_many(self, category, events):
+        """
+        Count several events of a category at once.
+
+        Parameters
+        ----------
+        category : str
+            One of the configured category names.
+        events : collection
+            The events, kept unformatted for the drill-down log.
+        """
+        if not events:
+            return
+        if not self.counts[category]:
+            self.since[category] = time.monotonic()
+        self.counts[category] += len(events)
+        self.recent[category].extend(events)
+
+    def drill_down(self, max_lines=NOTIFY_DRILL_DOWN_LINES):
+        """
+        Create the drill-down log that lists individual events.
+
+        Parameters
+        ----------
+        max_lines : int, optional
+            Lines kept in the log.
+
+        Returns
+        -------
+        nicegui.ui.log
+            The log element.
+        """
+        with ui.expansion("Notification details"):
+            self.log = ui.log(max_lines=max_lines)
+        return self.log
+
+    def flush(self):
+        """
+        Show one summary toast for the events counted since the last flush.
+
+        Returns
+        -------
+        str or None
+            The message shown, or None if nothing was shown.
+        """
+        now = time.monotonic()
+        parts = []
+        toast_type = "info"
+        oldest = now
+        for name, (template, category_type, format_event) in self.categories.items():
+            count = self.counts[name]
+            if not count or not self.buckets[name].take():
+                continue
+            parts.append(template.format(count=count))
+            if category_type != "info":
+                toast_type = category_type
+            oldest = min(oldest, self.since[name])
+            if self.log is not None:
+                for event in self.recent[name]:
+                    self.log.push(format_event(event))
+            self.recent[name].clear()
+            self.totals[name] += count
+            self.counts[name] = 0
+        if not parts:
+            return None
+
+        elapsed = round(now - oldest)
+        window = "second" if elapsed <= 1 else f"{elapsed} seconds"
+        message = f"{', '.join(parts)} in the last {window}"
+        ui.notify(message, type=toast_type)
+        return message
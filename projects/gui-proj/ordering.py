@@ -0,0 +1,86 @@
+class EventOrdering:
+    """
+    Drop shipment events that are older than, or repeat, applied ones.
+
+    Kafka delivers at least once, so after a rebalance or a retry the
+    same record can arrive again, and a producer can send an old reading
+    late. For every shipment the version of the last accepted event is
+    kept: its ``timestamp`` and the partition and offset it was read
+    from. An event is accepted only if it moves its shipment forward.
+
+    - An event with an older timestamp is stale.
+    - An event read from the same partition at or before the last
+      accepted offset is a duplicate, as is an event with the same
+      timestamp when offsets are unknown.
+
+    Timestamps are compared as given, which orders ISO 8601 strings of
+    one format correctly. Timestamps that cannot be compared are
+    ordered by offset alone.
+
+    Attributes
+    ----------
+    dropped : dict of str to int
+        Number of "stale" and "duplicate" events dropped so far.
+    """
+
+    def __init__(self):
+        self.versions = {}
+        self.dropped = {"stale": 0, "duplicate": 0}
+
+    def accept(self, event, partition=None, offset=None):
+        """
+        Decide whether an event is newer than the last accepted one.
+
+        An accepted event becomes the version later events of its
+        shipment are compared with.
+
+        Parameters
+        ----------
+        event : ShipmentEvent or dict
+            The event, with ``shipment_id`` and ``timestamp`` fields.
+        partition : int, optional
+            The partition the event was read from.
+        offset : int, optional
+            The offset of the event within its partition.
+
+        Returns
+        -------
+        bool
+            True if the event should be applied.
+        """
+        shipment_id = event["shipment_id"]
+        timestamp = event["timestamp"]
+        previous = self.versions.get(shipment_id)
+        if previous is not None:
+            reason = self._drop_reason(previous, timestamp, partition, offset)
+            if reason is not None:
+                self.dropped[reason] += 1
+                return False
+        self.versions[shipment_id] = (timestamp, partition, offset)
+        return True
+
+    def forget(self, shipment_id):
+        """
+        Drop the version of a shipment, e.g. after it was removed.
+
+        Parameters
+        ----------
+        shipment_id : str
+            The shipment to forget.
+        """
+        self.versions.pop(shipment_id, None)
+
+    def _drop_reason(self, previous, timestamp, partition, offset):
+        last_timestamp, last_partition, last_offset = previous
+        try:
+            if timestamp < last_timestamp:
+                return "stale"
+            same_time = timestamp == last_timestamp
+        except TypeError:
+            same_time = False
+        if offset is not None and last_offset is not None:
+            if partition == last_partition and offset <= last_offset:
+                return "duplicate"
+        elif same_time:
+            return "duplicate"
+        return None
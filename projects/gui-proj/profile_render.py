@@ -0,0 +1,473 @@
+"""
+Headless profiler of what a dashboard refresh costs.
+
+Builds a dashboard session against a recording stand-in for NiceGUI's
+``ui``, loads a simulated fleet, and runs the dashboard's own
+`update_ui`, `update_shipment_list`, `update_shipment_map` and
+`filter_shipments` without a browser. Each refresh reports the elements
+it created, the bytes it would send over the websocket, the size of
+the map's Plotly figure JSON and its wall time.
+
+Profile one or more fleet sizes::
+
+    python profile_render.py 1000 100000
+
+With ``--max-growth``, the run fails when the elements or bytes of a
+refresh grow more than that factor from the smallest to the largest
+fleet, which catches refreshes that became O(N) in CI.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import itertools
+import json
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+from constants import STATUS_OPTIONS
+from decoding import make_decoder
+from ingest import fold_batch
+from ingest_worker import is_decoded
+from search import SearchPipeline
+from simulate import FakeConsumer, ShipmentSimulator
+
+SCENARIOS = ("layout", "initial", "batch", "filter", "search")
+"""
+tuple of str: The kinds of refresh profiled, in the order they run.
+
+"layout" builds a session, "initial" is its first refresh, "batch" a
+refresh after a batch of updates, "filter" one after a status filter
+change and "search" an ID search streamed into the list.
+"""
+
+UI_MODULES = ("main", "rows", "grid", "mapview", "notify")
+"""
+tuple of str: Modules whose ``ui`` is replaced by the recorder.
+"""
+
+
+def _plain(value):
+    if isinstance(value, RecordedElement):
+        return value.id
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return None
+
+
+def json_size(value):
+    """
+    Measure a value as NiceGUI would serialize it for the browser.
+
+    Parameters
+    ----------
+    value : object
+        Anything JSON-like; arrays count as lists, elements as their ID
+        and callables as nothing.
+
+    Returns
+    -------
+    int
+        The size of the compact JSON, in bytes.
+    """
+    return len(json.dumps(value, separators=(",", ":"), default=_plain).encode())
+
+
+class RecordedElement:
+    """
+    Stand-in for a NiceGUI element that records what it would send.
+
+    Creating it, assigning an attribute and calling any method are each
+    counted as one message with the JSON size of the values involved.
+    ``update`` of a Plotly element re-sends its whole figure.
+
+    Parameters
+    ----------
+    recorder : RecordingUI
+        Counts the messages.
+    tag : str
+        The ``ui`` function that created the element.
+    args : tuple
+        The positional arguments it was created with.
+    kwargs : dict
+        The keyword arguments it was created with.
+    """
+
+    def __init__(self, recorder, tag, args, kwargs):
+        state = {
+            "recorder": recorder,
+            "id": f"e{len(recorder.elements)}",
+            "tag": tag,
+            "args": args,
+            "text": args[0] if args and isinstance(args[0], str) else "",
+        }
+        self.__dict__.update(state)
+        recorder.elements.append(self)
+        recorder.send({"id": self.id, "tag": tag, "args": args, "kwargs": kwargs})
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            if name == "set_text":
+                self.__dict__["text"] = args[0]
+            if name == "update" and self.tag == "plotly":
+                self.recorder.send_figure(self.args[0])
+            else:
+                self.recorder.send({"id": self.id, name: [args, kwargs]})
+            return self
+
+        return method
+
+    def __setattr__(self, name, value):
+        self.__dict__[name] = value
+        self.recorder.send({"id": self.id, name: value})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class RecordingUI:
+    """
+    Stand-in for NiceGUI's ``ui`` that only counts what it would send.
+
+    Every ``ui`` function creates a `RecordedElement`. `take` returns the
+    elements, messages and bytes counted since its last call.
+
+    Attributes
+    ----------
+    elements : list of RecordedElement
+        Every element created.
+    """
+
+    def __init__(self):
+        self.elements = []
+        self.messages = 0
+        self.bytes = 0
+        self.figure_bytes = 0
+        self._taken = (0, 0, 0)
+
+    def __getattr__(self, tag):
+        if tag.startswith("__"):
+            raise AttributeError(tag)
+        return lambda *args, **kwargs: RecordedElement(self, tag, args, kwargs)
+
+    def send(self, message):
+        """
+        Count one message to the browser.
+
+        Parameters
+        ----------
+        message : object
+            The content of the message.
+        """
+        self.messages += 1
+        self.bytes += json_size(message)
+
+    def send_figure(self, figure):
+        """
+        Count a whole Plotly figure sent to the browser.
+
+        Parameters
+        ----------
+        figure : dict
+            The figure.
+        """
+        size = json_size(figure)
+        self.messages += 1
+        self.bytes += size
+        self.figure_bytes += size
+
+    def take(self):
+        """
+        Get the counts since the previous call.
+
+        Returns
+        -------
+        tuple of int
+            Elements created, messages and bytes sent.
+        """
+        now = (len(self.elements), self.messages, self.bytes)
+        taken = tuple(b - a for a, b in zip(self._taken, now))
+        self._taken = now
+        return taken
+
+
+@dataclasses.dataclass(slots=True)
+class RefreshCost:
+    """
+    What one profiled refresh cost.
+
+    Attributes
+    ----------
+    scenario : str
+        One of `SCENARIOS`.
+    elements : int
+        Elements created.
+    messages : int
+        Messages sent to the browser.
+    bytes : int
+        Bytes sent to the browser.
+    figure_bytes : int
+        Size of the map's Plotly figure JSON after the refresh, what
+        sending it whole would cost.
+    seconds : float
+        Wall time.
+    """
+
+    scenario: str
+    elements: int
+    messages: int
+    bytes: int
+    figure_bytes: int
+    seconds: float
+
+
+def import_dashboard():
+    """
+    Import the dashboard module without connecting to Kafka or serving it.
+
+    Returns
+    -------
+    module
+        The ``main`` module, with an idle `FakeConsumer` as its consumer.
+    """
+    if "main" not in sys.modules:
+        with (
+            patch(
+                "ingest.KafkaConsumer",
+                lambda **config: FakeConsumer((), config.get("value_deserializer")),
+            ),
+            patch("nicegui.ui.run"),
+        ):
+            import main  # noqa: F401
+    return sys.modules["main"]
+
+
+async def profile(shipments, view="grid", refreshes=10, batch_size=500, seed=0):
+    """
+    Profile the refreshes of one dashboard session over a simulated fleet.
+
+    Parameters
+    ----------
+    shipments : int
+        The size of the fleet.
+    view : str, optional
+        The shipment list to profile, "grid" or "rows".
+    refreshes : int, optional
+        Refreshes profiled for each of the repeated scenarios.
+    batch_size : int, optional
+        Updates applied before each "batch" refresh.
+    seed : int, optional
+        Seeds the simulated fleet.
+
+    Returns
+    -------
+    list of RefreshCost
+        The cost of every refresh, in the order of `SCENARIOS`.
+    """
+    main = import_dashboard()
+    recorder = RecordingUI()
+    simulator = ShipmentSimulator(shipments, seed=seed)
+    decoder = make_decoder()
+    store = main.ShipmentStore()
+    eta_engine = main.EtaEngine()
+    hub = main.SessionHub(main.SpatialGrid() if main.MAP_LEVEL_OF_DETAIL else None)
+
+    def apply(messages):
+        records = list(FakeConsumer(messages, decoder))
+        updates, _ = fold_batch(records, is_decoded)
+        eta_engine.annotate(updates.values())
+        previous = {shipment_id: store.get(shipment_id) for shipment_id in updates}
+        store.update(updates)
+        hub.publish(store, updates, previous, notify=False)
+
+    costs = []
+
+    def measure(scenario, started, session):
+        seconds = time.perf_counter() - started
+        elements, messages, sent = recorder.take()
+        figure = json_size(session.map.figure)
+        costs.append(RefreshCost(scenario, elements, messages, sent, figure, seconds))
+
+    with ExitStack() as stack:
+        for module in UI_MODULES:
+            stack.enter_context(patch(f"{module}.ui", recorder))
+        stack.enter_context(patch("main.shipments", store))
+        apply(simulator.messages())
+        recorder.take()
+
+        started = time.perf_counter()
+        if view == "grid":
+            shipment_view = main.ShipmentGrid(main.format_grid_row, main.SORT_KEYS)
+        else:
+            shipment_view = main.ShipmentRows(
+                recorder.column(), main.format_shipment_row
+            )
+        session = main.Session(
+            shipment_view,
+            main.ShipmentMap(spatial=hub.spatial),
+            main.make_notifications(),
+        )
+        session.search = SearchPipeline(delay_s=0)
+        session.notifications.drill_down()
+        hub.add(session)
+        measure("layout", started, session)
+
+        started = time.perf_counter()
+        await main.update_ui(session)
+        measure("initial", started, session)
+
+        for _ in range(refreshes):
+            apply(simulator.messages(batch_size))
+            recorder.take()
+            started = time.perf_counter()
+            await main.update_ui(session)
+            measure("batch", started, session)
+
+        statuses = itertools.cycle([*STATUS_OPTIONS[1:], STATUS_OPTIONS[0]])
+        for _ in range(refreshes):
+            session.status = next(statuses)
+            session.invalidate()
+            started = time.perf_counter()
+            await main.update_ui(session)
+            measure("filter", started, session)
+
+        term = simulator.ids[len(simulator.ids) // 2]
+        # Narrow down to one shipment, then widen back to a few thousand
+        terms = itertools.cycle(
+            [term[:length] for length in range(len(term) - 3, len(term) + 1)]
+        )
+        for _ in range(refreshes):
+            started = time.perf_counter()
+            await main.filter_shipments(session, next(terms))
+            measure("search", started, session)
+        hub.remove(session)
+    return costs
+
+
+def summarize(costs):
+    """
+    Sum up the refreshes of each scenario.
+
+    Parameters
+    ----------
+    costs : list of RefreshCost
+        The profiled refreshes.
+
+    Returns
+    -------
+    dict
+        The median of every figure of each scenario, and the slowest
+        wall time, by scenario.
+    """
+    summary = {}
+    for scenario in SCENARIOS:
+        runs = [cost for cost in costs if cost.scenario == scenario]
+        if not runs:
+            continue
+        summary[scenario] = {
+            field: statistics.median(getattr(run, field) for run in runs)
+            for field in ("elements", "messages", "bytes", "figure_bytes", "seconds")
+        }
+        summary[scenario]["max_seconds"] = max(run.seconds for run in runs)
+    return summary
+
+
+def growth(small, large):
+    """
+    Compare what refreshes send for a small and a large fleet.
+
+    Parameters
+    ----------
+    small : dict
+        The `summarize` result of the smaller fleet.
+    large : dict
+        The `summarize` result of the larger fleet.
+
+    Returns
+    -------
+    dict
+        How many times more elements and bytes each scenario took with
+        the large fleet, counting from at least one.
+    """
+    return {
+        scenario: {
+            field: max(large[scenario][field], 1) / max(small[scenario][field], 1)
+            for field in ("elements", "bytes")
+        }
+        for scenario in small
+        if scenario in large
+    }
+
+
+def _report(size, summary):
+    lines = [
+        f"{size} shipments",
+        (
+            f"  {'scenario':<8} {'elements':>9} {'messages':>9} {'bytes':>11} "
+            f"{'figure':>11} {'median ms':>10} {'max ms':>9}"
+        ),
+    ]
+    for scenario, figures in summary.items():
+        lines.append(
+            f"  {scenario:<8} {figures['elements']:>9.0f} {figures['messages']:>9.0f} "
+            f"{figures['bytes']:>11.0f} {figures['figure_bytes']:>11.0f} "
+            f"{figures['seconds'] * 1000:>10.1f} {figures['max_seconds'] * 1000:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    """Profile the fleet sizes given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "shipments", nargs="*", type=int, default=[1000], help="fleet sizes"
+    )
+    parser.add_argument("--view", choices=("grid", "rows"), default="grid")
+    parser.add_argument(
+        "--refreshes", type=int, default=10, help="refreshes per scenario"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    parser.add_argument(
+        "--max-growth",
+        type=float,
+        help="fail if elements or bytes of a refresh grow more than this "
+        "factor from the smallest to the largest fleet",
+    )
+    args = parser.parse_args()
+
+    summaries = {
+        size: asyncio.run(profile(size, args.view, args.refreshes, seed=args.seed))
+        for size in sorted(args.shipments)
+    }
+    summaries = {size: summarize(costs) for size, costs in summaries.items()}
+    sizes = list(summaries)
+    grown = growth(summaries[sizes[0]], summaries[sizes[-1]])
+    if args.json:
+        print(json.dumps({"sizes": summaries, "growth": grown}, indent=2))
+    else:
+        print(
+            "\n\n".join(_report(size, summary) for size, summary in summaries.items())
+        )
+    if args.max_growth is not None and len(sizes) > 1:
+        failed = [
+            f"{scenario} {field} grew {factor:.1f}x"
+            for scenario, factors in grown.items()
+            for field, factor in factors.items()
+            if factor > args.max_growth
+        ]
+        if failed:
+            sys.exit(f"From {sizes[0]} to {sizes[-1]} shipments: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
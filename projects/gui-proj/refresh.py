@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import math
+import time
+
+from constants import REFRESH_MAX_WAIT_S, REFRESH_MIN_INTERVAL_S, REFRESH_RENDER_SHARE
+
+logger = logging.getLogger(__name__)
+
+_SMOOTHING = 0.2
+
+
+def _ewma(average, sample):
+    return sample if average is None else average + _SMOOTHING * (sample - average)
+
+
+class RefreshScheduler:
+    """
+    Coalesce refresh requests into as few renders as the traffic allows.
+
+    The first request after a quiet period renders right away (leading
+    edge). Requests that arrive while a render is due are coalesced: the
+    render waits for a short lull in the requests, but never longer than
+    ``max_wait`` after the first of them, so a steady stream cannot
+    postpone it forever. Renders are at least ``interval`` apart.
+
+    The interval adapts to the cost of rendering: it is the smoothed
+    render time divided by ``render_share``, between ``min_interval`` and
+    ``max_wait``. The lull that is waited for adapts to the event rate:
+    it is twice the smoothed time between requests, so a burst is
+    rendered once, shortly after it ends.
+
+    All requests share one task, so refreshes fired from several places
+    never run side by side or cancel each other.
+
+    Parameters
+    ----------
+    render : callable
+        Coroutine function that refreshes the UI.
+    min_interval : float, optional
+        Shortest time between two renders, in seconds.
+    max_wait : float, optional
+        Longest time a request waits for its render, in seconds.
+    render_share : float, optional
+        Share of the time that may be spent rendering.
+    on_render : callable, optional
+        Called after every render with how long its first request
+        waited and how long it took to render, in seconds.
+    """
+
+    def __init__(
+        self,
+        render,
+        min_interval=REFRESH_MIN_INTERVAL_S,
+        max_wait=REFRESH_MAX_WAIT_S,
+        render_share=REFRESH_RENDER_SHARE,
+        on_render=None,
+    ):
+        self.render = render
+        self.on_render = on_render
+        self.min_interval = min_interval
+        self.max_wait = max_wait
+        self.render_share = render_share
+        self.interval = min_interval
+        self.render_s = None
+        self.gap_s = None
+        self.requests = 0
+        self.renders = 0
+        self.task = None
+        self._pending_since = None
+        self._last_request = None
+        self._last_render = -math.inf
+        self._immediate = False
+        self._wake = asyncio.Event()
+
+    @property
+    def rate(self):
+        """float: Smoothed number of requests per second."""
+        return 1 / self.gap_s if self.gap_s else 0.0
+
+    def request(self, immediate=False):
+        """
+        Ask for a refresh.
+
+        Parameters
+        ----------
+        immediate : bool, optional
+            Render as soon as the current render, if any, is done, e.g.
+            after the user changed a filter.
+
+        Returns
+        -------
+        asyncio.Task
+            The task that will render.
+        """
+        now = time.monotonic()
+        self.requests += 1
+        if self._last_request is not None:
+            self.gap_s = _ewma(self.gap_s, min(now - self._last_request, self.max_wait))
+        self._last_request = now
+        if self._pending_since is None:
+            self._pending_since = now
+        self._immediate = self._immediate or immediate
+        self._wake.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        return self.task
+
+    def due(self):
+        """
+        Get when the pending requests are rendered.
+
+        Returns
+        -------
+        float or None
+            A `time.monotonic` timestamp, or None if nothing is pending.
+        """
+        since = self._pending_since
+        if since is None:
+            return None
+        if self._immediate or since - self._last_render >= self.interval:
+            return since
+        lull = (
+            self.interval if self.gap_s is None else min(2 * self.gap_s, self.interval)
+        )
+        return max(
+            self._last_render + self.interval,
+            min(self._last_request + lull, since + self.max_wait),
+        )
+
+    def cancel(self):
+        """Drop the pending requests and stop the task."""
+        self._pending_since = None
+        if self.task is not None:
+            self.task.cancel()
+
+    async def _run(self):
+        while self._pending_since is not None:
+            delay = self.due() - time.monotonic()
+            if delay > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except TimeoutError:
+                    pass
+                continue
+            requested, self._pending_since = self._pending_since, None
+            self._immediate = False
+            started = time.monotonic()
+            try:
+                await self.render()
+            except Exception:
+                logger.exception("Refreshing the UI failed")
+            self._last_render = time.monotonic()
+            self.renders += 1
+            self.render_s = _ewma(self.render_s, self._last_render - started)
+            self.interval = min(
+                max(self.render_s / self.render_share, self.min_interval),
+                self.max_wait,
+            )
+            if self.on_render is not None:
+                self.on_render(started - requested, self._last_render - started)
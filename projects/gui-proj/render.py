@@ -0,0 +1,66 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import RENDER_WORKERS
+
+
+class RenderPool:
+    """
+    Prepare UI renders on worker threads.
+
+    A view renders in three steps. `snapshot` runs on the event loop and
+    takes the records the render needs; stored shipments are replaced,
+    never changed, so the records stay valid while the store moves on.
+    `prepare` does the per-shipment work of filtering, formatting rows,
+    sorting pages and parsing positions, without touching the UI or the
+    store, on a worker thread. `apply` runs on the event loop again and
+    only sends the result to the browser.
+
+    Threads are used rather than processes because the jobs reference
+    the live records; pickling them to another process would cost more
+    than preparing them. Python switches threads every few
+    milliseconds, so ingest and the websockets are served in between
+    while a large render is being prepared.
+
+    Parameters
+    ----------
+    workers : int, optional
+        Number of worker threads, or 0 to prepare on the event loop.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS):
+        self.executor = (
+            ThreadPoolExecutor(workers, thread_name_prefix="render")
+            if workers
+            else None
+        )
+
+    async def render(self, view, *filters):
+        """
+        Render a view with its preparation on a worker thread.
+
+        Parameters
+        ----------
+        view : ShipmentRows, ShipmentGrid or ShipmentMap
+            The view to render.
+        *filters
+            The arguments of the view's ``render`` method after the
+            store, starting with the store.
+
+        Returns
+        -------
+        int
+            What the view's ``apply`` returns.
+        """
+        job = view.snapshot(*filters)
+        if self.executor is None:
+            payload = view.prepare(job)
+        else:
+            loop = asyncio.get_running_loop()
+            payload = await loop.run_in_executor(self.executor, view.prepare, job)
+        return view.apply(payload)
+
+    def shutdown(self):
+        """Stop the worker threads without waiting for queued renders."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,241 @@
+import asyncio
+
+from nicegui import ui
+
+from constants import SEARCH_CHUNK_SIZE
+from store import ShipmentStore
+
+
+class ShipmentRows:
+    """
+    Keyed, incremental rows for the shipment table.
+
+    Instead of clearing the table and recreating every label on each
+    refresh, the rows remember which shipment IDs changed since the last
+    render and only patch, insert or remove the labels for those IDs.
+
+    Parameters
+    ----------
+    container : nicegui.ui.column
+        The element the row labels are placed in.
+    format_row : callable
+        Returns the text of the row for a shipment.
+    """
+
+    def __init__(self, container, format_row):
+        self.container = container
+        self.format_row = format_row
+        self.labels = {}
+        self.changed = set()
+        self.full_render = True
+        self.generation = 0
+
+    def mark_changed(self, shipment_ids):
+        """
+        Record shipments whose rows must be checked on the next render.
+
+        Parameters
+        ----------
+        shipment_ids : iterable
+            IDs of shipments that were inserted, updated or removed.
+        """
+        self.changed.update(shipment_ids)
+
+    def invalidate(self):
+        """Re-check every row on the next render, e.g. after a filter change."""
+        self.full_render = True
+        self.generation += 1
+
+    def render(self, shipments, status, term):
+        """
+        Bring the rows in line with the shipments store.
+
+        Only shipments marked as changed are looked at, unless the rows
+        were invalidated, in which case the shipments selected by the
+        store indexes and the rendered rows are checked. This runs
+        `snapshot`, `prepare` and `apply` in a row; a `RenderPool` runs
+        `prepare` on a worker thread instead.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        status : str
+            The status to filter by, or "All" for any status.
+        term : str
+            A substring of the shipment ID to search for.
+
+        Returns
+        -------
+        int
+            The number of rows that were inserted, updated or removed.
+        """
+        return self.apply(self.prepare(self.snapshot(shipments, status, term)))
+
+    def snapshot(self, shipments, status, term):
+        """
+        Take the shipments the next render looks at.
+
+        Runs on the event loop. Stored shipments are replaced rather than
+        changed, so the job holds on to the current records and can be
+        prepared while the store moves on.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        status : str
+            The status to filter by, or "All" for any status.
+        term : str
+            A substring of the shipment ID to search for.
+
+        Returns
+        -------
+        tuple
+            The job to pass to `prepare`.
+        """
+        if self.full_render:
+            # In store order, which keeps the lookups below cache friendly
+            shipment_ids = dict.fromkeys(shipments.select(status, term))
+            shipment_ids.update(dict.fromkeys(self.labels))
+            self.full_render = False
+        else:
+            shipment_ids = self.changed
+        self.changed = set()
+        return (
+            self.generation,
+            status,
+            term,
+            dict(zip(shipment_ids, map(shipments.get, shipment_ids))),
+        )
+
+    def prepare(self, job):
+        """
+        Format the rows of a job.
+
+        Touches neither the UI nor the store, so it may run on any
+        thread.
+
+        Parameters
+        ----------
+        job : tuple
+            A job returned by `snapshot`.
+
+        Returns
+        -------
+        tuple
+            The payload to pass to `apply`: the text of each row, or
+            None for rows to remove.
+        """
+        generation, status, term, snapshot = job
+        return generation, {
+            shipment_id: self.format_row(shipment)
+            if shipment is not None and ShipmentStore.matches(shipment, status, term)
+            else None
+            for shipment_id, shipment in snapshot.items()
+        }
+
+    def apply(self, payload):
+        """
+        Insert, update or remove the rows of a prepared payload.
+
+        A payload prepared before the rows were invalidated or streamed
+        is dropped, and its shipments are checked again on the next
+        render.
+
+        Parameters
+        ----------
+        payload : tuple
+            A payload returned by `prepare`.
+
+        Returns
+        -------
+        int
+            The number of rows that were inserted, updated or removed.
+        """
+        generation, rows = payload
+        if generation != self.generation:
+            self.changed.update(rows)
+            return 0
+        patched = 0
+        for shipment_id, text in rows.items():
+            label = self.labels.get(shipment_id)
+            if text is not None:
+                if label is None:
+                    with self.container:
+                        self.labels[shipment_id] = ui.label(text)
+                    patched += 1
+                elif label.text != text:
+                    label.set_text(text)
+                    patched += 1
+            elif label is not None:
+                self.container.remove(label)
+                del self.labels[shipment_id]
+                patched += 1
+        return patched
+
+    async def stream(
+        self, shipments, status, term, matching, chunk_size=SEARCH_CHUNK_SIZE
+    ):
+        """
+        Show exactly the matching shipments, a chunk of rows at a time.
+
+        Rows that no longer match are removed first, then the matching
+        rows are inserted or patched in order, yielding to the event
+        loop between chunks so that a large result does not block it.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        status : str
+            The status to filter by, or "All" for any status.
+        term : str
+            A substring of the shipment ID to search for.
+        matching : dict or list
+            The IDs of the shipments that pass the filters.
+        chunk_size : int, optional
+            Rows checked before yielding to the event loop.
+
+        Returns
+        -------
+        int
+            The number of rows that were inserted, updated or removed.
+        """
+        self.generation += 1  # Renders prepared for the old filters are stale
+        stale = [
+            shipment_id for shipment_id in self.labels if shipment_id not in matching
+        ]
+        shipment_ids = stale + list(matching)
+        patched = 0
+        for start in range(0, len(shipment_ids), chunk_size):
+            if start:
+                await asyncio.sleep(0)
+            chunk = shipment_ids[start : start + chunk_size]
+            patched += self.patch(shipments, status, term, chunk)
+        return patched
+
+    def patch(self, shipments, status, term, shipment_ids):
+        """
+        Insert, update or remove the rows of some shipments.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        status : str
+            The status to filter by, or "All" for any status.
+        term : str
+            A substring of the shipment ID to search for.
+        shipment_ids : iterable
+            IDs of the shipments whose rows are checked.
+
+        Returns
+        -------
+        int
+            The number of rows that were inserted, updated or removed.
+        """
+        snapshot = {
+            shipment_id: shipments.get(shipment_id) for shipment_id in shipment_ids
+        }
+        return self.apply(self.prepare((self.generation, status, term, snapshot)))
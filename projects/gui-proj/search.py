@@ -0,0 +1,142 @@
+import asyncio
+
+from constants import SEARCH_CHUNK_SIZE, SEARCH_DEBOUNCE_S
+from store import ShipmentStore
+
+
+class SearchPipeline:
+    """
+    Debounced, incremental shipment ID search of one browser.
+
+    Every keystroke is passed to `submit`, which cancels the query that
+    is still waiting or running and starts a new one once typing pauses.
+    The IDs matching the last query are kept, and kept current by
+    `mark_changed`, so a query that extends the previous term only
+    refines the previous result instead of searching the store again.
+    Refining yields to the event loop every ``chunk_size`` shipments.
+
+    Parameters
+    ----------
+    delay_s : float, optional
+        How long typing must pause before a query runs, in seconds.
+    chunk_size : int, optional
+        Shipments refined at a time before yielding to the event loop.
+    """
+
+    def __init__(self, delay_s=SEARCH_DEBOUNCE_S, chunk_size=SEARCH_CHUNK_SIZE):
+        self.delay_s = delay_s
+        self.chunk_size = chunk_size
+        self.status = None
+        self.term = None
+        self.results = None
+        self.task = None
+        self.refined = 0
+        self.searched = 0
+        self._dirty = None
+
+    def submit(self, term, run):
+        """
+        Run a query once typing pauses, superseding any earlier one.
+
+        Parameters
+        ----------
+        term : str
+            The search term typed so far.
+        run : callable
+            Coroutine function called with the term, which queries and
+            shows the result.
+
+        Returns
+        -------
+        asyncio.Task
+            The task that runs the query.
+        """
+        self.cancel()
+        self.task = asyncio.create_task(self._run(term, run))
+        return self.task
+
+    def cancel(self):
+        """Cancel the query that is waiting or running."""
+        if self.task is not None:
+            self.task.cancel()
+
+    async def query(self, shipments, status, term):
+        """
+        Find the shipments with a status whose ID contains a search term.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The shipments store.
+        status : str
+            The status to filter by, or "All" for any status.
+        term : str
+            A substring of the shipment ID, or "" for any ID.
+
+        Returns
+        -------
+        dict
+            The IDs of the matching shipments as keys, in store order
+            for new searches.
+        """
+        if self.results is None or status != self.status or self.term not in term:
+            results = dict.fromkeys(shipments.select(status, term))
+            self.searched += 1
+        elif term == self.term:
+            return self.results
+        else:
+            self._dirty = set()
+            try:
+                candidates = list(self.results)
+                results = {}
+                for start in range(0, len(candidates), self.chunk_size):
+                    if start:
+                        await asyncio.sleep(0)  # Let keystrokes and updates in
+                    for shipment_id in candidates[start : start + self.chunk_size]:
+                        if term in str(shipment_id):
+                            results[shipment_id] = None
+                # Shipments that changed while refining
+                for shipment_id in self._dirty:
+                    shipment = shipments.get(shipment_id)
+                    if shipment is not None and ShipmentStore.matches(
+                        shipment, status, term
+                    ):
+                        results[shipment_id] = None
+                    else:
+                        results.pop(shipment_id, None)
+            finally:
+                self._dirty = None
+            self.refined += 1
+        self.status, self.term, self.results = status, term, results
+        return results
+
+    def mark_changed(self, updates, status, term):
+        """
+        Keep the last result current with applied shipment changes.
+
+        Parameters
+        ----------
+        updates : dict
+            Changed shipments that matched the filters before or after
+            the change, by ID.
+        status : str
+            The status filter the changes were selected with.
+        term : str
+            The search term the changes were selected with.
+        """
+        if self.results is None:
+            return
+        if (status, term) != (self.status, self.term):
+            self.results = None  # The filters moved on, search afresh
+            return
+        if self._dirty is not None:
+            self._dirty.update(updates)
+        for shipment_id, shipment in updates.items():
+            if ShipmentStore.matches(shipment, status, term):
+                self.results[shipment_id] = None
+            else:
+                self.results.pop(shipment_id, None)
+
+    async def _run(self, term, run):
+        await asyncio.sleep(self.delay_s)
+        await run(term)
@@ -0,0 +1,196 @@
+from collections import defaultdict
+
+from search import SearchPipeline
+from store import ShipmentStore
+
+
+class Session:
+    """
+    View state of one connected browser.
+
+    Each browser gets its own shipment list, map, notifications, filters
+    and refresh scheduler, so one user's filter never changes what
+    another user sees.
+
+    Parameters
+    ----------
+    view : ShipmentGrid or ShipmentRows
+        The shipment list of this browser.
+    shipment_map : ShipmentMap
+        The map of this browser.
+    notifications : NotificationAggregator
+        The notifications of this browser.
+    client : nicegui.Client, optional
+        The client to show toasts on outside of its own event handlers.
+
+    Attributes
+    ----------
+    refresh : RefreshScheduler or None
+        Schedules the refreshes of this browser.
+    search : SearchPipeline
+        Runs the ID searches typed in this browser.
+    trails : bool
+        Whether the map draws the recent trails of shipments.
+    replay_at : float or None
+        The past instant the map replays, in seconds since the epoch,
+        or None for the live fleet.
+    """
+
+    def __init__(self, view, shipment_map, notifications, client=None):
+        self.view = view
+        self.map = shipment_map
+        self.notifications = notifications
+        self.client = client
+        self.status = "All"
+        self.term = ""
+        self.refresh = None
+        self.search = SearchPipeline()
+        self.trails = False
+        self.replay_at = None
+
+    def mark_changed(self, shipment_ids):
+        """
+        Record shipments whose list rows and map points must be checked.
+
+        Parameters
+        ----------
+        shipment_ids : iterable
+            IDs of shipments that were inserted, updated or removed.
+        """
+        shipment_ids = list(shipment_ids)
+        self.view.mark_changed(shipment_ids)
+        self.map.mark_changed(shipment_ids)
+
+    def invalidate(self):
+        """Re-check the whole list and map on the next render."""
+        self.view.invalidate()
+        self.map.invalidate()
+
+    def close(self):
+        """Cancel the pending refresh and search of a browser that disconnected."""
+        if self.refresh is not None:
+            self.refresh.cancel()
+        self.search.cancel()
+
+
+class SessionHub:
+    """
+    Fan shipment changes out to the sessions they matter to.
+
+    Ingest updates the shared store once per batch and hands the change
+    to `publish`. Sessions are grouped by their filters, and the
+    shipments that match a filter before or after the change are worked
+    out once per group. Only sessions that saw a matching shipment are
+    marked and returned for a refresh, so the refresh cost grows with
+    the viewers a change matters to, not with every connected viewer.
+
+    Parameters
+    ----------
+    spatial : SpatialGrid, optional
+        Position index shared by the maps of all sessions, updated once
+        per published change.
+
+    Attributes
+    ----------
+    loading : bool
+        Whether the shipments are still being loaded at startup.
+    progress : float or None
+        Fraction of a bulk load done, or None when there is none.
+    """
+
+    def __init__(self, spatial=None):
+        self.spatial = spatial
+        self.sessions = set()
+        self.loading = False
+        self.progress = None
+
+    def add(self, session):
+        """
+        Start sending changes to a session.
+
+        Parameters
+        ----------
+        session : Session
+            The session of a newly connected browser.
+        """
+        self.sessions.add(session)
+
+    def remove(self, session):
+        """
+        Stop sending changes to a session.
+
+        Parameters
+        ----------
+        session : Session
+            The session of a disconnected browser.
+        """
+        self.sessions.discard(session)
+        session.close()
+
+    def publish(self, shipments, updates, previous, invalid=(), notify=True):
+        """
+        Mark applied changes in the sessions they are relevant to.
+
+        A session's list is marked for shipments that match its status
+        and search term before or after the change; its map for
+        shipments that match its status, since the map is not searched.
+
+        Parameters
+        ----------
+        shipments : ShipmentStore
+            The store, with the changes already applied.
+        updates : dict
+            The applied events, or None for removed shipments, by ID.
+        previous : dict
+            The state of each updated shipment before the change, or
+            None for new shipments.
+        invalid : list, optional
+            Rejected events, counted in every session's notifications.
+        notify : bool, optional
+            Whether to count the changes in the sessions' notifications.
+
+        Returns
+        -------
+        list of Session
+            The sessions that need a refresh.
+        """
+        if self.spatial is not None:
+            self.spatial.update(shipments, updates)
+
+        by_status = defaultdict(lambda: defaultdict(list))
+        for session in self.sessions:
+            by_status[session.status][session.term].append(session)
+
+        affected = []
+        for status, by_term in by_status.items():
+            in_status = _relevant(updates, previous, status, "")
+            # Removed shipments are not counted as updates
+            updated = [event for event in in_status.values() if event is not None]
+            for term, sessions in by_term.items():
+                listed = _relevant(in_status, previous, status, term)
+                for session in sessions:
+                    session.view.mark_changed(listed)
+                    session.map.mark_changed(in_status)
+                    session.search.mark_changed(listed, status, term)
+                    if notify:
+                        session.notifications.add_many("updated", updated)
+                if in_status:
+                    affected.extend(sessions)
+        if invalid and notify:
+            for session in self.sessions:
+                session.notifications.add_many("invalid", invalid)
+        return affected
+
+
+def _relevant(updates, previous, status, term):
+    if status == "All" and not term:
+        return updates
+    return {
+        shipment_id: event
+        for shipment_id, event in updates.items()
+        if ShipmentStore.matches(event, status, term)
+        or (
+            previous.get(shipment_id) is not None
+            and ShipmentStore.matches(previous[shipment_id], status, term)
+        )
+    }
@@ -0,0 +1,152 @@
+import asyncio
+import sqlite3
+
+from constants import SHARED_VIEW_POLL_S
+from decoding import ShipmentEvent
+from snapshot import FIELDS
+
+_COLUMNS = ", ".join(FIELDS)
+_UPSERT = (
+    f"INSERT INTO shipments ({_COLUMNS}, seq) "
+    f"VALUES ({', '.join('?' * (len(FIELDS) + 1))}) "
+    "ON CONFLICT (shipment_id) DO UPDATE SET "
+    + ", ".join(f"{field} = excluded.{field}" for field in (*FIELDS[1:], "seq"))
+)
+
+
+class SharedView:
+    """
+    Materialized view of the shipments shared by several dashboard processes.
+
+    The view is an SQLite database in WAL mode, so one ingest worker can
+    write while any number of UI replicas read. Every write stamps the
+    rows it touches with a new sequence number, in the same transaction
+    as the consumer offsets it reached. The sequence doubles as the
+    change feed: each reader remembers the highest sequence it has seen
+    and `changes` only returns rows written since, so every replica
+    learns about every change without a broker of its own. A deleted
+    shipment keeps its row, with only its ID and sequence set, so that
+    the delete reaches the replicas too.
+
+    Parameters
+    ----------
+    path : str
+        The database file, created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seq = 0
+        # Calls come from worker threads, but never two at a time
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        with self._db:
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS shipments "
+                f"(shipment_id PRIMARY KEY, {', '.join(FIELDS[1:])}, seq INTEGER)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS shipments_seq ON shipments (seq)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS offsets "
+                "(topic TEXT, partition INTEGER, next INTEGER, "
+                "PRIMARY KEY (topic, partition))"
+            )
+
+    def write(self, updates, offsets):
+        """
+        Store changed shipments and the offsets they were read up to.
+
+        Parameters
+        ----------
+        updates : dict
+            The latest event per shipment ID, or None for a deleted
+            shipment.
+        offsets : dict
+            The next offset to consume, keyed by topic and partition.
+        """
+        with self._db:
+            (last,) = self._db.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM shipments"
+            ).fetchone()
+            seq = last + 1
+            self._db.executemany(
+                _UPSERT,
+                (
+                    (shipment_id, *(None for _ in FIELDS[1:]), seq)
+                    if event is None
+                    else (*map(event.get, FIELDS), seq)
+                    for shipment_id, event in updates.items()
+                ),
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO offsets VALUES (?, ?, ?)",
+                (
+                    (topic, partition, offset)
+                    for (topic, partition), offset in offsets.items()
+                ),
+            )
+
+    def offsets(self):
+        """
+        Get the offsets the view was written up to.
+
+        Returns
+        -------
+        dict
+            The next offset to consume, keyed by topic and partition.
+        """
+        rows = self._db.execute("SELECT topic, partition, next FROM offsets")
+        return {(topic, partition): offset for topic, partition, offset in rows}
+
+    def changes(self):
+        """
+        Read the shipments written since the previous call.
+
+        The first call returns every shipment.
+
+        Returns
+        -------
+        dict
+            The current `ShipmentEvent` of each changed shipment, or None
+            for a deleted one, by ID.
+        """
+        rows = self._db.execute(
+            f"SELECT {_COLUMNS}, seq FROM shipments WHERE seq > ? ORDER BY seq",
+            (self.seq,),
+        ).fetchall()
+        if rows:
+            self.seq = rows[-1][-1]
+        # Every stored shipment has a status; deleted ones have none
+        return {
+            row[0]: None if row[1] is None else ShipmentEvent(*row[:-1]) for row in rows
+        }
+
+    async def follow(self, interval_s=SHARED_VIEW_POLL_S):
+        """
+        Yield the shipments that change, as they are written.
+
+        Parameters
+        ----------
+        interval_s : float, optional
+            How long to wait before checking again after finding no
+            changes, in seconds.
+
+        Yields
+        ------
+        dict
+            The current `ShipmentEvent` of each changed shipment, or None
+            for a deleted one, by ID.
+        """
+        while True:
+            updates = await asyncio.to_thread(self.changes)
+            if updates:
+                yield updates
+            else:
+                await asyncio.sleep(interval_s)
+
+    def close(self):
+        """Close the database connection."""
+        self._db.close()
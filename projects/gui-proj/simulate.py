@@ -0,0 +1,422 @@
+"""
+Synthetic shipment traffic for benchmarks and load tests.
+
+`ShipmentSimulator` generates a reproducible stream of
+``shipment_updates`` events for a fleet of any size, and `FakeConsumer`
+serves them in-process through the parts of the ``KafkaConsumer`` API
+the dashboard uses, so the whole ingest pipeline can be driven without
+a broker.
+"""
+
+import collections
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import UTC, datetime
+
+from kafka import TopicPartition
+
+from constants import SHIPMENT_TOPIC, SPEED_BY_MODE_KMH
+
+HUBS = {
+    "New York": (40.7128, -74.0060),
+    "Newark": (40.7357, -74.1724),
+    "Boston": (42.3601, -71.0589),
+    "Philadelphia": (39.9526, -75.1652),
+    "Atlanta": (33.7490, -84.3880),
+    "Miami": (25.7617, -80.1918),
+    "Chicago": (41.8781, -87.6298),
+    "Detroit": (42.3314, -83.0458),
+    "Memphis": (35.1495, -90.0490),
+    "Dallas": (32.7767, -96.7970),
+    "Houston": (29.7604, -95.3698),
+    "Denver": (39.7392, -104.9903),
+    "Phoenix": (33.4484, -112.0740),
+    "Salt Lake City": (40.7608, -111.8910),
+    "Los Angeles": (34.0522, -118.2437),
+    "San Francisco": (37.7749, -122.4194),
+    "Seattle": (47.6062, -122.3321),
+    "Portland": (45.5152, -122.6784),
+}
+"""
+dict of str to tuple of float: Latitude and longitude of the hubs shipments
+travel between.
+"""
+
+_STATUSES = ("In Transit", "Out for Delivery", "Delivered")
+_HUB_NAMES = tuple(HUBS)
+_MODES = tuple(SPEED_BY_MODE_KMH)
+_START = datetime(2024, 1, 1, tzinfo=UTC).timestamp()
+
+Record = collections.namedtuple(
+    "Record", ["topic", "partition", "offset", "timestamp", "key", "value"]
+)
+"""
+The fields of a Kafka ``ConsumerRecord`` the dashboard reads.
+"""
+
+
+class ShipmentSimulator:
+    """
+    Seeded generator of realistic shipment update events.
+
+    Every shipment travels from one hub to another by a transport mode.
+    Each event either moves a shipment part of the way to its
+    destination, or advances its status from "In Transit" to "Out for
+    Delivery" to "Delivered"; a delivered shipment is sent on a new
+    trip. Now and then a burst hits: a run of consecutive shipments,
+    like a truck being unloaded, all update within the same second.
+
+    Timestamps start on 2024-01-01 and advance one second per event
+    outside of bursts, so they only move forward for every shipment.
+    The same arguments always produce the same events.
+
+    Parameters
+    ----------
+    shipments : int
+        The size of the fleet.
+    seed : int, optional
+        Seeds the random choices.
+    move_share : float, optional
+        Chance that an update of a shipment in transit moves it rather
+        than sending it out for delivery.
+    burst_share : float, optional
+        Chance that an event starts a burst.
+    burst_size : int, optional
+        Events in one burst.
+    """
+
+    def __init__(
+        self, shipments, seed=0, move_share=0.8, burst_share=0.001, burst_size=500
+    ):
+        self.random = random.Random(seed)
+        self.move_share = move_share
+        self.burst_share = burst_share
+        self.burst_size = min(burst_size, shipments)
+        self.clock = _START
+        self._stamped = (None, None)
+        self.ids = [f"SHP{n:07d}" for n in range(shipments)]
+        self.trips = [self._trip() for _ in range(shipments)]
+
+    def initial(self):
+        """
+        Generate one event per shipment, placing the fleet at its origins.
+
+        Yields
+        ------
+        dict
+            An event of each shipment, in ID order.
+        """
+        for index in range(len(self.ids)):
+            yield self._event(index)
+
+    def events(self, count):
+        """
+        Generate updates of random shipments.
+
+        Parameters
+        ----------
+        count : int
+            The number of events.
+
+        Yields
+        ------
+        dict
+            The events, in the order they happen.
+        """
+        emitted = 0
+        while emitted < count:
+            if self.random.random() < self.burst_share:
+                first = self.random.randrange(len(self.ids))
+                burst = min(self.burst_size, count - emitted)
+                self.clock += 1
+                for offset in range(burst):
+                    index = (first + offset) % len(self.ids)
+                    self._advance(index)
+                    yield self._event(index)
+                emitted += burst
+            else:
+                index = self.random.randrange(len(self.ids))
+                self.clock += 1
+                self._advance(index)
+                yield self._event(index)
+                emitted += 1
+
+    def messages(self, count=None):
+        """
+        Generate encoded records, keyed by shipment ID like the producers do.
+
+        Parameters
+        ----------
+        count : int, optional
+            The number of updates; without one, the `initial` events.
+
+        Returns
+        -------
+        list of tuple of (bytes, bytes)
+            The key and JSON value of each record.
+        """
+        events = self.initial() if count is None else self.events(count)
+        dumps = json.JSONEncoder(separators=(",", ":")).encode
+        return [
+            (event["shipment_id"].encode(), dumps(event).encode()) for event in events
+        ]
+
+    def _trip(self, origin=None):
+        if origin is None:
+            origin = self.random.choice(_HUB_NAMES)
+        destination = self.random.choice(_HUB_NAMES[:-1])
+        if destination == origin:
+            destination = _HUB_NAMES[-1]
+        latitude, longitude = HUBS[origin]
+        return [0, origin, latitude, longitude, destination, self.random.choice(_MODES)]
+
+    def _advance(self, index):
+        trip = self.trips[index]
+        if trip[0] == len(_STATUSES) - 1:
+            self.trips[index] = self._trip(trip[4])
+        elif self.random.random() < self.move_share and trip[0] == 0:
+            share = self.random.uniform(0.01, 0.1)
+            dest_lat, dest_lon = HUBS[trip[4]]
+            trip[2] += (dest_lat - trip[2]) * share
+            trip[3] += (dest_lon - trip[3]) * share
+        else:
+            trip[0] += 1
+            if _STATUSES[trip[0]] == "Out for Delivery":
+                trip[1] = trip[4]
+                trip[2], trip[3] = HUBS[trip[4]]
+
+    def _event(self, index):
+        status, location, latitude, longitude, destination, mode = self.trips[index]
+        dest_lat, dest_lon = HUBS[destination]
+        if self._stamped[0] != self.clock:
+            self._stamped = (
+                self.clock,
+                datetime.fromtimestamp(self.clock, UTC).isoformat(),
+            )
+        return {
+            "shipment_id": self.ids[index],
+            "status": _STATUSES[status],
+            "location": location,
+            "timestamp": self._stamped[1],
+            "latitude": round(latitude, 6),
+            "longitude": round(longitude, 6),
+            "destination_lat": dest_lat,
+            "destination_lon": dest_lon,
+            "mode": mode,
+        }
+
+
+class FakeConsumer:
+    """
+    In-process stand-in for a ``KafkaConsumer`` serving prepared records.
+
+    Records are spread over partitions by a hash of their key, so the
+    updates of one shipment stay in order, and are decoded with the
+    ``value_deserializer`` as they are polled. ``rate`` throttles them
+    to a steady number of records per second, counted from the first
+    poll; without it every record is available right away.
+
+    `poll`, iteration, `highwater`, `subscribe`, `assign` and `close`
+    behave like their ``KafkaConsumer`` counterparts as far as the
+    dashboard relies on them.
+
+    Parameters
+    ----------
+    messages : iterable
+        The key and value of each record, e.g. from
+        `ShipmentSimulator.messages`.
+    value_deserializer : callable, optional
+        Decodes the record values.
+    rate : float, optional
+        Records made available per second.
+    topic : str, optional
+        The topic of the records.
+    partitions : int, optional
+        The number of partitions.
+    """
+
+    def __init__(
+        self,
+        messages,
+        value_deserializer=None,
+        rate=None,
+        topic=SHIPMENT_TOPIC,
+        partitions=1,
+    ):
+        self.value_deserializer = value_deserializer
+        self.rate = rate
+        self.topic = topic
+        self.records = {TopicPartition(topic, n): [] for n in range(partitions)}
+        for key, value in messages:
+            self.records[TopicPartition(topic, zlib.crc32(key) % partitions)].append(
+                (key, value)
+            )
+        self.positions = dict.fromkeys(self.records, 0)
+        self.total = sum(map(len, self.records.values()))
+        self.delivered = 0
+        self.started = None
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics):
+        """
+        Consume the topic from the start; other topics are ignored.
+
+        Parameters
+        ----------
+        topics : list of str
+            The topics to consume.
+        """
+
+    def assign(self, partitions):
+        """
+        Consume the given partitions; the fake always serves all of them.
+
+        Parameters
+        ----------
+        partitions : list of TopicPartition
+            The partitions to consume.
+        """
+
+    def partitions_for_topic(self, topic):
+        """
+        Get the partition numbers of a topic.
+
+        Parameters
+        ----------
+        topic : str
+            The topic.
+
+        Returns
+        -------
+        set of int
+            The partitions, or an empty set for another topic.
+        """
+        if topic != self.topic:
+            return set()
+        return {partition.partition for partition in self.records}
+
+    def seek(self, partition, offset):
+        """
+        Move the position of a partition.
+
+        Parameters
+        ----------
+        partition : TopicPartition
+            The partition.
+        offset : int
+            The offset of the next record to return.
+        """
+        with self._lock:
+            self.delivered += offset - self.positions[partition]
+            self.positions[partition] = offset
+
+    def highwater(self, partition):
+        """
+        Get the offset after the last record of a partition.
+
+        Parameters
+        ----------
+        partition : TopicPartition
+            The partition.
+
+        Returns
+        -------
+        int
+            The end offset of the partition.
+        """
+        return len(self.records[partition])
+
+    def available(self):
+        """
+        Count the records that may be polled now.
+
+        Returns
+        -------
+        int
+            Records not yet returned that the rate allows.
+        """
+        if self.started is None:
+            self.started = time.monotonic()
+        left = self.total - self.delivered
+        if self.rate is None:
+            return left
+        due = int((time.monotonic() - self.started) * self.rate) - self.delivered
+        return max(0, min(due, left))
+
+    def poll(self, timeout_ms=0, max_records=None):
+        """
+        Fetch the next records, waiting up to ``timeout_ms`` for one.
+
+        Parameters
+        ----------
+        timeout_ms : int, optional
+            How long to wait when no record is available.
+        max_records : int, optional
+            The most records to return.
+
+        Returns
+        -------
+        dict
+            The decoded records, by `TopicPartition`.
+        """
+        deadline = time.monotonic() + timeout_ms / 1000
+        while True:
+            count = self.available()
+            if count or self.closed or time.monotonic() >= deadline:
+                break
+            if self.delivered >= self.total:
+                time.sleep(max(0.0, deadline - time.monotonic()))
+                break
+            time.sleep(min(1 / self.rate, max(0.0, deadline - time.monotonic())))
+        if max_records is not None:
+            count = min(count, max_records)
+        return self._take(count)
+
+    def __iter__(self):
+        """
+        Yield every record once, in partition order, at the configured rate.
+
+        Yields
+        ------
+        Record
+            The decoded records.
+        """
+        while self.delivered < self.total and not self.closed:
+            for messages in self.poll(timeout_ms=100).values():
+                yield from messages
+
+    def close(self):
+        """Stop returning records."""
+        self.closed = True
+
+    def _take(self, count):
+        polled = {}
+        decode = self.value_deserializer
+        with self._lock:
+            for partition, records in self.records.items():
+                if count <= 0:
+                    break
+                start = self.positions[partition]
+                stop = min(start + count, len(records))
+                if start == stop:
+                    continue
+                now = int(time.time() * 1000)
+                polled[partition] = [
+                    Record(
+                        partition.topic,
+                        partition.partition,
+                        offset,
+                        now,
+                        key,
+                        value if decode is None else decode(value),
+                    )
+                    for offset, (key, value) in enumerate(records[start:stop], start)
+                ]
+                self.positions[partition] = stop
+                self.delivered += stop - start
+                count -= stop - start
+        return polled
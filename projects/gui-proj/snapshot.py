@@ -0,0 +1,264 @@
+import asyncio
+import dataclasses
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+from kafka import TopicPartition
+
+from constants import SNAPSHOT_INTERVAL_S, SNAPSHOT_PATH
+from decoding import ShipmentEvent
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+"""
+int: Format version written to, and expected in, snapshot files.
+"""
+
+FIELDS = tuple(field.name for field in dataclasses.fields(ShipmentEvent))
+"""
+tuple of str: Shipment fields stored in a snapshot, in column order.
+"""
+
+
+def write_snapshot(path, shipments, offsets):
+    """
+    Write shipments and consumer offsets to a snapshot file.
+
+    Each shipment is stored as a plain tuple of its `FIELDS`, which
+    pickles far more compactly and quickly than the objects themselves.
+    The file is written next to its destination and then renamed over
+    it, so a crash never leaves a partial snapshot behind and concurrent
+    writers never mix their output.
+
+    Parameters
+    ----------
+    path : str
+        The snapshot file.
+    shipments : iterable of ShipmentEvent or dict
+        The shipments to store.
+    offsets : dict
+        The next offset to consume, keyed by topic and partition.
+    """
+    rows = [tuple(map(shipment.get, FIELDS)) for shipment in shipments]
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "fields": FIELDS,
+        "rows": rows,
+        "offsets": offsets,
+    }
+    fd, partial = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".partial"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(partial, path)
+    except BaseException:
+        os.unlink(partial)
+        raise
+
+
+def read_snapshot(path):
+    """
+    Read a snapshot file written by `write_snapshot`.
+
+    Parameters
+    ----------
+    path : str
+        The snapshot file.
+
+    Returns
+    -------
+    tuple of (list of ShipmentEvent, dict) or None
+        The shipments and the offsets to resume from, or None if there
+        is no usable snapshot.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError) as e:
+        logger.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return None
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+        logger.warning("Ignoring snapshot %s of an unknown version", path)
+        return None
+
+    fields = data["fields"]
+    if fields == FIELDS:
+        shipments = [ShipmentEvent(*row) for row in data["rows"]]
+    else:  # Written before fields were added or removed
+        known = [
+            (index, field) for index, field in enumerate(fields) if field in FIELDS
+        ]
+        shipments = [
+            ShipmentEvent(**{field: row[index] for index, field in known})
+            for row in data["rows"]
+        ]
+    return shipments, data["offsets"]
+
+
+def seek_to_offsets(consumer, topic, offsets):
+    """
+    Assign all partitions of a topic and resume from stored offsets.
+
+    Partitions without a stored offset start at the consumer's
+    ``auto_offset_reset`` position.
+
+    Parameters
+    ----------
+    consumer : KafkaConsumer
+        A consumer without a subscription or assignment.
+    topic : str
+        The topic to consume.
+    offsets : dict
+        The next offset to consume, keyed by topic and partition.
+    """
+    partitions = [
+        TopicPartition(topic, partition)
+        for partition in sorted(consumer.partitions_for_topic(topic) or ())
+    ]
+    consumer.assign(partitions)
+    for partition in partitions:
+        offset = offsets.get((partition.topic, partition.partition))
+        if offset is not None:
+            consumer.seek(partition, offset)
+
+
+class Checkpointer:
+    """
+    Periodically snapshot the shipment store with the consumer offsets.
+
+    `track` records the offset after every consumed record, so a
+    snapshot taken between two batches holds exactly the state those
+    offsets lead to. On startup `load` reads the last snapshot and
+    `position` points the consumer at its offsets, so only the records
+    produced since then are replayed.
+
+    Taking a snapshot only copies the list of shipment records on the
+    event loop; records are replaced rather than changed once stored,
+    so the copy can be serialized and written on a worker thread.
+
+    Parameters
+    ----------
+    path : str, optional
+        The snapshot file.
+    interval_s : float, optional
+        Minimum time between two snapshots, in seconds.
+    hold_back : callable, optional
+        Maps the tracked offsets to the ones stored with a snapshot, e.g.
+        `PriorityLanes.committable`, for records that were consumed but
+        are not in the store yet.
+    """
+
+    def __init__(
+        self, path=SNAPSHOT_PATH, interval_s=SNAPSHOT_INTERVAL_S, hold_back=None
+    ):
+        self.path = path
+        self.interval_s = interval_s
+        self.hold_back = hold_back
+        self.offsets = {}
+        self.saved_at = time.monotonic()
+        self.saving = None
+
+    def track(self, batch):
+        """
+        Record the position reached by a consumed batch.
+
+        Parameters
+        ----------
+        batch : list
+            Consumer records in partition order.
+        """
+        for message in batch:
+            self.offsets[(message.topic, message.partition)] = message.offset + 1
+
+    def load(self):
+        """
+        Load the last snapshot and resume its offsets.
+
+        Returns
+        -------
+        list of ShipmentEvent
+            The restored shipments, empty without a snapshot.
+        """
+        snapshot = read_snapshot(self.path)
+        if snapshot is None:
+            return []
+        shipments, self.offsets = snapshot
+        logger.info("Restored %d shipments from %s", len(shipments), self.path)
+        return shipments
+
+    def position(self, consumer, topic):
+        """
+        Point the consumer at the tracked offsets.
+
+        Blocks on Kafka metadata, so call it off the event loop.
+        Without any offsets the consumer subscribes to the topic instead.
+
+        Parameters
+        ----------
+        consumer : KafkaConsumer
+            A consumer without a subscription or assignment.
+        topic : str
+            The topic to consume.
+        """
+        if self.offsets:
+            seek_to_offsets(consumer, topic, self.offsets)
+        else:
+            consumer.subscribe([topic])
+
+    def save(self, shipments):
+        """
+        Write a snapshot now, blocking until it is written.
+
+        Parameters
+        ----------
+        shipments : Mapping
+            The shipments store.
+        """
+        write_snapshot(self.path, list(shipments.values()), self._committable())
+        self.saved_at = time.monotonic()
+
+    def maybe_save(self, shipments):
+        """
+        Start writing a snapshot in the background if one is due.
+
+        Parameters
+        ----------
+        shipments : Mapping
+            The shipments store.
+
+        Returns
+        -------
+        asyncio.Future or None
+            The running write, or None if no snapshot was due.
+        """
+        if self.saving is not None and not self.saving.done():
+            return None
+        if time.monotonic() - self.saved_at < self.interval_s:
+            return None
+        self.saved_at = time.monotonic()
+        self.saving = asyncio.ensure_future(
+            asyncio.to_thread(
+                write_snapshot, self.path, list(shipments.values()), self._committable()
+            )
+        )
+        self.saving.add_done_callback(self._log_failure)
+        return self.saving
+
+    def _committable(self):
+        if self.hold_back is None:
+            return dict(self.offsets)
+        return self.hold_back(self.offsets)
+
+    def _log_failure(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(
+                "Writing snapshot %s failed: %s", self.path, future.exception()
+            )
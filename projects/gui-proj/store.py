@@ -0,0 +1,208 @@
+import sys
+from collections import defaultdict
+from collections.abc import Mapping
+
+from constants import ID_NGRAM_SIZE, INTERNED_FIELDS
+
+
+class ShipmentStore(Mapping):
+    """
+    The latest state of every shipment, with secondary indexes.
+
+    The store is read like a dict keyed by shipment ID. Next to the
+    shipments it keeps a status to IDs index and an n-gram index on the
+    shipment IDs, both updated on each upsert, so that status filtering
+    and ID search cost work proportional to the result, not the fleet.
+
+    To keep the memory per shipment small and predictable, repeated
+    string fields such as the status and location are interned on
+    upsert, and a replaced shipment hands its ID object on to the new
+    record so that each ID is held only once. The n-gram postings are
+    lists rather than sets, at a fraction of the memory: a search walks
+    the shortest posting of its term and checks every ID against the
+    whole term, so it never needs a membership test. Deleted shipments
+    stay in the postings, and are skipped by searches, until they
+    outnumber the stored ones and the index is rebuilt.
+
+    Parameters
+    ----------
+    ngram_size : int, optional
+        Every substring of a shipment ID of this length is indexed.
+    interned_fields : tuple of str, optional
+        String fields shared between shipments.
+    """
+
+    def __init__(self, ngram_size=ID_NGRAM_SIZE, interned_fields=INTERNED_FIELDS):
+        self.ngram_size = ngram_size
+        self.interned_fields = interned_fields
+        self._shipments = {}
+        self._by_status = defaultdict(dict)  # Dicts keep insertion order
+        self._by_ngram = defaultdict(list)
+        self._unindexed = set()  # Deleted IDs still in the postings
+
+    def __getitem__(self, shipment_id):
+        return self._shipments[shipment_id]
+
+    def __iter__(self):
+        return iter(self._shipments)
+
+    def __len__(self):
+        return len(self._shipments)
+
+    def get(self, shipment_id, default=None):
+        # Skips the Mapping fallback through __getitem__, as views look up
+        # every shipment of a render
+        return self._shipments.get(shipment_id, default)
+
+    def __setitem__(self, shipment_id, shipment):
+        for field in self.interned_fields:
+            value = shipment.get(field)
+            if type(value) is str:
+                shipment[field] = sys.intern(value)
+        previous = self._shipments.get(shipment_id)
+        if previous is None:
+            if shipment_id in self._unindexed:
+                self._unindexed.discard(shipment_id)  # Still in the postings
+            else:
+                self._index(shipment_id)
+        else:
+            shipment_id = shipment["shipment_id"] = previous["shipment_id"]
+            if previous["status"] != shipment["status"]:
+                self._discard_status(previous["status"], shipment_id)
+        self._shipments[shipment_id] = shipment
+        self._by_status[shipment["status"]][shipment_id] = None
+
+    def __delitem__(self, shipment_id):
+        shipment = self._shipments.pop(shipment_id)
+        self._discard_status(shipment["status"], shipment_id)
+        self._unindexed.add(shipment_id)
+        if len(self._unindexed) > len(self._shipments):
+            self._reindex()
+
+    def update(self, shipments):
+        """
+        Insert, replace or remove several shipments.
+
+        Parameters
+        ----------
+        shipments : dict
+            Shipments keyed by shipment ID; None removes the shipment,
+            if it is stored.
+        """
+        for shipment_id, shipment in shipments.items():
+            if shipment is not None:
+                self[shipment_id] = shipment
+            elif shipment_id in self._shipments:
+                del self[shipment_id]
+
+    def select(self, status="All", term=""):
+        """
+        Find the shipments with a status whose ID contains a search term.
+
+        Parameters
+        ----------
+        status : str, optional
+            The status to filter by, or "All" for any status.
+        term : str, optional
+            A substring of the shipment ID, or "" for any ID.
+
+        Returns
+        -------
+        list
+            The IDs of the matching shipments.
+        """
+        if not term:
+            if status == "All":
+                return list(self._shipments)
+            return list(self._by_status.get(status, ()))
+        found = self.search(term)
+        if status == "All":
+            return found
+        with_status = self._by_status.get(status, {})
+        return [shipment_id for shipment_id in found if shipment_id in with_status]
+
+    def search(self, term):
+        """
+        Find the shipments whose ID contains a search term.
+
+        Parameters
+        ----------
+        term : str
+            The substring to look for.
+
+        Returns
+        -------
+        list
+            The IDs of the matching shipments.
+        """
+        if len(term) < self.ngram_size:
+            # Shorter terms are contained in the grams of every match
+            found = set()
+            for gram, posting in self._by_ngram.items():
+                if term in gram:
+                    found.update(posting)
+            if self._unindexed:
+                found.difference_update(self._unindexed)
+            return list(found)
+        # Every match is in the posting of each gram of the term
+        smallest = min(
+            (
+                self._by_ngram.get(term[i : i + self.ngram_size], ())
+                for i in range(len(term) - self.ngram_size + 1)
+            ),
+            key=len,
+        )
+        return [
+            shipment_id
+            for shipment_id in smallest
+            if term in str(shipment_id) and shipment_id in self._shipments
+        ]
+
+    @staticmethod
+    def matches(shipment, status="All", term=""):
+        """
+        Check a single shipment against the same filters as `select`.
+
+        Parameters
+        ----------
+        shipment : dict or None
+            The shipment to check, or None for a removed shipment.
+        status : str, optional
+            The status to filter by, or "All" for any status.
+        term : str, optional
+            A substring of the shipment ID, or "" for any ID.
+
+        Returns
+        -------
+        bool
+            True if the shipment passes both filters.
+        """
+        if shipment is None:
+            return False
+        if status != "All" and shipment["status"] != status:
+            return False
+        return term in str(shipment["shipment_id"])
+
+    def _index(self, shipment_id):
+        for gram in self._ngrams(shipment_id):
+            self._by_ngram[gram].append(shipment_id)
+
+    def _reindex(self):
+        self._by_ngram = defaultdict(list)
+        self._unindexed.clear()
+        for shipment_id in self._shipments:
+            self._index(shipment_id)
+
+    def _ngrams(self, shipment_id):
+        key = str(shipment_id)
+        if len(key) <= self.ngram_size:
+            return {key}
+        return {
+            key[i : i + self.ngram_size] for i in range(len(key) - self.ngram_size + 1)
+        }
+
+    def _discard_status(self, status, shipment_id):
+        ids = self._by_status[status]
+        del ids[shipment_id]
+        if not ids:
+            del self._by_status[status]
@@ -0,0 +1,318 @@
+"""
+Benchmark harness for the shipment pipeline.
+
+Run the suites from ``projects/gui-proj`` with::
+
+    python -m pytest tests/bench
+
+Each benchmark is run at every size in ``SIZES``; the 1M fleet only
+with ``--bench-large``. Results are compared with ``baseline.json``
+and a benchmark fails when a time or memory figure is more than
+``--bench-tolerance`` above its baseline. Timings depend on the
+machine, so refresh the baseline with ``--bench-save`` when the
+benchmarks move to another one, or after an intended change.
+"""
+
+import json
+import statistics
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from decoding import make_decoder
+from eta import EtaEngine
+from grid import ShipmentGrid
+from ingest import fold_batch
+from ingest_worker import is_decoded
+from mapview import ShipmentMap
+from ordering import EventOrdering
+from sessions import Session
+from simulate import FakeConsumer, ShipmentSimulator
+from store import ShipmentStore
+
+SIZES = (1_000, 100_000, 1_000_000)
+"""
+tuple of int: Fleet sizes every benchmark is run at.
+"""
+
+UPDATES = 20_000
+"""
+int: Updates generated for each fleet, on top of one event per shipment.
+"""
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+NOISE = {"_s": 0.002, "_bytes": 64 * 1024}
+"""
+dict of str to float: Increase over the baseline that never counts as a
+regression, by figure suffix, so that very short timings do not fail on
+noise.
+"""
+
+_results = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption(
+        "--bench-large",
+        action="store_true",
+        help="also run the benchmarks with a fleet of 1M shipments",
+    )
+    group.addoption(
+        "--bench-save",
+        action="store_true",
+        help="write the results to the baseline instead of comparing them",
+    )
+    group.addoption(
+        "--bench-tolerance",
+        type=float,
+        default=0.5,
+        help="allowed increase over the baseline, as a fraction (default: 0.5)",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "size" in metafunc.fixturenames:
+        metafunc.parametrize(
+            "size",
+            [
+                pytest.param(size, marks=pytest.mark.large)
+                if size >= 1_000_000
+                else size
+                for size in SIZES
+            ],
+        )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "large: needs --bench-large to run")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--bench-large"):
+        return
+    skip = pytest.mark.skip(reason="needs --bench-large")
+    for item in items:
+        if "large" in item.keywords:
+            item.add_marker(skip)
+
+
+class Benchmark:
+    """
+    Time a function over several rounds, like pytest-benchmark does.
+
+    Figures whose name ends in ``_s`` or ``_bytes`` are compared with
+    the baseline, lower being better; other figures are only reported.
+
+    Parameters
+    ----------
+    name : str
+        The name of the benchmark in the baseline.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stats = {}
+
+    def __call__(self, function, *args, rounds=5, warmup=1, setup=None):
+        """
+        Time a function and record its median round.
+
+        Parameters
+        ----------
+        function : callable
+            The code to time.
+        *args
+            Passed on to ``function``.
+        rounds : int, optional
+            The number of timed rounds.
+        warmup : int, optional
+            Rounds run first and not timed.
+        setup : callable, optional
+            Called untimed before every round; when it returns a tuple,
+            that is passed to ``function`` instead of ``args``.
+
+        Returns
+        -------
+        object
+            What ``function`` returned in the last round.
+        """
+        times = []
+        for round in range(warmup + rounds):
+            if setup is not None:
+                prepared = setup()
+                if prepared is not None:
+                    args = prepared
+            started = time.perf_counter()
+            result = function(*args)
+            elapsed = time.perf_counter() - started
+            if round >= warmup:
+                times.append(elapsed)
+        self.record("median_s", statistics.median(times))
+        return result
+
+    def record(self, figure, value):
+        """
+        Record a figure of the benchmark.
+
+        Parameters
+        ----------
+        figure : str
+            Its name, ending in ``_s`` or ``_bytes`` to compare it with
+            the baseline.
+        value : float
+            Its value.
+        """
+        self.stats[figure] = value
+
+
+def _compared(figure):
+    return figure.endswith(tuple(NOISE))
+
+
+def _regressed(figure, value, baseline, tolerance):
+    noise = next(noise for suffix, noise in NOISE.items() if figure.endswith(suffix))
+    return value > max(baseline * (1 + tolerance), baseline + noise)
+
+
+def _load_baseline():
+    if not BASELINE_PATH.exists():
+        return {}
+    return json.loads(BASELINE_PATH.read_text())
+
+
+@pytest.fixture
+def benchmark(request):
+    """Time the benchmark and fail it if it regressed from the baseline."""
+    bench = Benchmark(request.node.name)
+    yield bench
+    if not bench.stats:
+        return
+    _results[bench.name] = bench.stats
+    if request.config.getoption("--bench-save"):
+        return
+    baseline = _load_baseline().get(bench.name, {})
+    tolerance = request.config.getoption("--bench-tolerance")
+    regressed = [
+        f"{figure} {value:.4g} > {baseline[figure]:.4g} + {tolerance:.0%}"
+        for figure, value in bench.stats.items()
+        if _compared(figure)
+        and figure in baseline
+        and _regressed(figure, value, baseline[figure], tolerance)
+    ]
+    if regressed:
+        pytest.fail(f"{bench.name} regressed: {'; '.join(regressed)}")
+
+
+@pytest.fixture(scope="session")
+def fleets():
+    """Generate the events of each fleet size once per run."""
+    generated = {}
+
+    def fleet(size):
+        if size not in generated:
+            simulator = ShipmentSimulator(size)
+            generated[size] = (simulator.messages(), simulator.messages(UPDATES))
+        return generated[size]
+
+    return fleet
+
+
+@pytest.fixture
+def fleet(fleets, size):
+    """The initial records and the update records of a fleet."""
+    return fleets(size)
+
+
+@pytest.fixture(scope="session")
+def decoder():
+    """The decoder of the configured shipment encoding."""
+    return make_decoder()
+
+
+def load(consumer):
+    """
+    Read every record of a consumer into a new store, like a catch-up.
+
+    Parameters
+    ----------
+    consumer : FakeConsumer
+        Serves the records.
+
+    Returns
+    -------
+    tuple
+        The store, `EtaEngine` and `EventOrdering` the records went into.
+    """
+    shipments = ShipmentStore()
+    eta_engine = EtaEngine()
+    ordering = EventOrdering()
+    records = [record for batch in consumer.poll().values() for record in batch]
+    updates, _ = fold_batch(records, is_decoded, ordering)
+    eta_engine.annotate(updates.values())
+    shipments.update(updates)
+    return shipments, eta_engine, ordering
+
+
+@pytest.fixture
+def loaded(fleet, decoder):
+    """The store, ETA engine and ordering of a fleet after its initial events."""
+    initial, _ = fleet
+    return load(FakeConsumer(initial, decoder))
+
+
+def format_grid_row(shipment):
+    return {
+        "shipment_id": shipment["shipment_id"],
+        "status": shipment["status"],
+        "location": shipment["location"],
+        "timestamp": shipment["timestamp"],
+        "eta": f"{shipment.get('eta_hours', 0):.1f} hours",
+    }
+
+
+SORT_KEYS = {
+    "status": lambda shipment: shipment["status"],
+    "timestamp": lambda shipment: shipment["timestamp"],
+}
+
+
+@pytest.fixture
+def sessions():
+    """
+    Browsers watching all shipments and those in transit, without a UI.
+
+    Returns
+    -------
+    list of Session
+        Sessions with a grid and a map whose UI elements are mocks.
+    """
+    with patch("grid.ui"), patch("mapview.ui"):
+        everything = Session(
+            ShipmentGrid(format_grid_row, SORT_KEYS), ShipmentMap(), None
+        )
+        in_transit = Session(
+            ShipmentGrid(format_grid_row, SORT_KEYS), ShipmentMap(), None
+        )
+        in_transit.status = "In Transit"
+        yield [everything, in_transit]
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not _results:
+        return
+    terminalreporter.section("benchmarks")
+    for name, stats in _results.items():
+        figures = ", ".join(f"{figure}={value:.4g}" for figure, value in stats.items())
+        terminalreporter.write_line(f"{name}: {figures}")
+    if config.getoption("--bench-save"):
+        baseline = _load_baseline()
+        baseline.update(
+            (name, {f: v for f, v in stats.items() if _compared(f)})
+            for name, stats in _results.items()
+        )
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        terminalreporter.write_line(f"Saved the baseline to {BASELINE_PATH}")
@@ -0,0 +1,62 @@
+import asyncio
+
+from conftest import load
+
+from ingest import ConsumerThread, fold_batch
+from ingest_worker import is_decoded
+from ordering import EventOrdering
+from sessions import SessionHub
+from simulate import FakeConsumer
+
+
+async def consume(consumer, shipments, eta_engine, ordering, hub):
+    """Run the dashboard's ingest loop until every record was applied."""
+    ingest_thread = ConsumerThread(consumer, asyncio.get_running_loop())
+    ingest_thread.start()
+    applied = 0
+    try:
+        async for batch in ingest_thread.batches():
+            updates, _ = fold_batch(batch, is_decoded, ordering)
+            eta_engine.annotate(updates.values())
+            previous = {
+                shipment_id: shipments.get(shipment_id) for shipment_id in updates
+            }
+            shipments.update(updates)
+            hub.publish(shipments, updates, previous, notify=False)
+            applied += len(batch)
+            if applied == consumer.total:
+                break
+    finally:
+        ingest_thread.stop()
+        await asyncio.to_thread(ingest_thread.join)
+    return applied
+
+
+def test_bootstrap_load(benchmark, fleet, decoder, size):
+    initial, _ = fleet
+
+    shipments, _, _ = benchmark(
+        load, setup=lambda: (FakeConsumer(initial, decoder),), rounds=3
+    )
+
+    assert len(shipments) == size
+    benchmark.record("shipments_per_second", size / benchmark.stats["median_s"])
+
+
+def test_ingest_throughput(benchmark, fleet, decoder, loaded, sessions):
+    _, updates = fleet
+    shipments, eta_engine, _ = loaded
+    hub = SessionHub()
+    for session in sessions:
+        hub.add(session)
+
+    def setup():
+        consumer = FakeConsumer(updates, decoder, partitions=3)
+        return consumer, shipments, eta_engine, EventOrdering(), hub
+
+    applied = benchmark(
+        lambda *state: asyncio.run(consume(*state)), setup=setup, rounds=3
+    )
+
+    assert applied == len(updates)
+    benchmark.record("events_per_second", len(updates) / benchmark.stats["median_s"])
@@ -0,0 +1,25 @@
+import gc
+import tracemalloc
+
+from conftest import load
+
+from simulate import FakeConsumer
+
+
+def test_store_memory(benchmark, fleet, decoder, size):
+    initial, _ = fleet
+    consumer = FakeConsumer(initial, decoder)
+    gc.collect()
+
+    tracemalloc.start()
+    try:
+        state = load(consumer)
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(state[0]) == size
+    benchmark.record("retained_bytes", retained)
+    benchmark.record("peak_bytes", peak)
+    benchmark.record("bytes_per_shipment", retained / size)
@@ -0,0 +1,80 @@
+import itertools
+
+import pytest
+
+from constants import HISTORY_MAX_TRAILS
+from history import ShipmentHistory
+from ingest import fold_batch
+from ingest_worker import is_decoded
+from simulate import FakeConsumer
+
+BATCH = 500
+
+
+def render(session, shipments):
+    """Refresh the list and the map of a browser, as its scheduler does."""
+    session.view.render(shipments, session.status, session.term)
+    session.map.render(shipments, session.status)
+
+
+def test_refresh_latency(benchmark, fleet, decoder, loaded, sessions):
+    _, updates = fleet
+    shipments, eta_engine, _ = loaded
+    for session in sessions:
+        render(session, shipments)
+    consumer = FakeConsumer(updates, decoder)
+    batches = itertools.cycle(
+        [list(batch) for batch in itertools.batched(consumer, BATCH)]
+    )
+
+    def setup():
+        updates, _ = fold_batch(next(batches), is_decoded)
+        eta_engine.annotate(updates.values())
+        shipments.update(updates)
+        for session in sessions:
+            session.mark_changed(updates)
+
+    benchmark(
+        lambda: [render(session, shipments) for session in sessions],
+        setup=setup,
+        rounds=10,
+    )
+
+
+def test_filter_change_latency(benchmark, loaded, sessions):
+    shipments, _, _ = loaded
+    session = sessions[0]
+    statuses = itertools.cycle(["In Transit", "Delivered", "All"])
+
+    def setup():
+        session.status = next(statuses)
+        session.invalidate()
+
+    benchmark(render, session, shipments, setup=setup, rounds=6)
+
+
+@pytest.fixture
+def history(fleet, decoder, loaded):
+    """The history of a fleet after its initial events and updates."""
+    _, updates = fleet
+    shipments, _, _ = loaded
+    history = ShipmentHistory()
+    history.record({shipment_id: shipments[shipment_id] for shipment_id in shipments})
+    for batch in itertools.batched(FakeConsumer(updates, decoder), BATCH):
+        history.record(fold_batch(list(batch), is_decoded)[0])
+    return history
+
+
+def test_trails_latency(benchmark, history):
+    lat, _, _ = benchmark(history.trails, "In Transit", HISTORY_MAX_TRAILS, rounds=10)
+    assert len(lat) == HISTORY_MAX_TRAILS * (history.points + 1)
+
+
+def test_replay_latency(benchmark, history, size):
+    oldest, newest = history.span()
+    instants = itertools.cycle(
+        oldest + (newest - oldest) * step / 10 for step in range(1, 11)
+    )
+
+    shipment_ids, _, _, _ = benchmark(lambda: history.at(next(instants)), rounds=10)
+    assert 0 < len(shipment_ids) <= size
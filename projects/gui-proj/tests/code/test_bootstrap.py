@@ -0,0 +1,183 @@
+from unittest.mock import MagicMock
+
+import pytest
+from kafka import TopicPartition
+
+from bootstrap import PartitionLoader, bootstrap_partitions
+from ordering import EventOrdering
+
+TOPIC = "shipment_updates"
+
+
+def record(partition, offset, shipment_id, timestamp, status="In Transit"):
+    value = {"shipment_id": shipment_id, "timestamp": timestamp, "status": status}
+    return MagicMock(value=value, partition=partition, offset=offset)
+
+
+class FakeConsumer:
+    """Serve fixed records per partition, like a compacted topic with gaps."""
+
+    def __init__(self, log):
+        self.log = log
+        self.partition = None
+        self.offset = None
+        self.closed = False
+
+    def partitions_for_topic(self, topic):
+        return set(self.log)
+
+    def end_offsets(self, partitions):
+        return {
+            partition: self.log[partition.partition][-1].offset + 1
+            for partition in partitions
+        }
+
+    def assign(self, partitions):
+        (self.partition,) = partitions
+
+    def seek_to_beginning(self, partition):
+        self.offset = self.log[partition.partition][0].offset
+
+    def seek(self, partition, offset):
+        self.offset = offset
+
+    def position(self, partition):
+        return self.offset
+
+    def poll(self, timeout_ms, max_records):
+        records = [
+            message
+            for message in self.log[self.partition.partition]
+            if message.offset >= self.offset
+        ][:max_records]
+        if records:
+            self.offset = records[-1].offset + 1
+        return {self.partition: records} if records else {}
+
+    def close(self):
+        self.closed = True
+
+
+LOG = {
+    0: [
+        record(0, 3, "A", "10:00"),
+        record(0, 7, "B", "10:00"),
+        record(0, 8, "A", "11:00", "Delivered"),
+    ],
+    1: [
+        record(1, 0, "C", "10:00"),
+        record(1, 1, "A", "09:00"),  # Moved partition, but older
+        MagicMock(value={"status": "broken"}, partition=1, offset=5),
+    ],
+}
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_partitions_loads_latest_events():
+    consumers = []
+
+    def make_consumer():
+        consumers.append(FakeConsumer(LOG))
+        return consumers[-1]
+
+    ordering = EventOrdering()
+    progress = []
+
+    updates, positions = await bootstrap_partitions(
+        make_consumer,
+        TOPIC,
+        {},
+        lambda event: "shipment_id" in event,
+        ordering,
+        on_progress=progress.append,
+        progress_interval_s=0.01,
+    )
+
+    assert {key: event["status"] for key, event in updates.items()} == {
+        "A": "Delivered",
+        "B": "In Transit",
+        "C": "In Transit",
+    }
+    assert updates["A"] is LOG[0][2].value
+    assert positions == {(TOPIC, 0): 9, (TOPIC, 1): 6}
+    assert ordering.versions["A"] == ("11:00", 0, 8)
+    assert progress[-1] == 1.0
+    assert len(consumers) == 3 and all(consumer.closed for consumer in consumers)
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_partitions_resumes_from_offsets():
+    updates, positions = await bootstrap_partitions(
+        lambda: FakeConsumer(LOG),
+        TOPIC,
+        {(TOPIC, 0): 8, (TOPIC, 1): 6},
+        lambda event: True,
+        EventOrdering(),
+        progress_interval_s=0.01,
+    )
+
+    assert list(updates) == ["A"]
+    assert positions == {(TOPIC, 0): 9, (TOPIC, 1): 6}
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_partitions_raises_loader_errors():
+    def make_consumer():
+        consumer = FakeConsumer(LOG)
+        if make_consumer.calls:
+            consumer.poll = MagicMock(side_effect=ConnectionError("broker down"))
+        make_consumer.calls += 1
+        return consumer
+
+    make_consumer.calls = 0
+
+    with pytest.raises(ConnectionError):
+        await bootstrap_partitions(
+            make_consumer,
+            TOPIC,
+            {},
+            lambda event: True,
+            EventOrdering(),
+            progress_interval_s=0.01,
+        )
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_partitions_applies_tombstones():
+    log = {
+        0: [
+            record(0, 0, "A", "10:00"),
+            record(0, 1, "B", "10:00"),
+            MagicMock(value=None, key=b"A", partition=0, offset=2),
+            MagicMock(value=None, key=None, partition=0, offset=3),
+        ]
+    }
+    ordering = EventOrdering()
+    ordering.accept({"shipment_id": "A", "timestamp": "09:00"})
+
+    updates, _ = await bootstrap_partitions(
+        lambda: FakeConsumer(log),
+        TOPIC,
+        {},
+        lambda event: True,
+        ordering,
+        progress_interval_s=0.01,
+    )
+
+    assert updates == {"A": None, "B": log[0][1].value}
+    assert "A" not in ordering.versions
+
+
+def test_partition_loader_counts_invalid_events():
+    loader = PartitionLoader(
+        lambda: FakeConsumer(LOG),
+        TopicPartition(TOPIC, 1),
+        None,
+        6,
+        lambda event: "shipment_id" in event,
+    )
+    loader.run()
+
+    assert loader.invalid == 1
+    assert (loader.loaded, loader.total) == (6, 6)
+    assert set(loader.latest) == {"A", "C"}
@@ -0,0 +1,66 @@
+import pytest
+
+from clusters import SpatialGrid, in_bounds
+from store import ShipmentStore
+
+
+@pytest.fixture
+def grid():
+    grid = SpatialGrid(cluster_cells=(10.0, 1.0), point_cell=1.0)
+    grid.move("A", (40.2, -74.2), "In Transit")
+    grid.move("B", (40.6, -74.8), "Delivered")
+    grid.move("C", (34.0, -118.2), "In Transit")
+    return grid
+
+
+def test_clusters_count_shipments_per_cell(grid):
+    clusters = sorted(grid.clusters(0))
+    assert clusters == [
+        (34.0, -118.2, 1),
+        (pytest.approx(40.4), pytest.approx(-74.5), 2),
+    ]
+    assert sorted(count for _, _, count in grid.clusters(0, "Delivered")) == [1]
+
+
+def test_move_updates_clusters_and_viewport(grid):
+    grid.move("C", (40.5, -74.5), "In Transit")
+    assert [count for _, _, count in grid.clusters(0)] == [3]
+
+    grid.move("A", None, None)
+    assert sorted(grid.ids_in((40, 41, -75, -74))) == ["B", "C"]
+    assert [count for _, _, count in grid.clusters(0, "In Transit")] == [1]
+
+
+def test_ids_in_only_returns_shipments_in_bounds(grid):
+    assert grid.ids_in((40.0, 40.4, -74.5, -74.0)) == ["A"]
+    assert grid.ids_in((0, 10, 0, 10)) == []
+    assert in_bounds((40.2, -74.2), (40.0, 40.4, -74.5, -74.0))
+
+
+def test_update_reindexes_changed_shipments():
+    store = ShipmentStore()
+    store.update(
+        {
+            "A": {
+                "shipment_id": "A",
+                "status": "In Transit",
+                "latitude": "40.2",
+                "longitude": "-74.2",
+            },
+            "B": {"shipment_id": "B", "status": "In Transit"},
+            "C": {
+                "shipment_id": "C",
+                "status": "In Transit",
+                "latitude": "nan",
+                "longitude": float("inf"),
+            },
+        }
+    )
+    grid = SpatialGrid()
+    grid.update(store, ["A", "B", "C"])
+    assert set(grid.positions) == {"A"}
+
+    del store["A"]
+    grid.update(store, ["A"])
+    assert grid.positions == {}
+    assert grid.clusters(0) == []
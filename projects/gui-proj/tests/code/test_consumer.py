@@ -2,13 +2,21 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from consumer import consume_shipment_updates, debounce_update, is_valid_shipment
+from consumer import consume_shipment_updates, is_valid_shipment, schedule_update
+
+
+async def as_batches(*batches):
+    """Yield each argument as one batch from a mocked `ConsumerThread`."""
+    for batch in batches:
+        yield batch
 
 
 @pytest.mark.asyncio
 async def test_consume_shipment_updates():
     mock_consumer = MagicMock()
-    mock_consumer.__iter__.return_value = iter(
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    mock_thread.batches.return_value = as_batches(
         [
             MagicMock(
                 value={
@@ -21,12 +29,13 @@ async def test_consume_shipment_updates():
         ]
     )
     with (
-        patch("consumer.consumer", mock_consumer),
-        patch("consumer.ui.notify") as mock_notify,
-        patch("consumer.debounce_update", new_callable=AsyncMock),
+        patch("main.consumer", mock_consumer),
+        patch("main.ConsumerThread", return_value=mock_thread),
+        patch("main.checkpointer", MagicMock(**{"load.return_value": []})),
+        patch("main.apply_updates", new_callable=AsyncMock) as mock_apply,
     ):
         await consume_shipment_updates()
-        mock_notify.assert_called()
+        mock_apply.assert_awaited_once()
 
 
 @pytest.mark.parametrize(
@@ -52,7 +61,7 @@ def test_is_valid_shipment(event, expected_validity):
 
 
 @pytest.mark.asyncio
-async def test_debounce_update():
-    with patch("consumer.update_ui", new_callable=AsyncMock) as mock_update_ui:
-        await debounce_update()
-        mock_update_ui.assert_called_once()
+async def test_schedule_update():
+    session = MagicMock()
+    schedule_update(session, immediate=True)
+    session.refresh.request.assert_called_once_with(True)
@@ -0,0 +1,117 @@
+import io
+import json
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import pytest
+
+from decoding import (
+    InvalidShipment,
+    JsonDecoder,
+    ShipmentEvent,
+    make_decoder,
+)
+
+EVENT = {
+    "shipment_id": "SHP-1",
+    "status": "In Transit",
+    "location": "NY",
+    "timestamp": "2023-01-01T12:00:00",
+    "latitude": "40.730610",
+    "longitude": -73.935242,
+    "unknown_field": [1, 2, 3],
+}
+
+
+def check_event(event):
+    assert isinstance(event, ShipmentEvent)
+    assert event.shipment_id == "SHP-1"
+    assert event.latitude == pytest.approx(40.73061)
+    assert event.longitude == pytest.approx(-73.935242)
+
+
+@pytest.fixture(params=["msgspec", "orjson", "json"])
+def json_decoder(request):
+    pytest.importorskip(request.param)
+    with ExitStack() as stack:
+        if request.param != "msgspec":
+            stack.enter_context(patch("decoding.msgspec", None))
+        if request.param == "json":
+            stack.enter_context(patch("decoding.orjson", None))
+        yield JsonDecoder()
+
+
+def test_json_decoder(json_decoder):
+    payload = json.dumps(EVENT).encode()
+    check_event(json_decoder(payload))
+    check_event(json_decoder(memoryview(payload)))
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b"not json",
+        b"[1, 2]",
+        json.dumps({"shipment_id": "SHP-1", "status": "In Transit"}).encode(),
+        json.dumps({**EVENT, "latitude": "north"}).encode(),
+        json.dumps({**EVENT, "latitude": "nan"}).encode(),
+        json.dumps({**EVENT, "longitude": "-inf"}).encode(),
+        json.dumps({**EVENT, "destination_lat": 90.5}).encode(),
+        json.dumps({**EVENT, "destination_lon": 181}).encode(),
+    ],
+)
+def test_json_decoder_rejects_bad_payloads(json_decoder, payload):
+    event = json_decoder(payload)
+    assert isinstance(event, InvalidShipment)
+    assert str(event)
+
+
+def test_msgpack_decoder():
+    msgspec = pytest.importorskip("msgspec")
+    decoder = make_decoder("msgpack")
+    check_event(decoder(memoryview(msgspec.msgpack.encode(EVENT))))
+    assert isinstance(decoder(msgspec.msgpack.encode({"status": 1})), InvalidShipment)
+    nan = msgspec.msgpack.encode({**EVENT, "latitude": float("nan")})
+    assert isinstance(decoder(nan), InvalidShipment)
+
+
+def test_avro_decoder():
+    fastavro = pytest.importorskip("fastavro")
+    decoder = make_decoder("avro")
+    buffer = io.BytesIO()
+    fastavro.schemaless_writer(
+        buffer,
+        decoder._schema,
+        {**EVENT, "latitude": 40.730610, "destination_lat": None},
+    )
+    check_event(decoder(buffer.getvalue()))
+    assert isinstance(decoder(b"\x02"), InvalidShipment)
+
+    buffer = io.BytesIO()
+    fastavro.schemaless_writer(
+        buffer, decoder._schema, {**EVENT, "latitude": float("inf")}
+    )
+    assert isinstance(decoder(buffer.getvalue()), InvalidShipment)
+
+
+@pytest.mark.parametrize("encoding", ["msgpack", "avro"])
+def test_decoders_pass_tombstones_through(encoding):
+    pytest.importorskip("fastavro" if encoding == "avro" else "msgspec")
+    assert make_decoder(encoding)(None) is None
+
+
+def test_json_decoder_passes_tombstones_through(json_decoder):
+    assert json_decoder(None) is None
+
+
+def test_shipment_event_reads_like_a_dict():
+    event = ShipmentEvent("SHP-1", "Delivered", "NY", "2023-01-01", latitude=1.5)
+
+    assert event["status"] == "Delivered"
+    assert "latitude" in event and "longitude" not in event
+    assert event.get("mode", "road") == "road"
+    with pytest.raises(KeyError):
+        event["longitude"]
+
+    event["eta_hours"] = 2.0
+    assert event.eta_hours == 2.0
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+
+from eta import EtaEngine, haversine_km
+
+NYC = (40.7128, -74.0060)
+LOS_ANGELES = {"shipment_id": "LA", "latitude": "34.052235", "longitude": "-118.243683"}
+
+
+def test_haversine_km_is_close_to_geodesic():
+    lat = np.array([34.052235, 51.5074, 40.7128])
+    lon = np.array([-118.243683, -0.1278, -74.0060])
+    distances = haversine_km(lat, lon, *NYC)
+
+    expected = [geodesic((a, b), NYC).kilometers for a, b in zip(lat, lon)]
+    assert distances == pytest.approx(expected, rel=0.005)
+    assert distances[2] == 0
+
+
+@pytest.mark.parametrize("precise", [False, True])
+def test_hours(precise):
+    engine = EtaEngine(destination=NYC, speeds={"road": 60}, precise=precise)
+    hours = engine.hours([LOS_ANGELES, {"shipment_id": "X"}])
+
+    assert hours[0] == pytest.approx(65.7, abs=0.2)
+    assert hours[1] is None
+
+
+def test_hours_uses_shipment_destination_and_mode():
+    engine = EtaEngine(destination=NYC, speeds={"road": 60, "air": 600})
+    shipments = [
+        {**LOS_ANGELES, "mode": "air"},
+        {**LOS_ANGELES, "mode": "teleport"},  # Unknown modes use the default
+        {
+            **LOS_ANGELES,
+            "destination_lat": "34.052235",
+            "destination_lon": "-118.243683",
+        },
+    ]
+    hours = engine.hours(shipments)
+
+    assert hours[0] == pytest.approx(6.57, abs=0.02)
+    assert hours[1] == pytest.approx(65.7, abs=0.2)
+    assert hours[2] == 0
+
+
+def test_annotate_stores_eta_on_shipments():
+    engine = EtaEngine(destination=NYC, speeds={"road": 60})
+    shipments = [dict(LOS_ANGELES), {"shipment_id": "X"}]
+    engine.annotate(shipments)
+
+    assert shipments[0]["eta_hours"] == pytest.approx(65.7, abs=0.2)
+    assert shipments[1]["eta_hours"] is None
+
+
+def test_hours_only_recomputes_moved_shipments():
+    engine = EtaEngine(destination=NYC)
+    shipments = [
+        {"shipment_id": str(n), "latitude": str(30 + n), "longitude": "-100"}
+        for n in range(3)
+    ]
+    first = engine.hours(shipments)
+
+    shipments[1] = {"shipment_id": "1", "latitude": "40.7128", "longitude": "-74.0060"}
+    with patch.object(engine, "_solve", wraps=engine._solve) as solve:
+        second = engine.hours(shipments)
+
+    solve.assert_called_once_with([(40.7128, -74.0060, *NYC, 0)])
+    assert second[0] == first[0] and second[2] == first[2]
+    assert second[1] == 0
+
+
+def test_forget_drops_cached_eta():
+    engine = EtaEngine(destination=NYC)
+    engine.hours([LOS_ANGELES])
+    engine.forget("LA")
+
+    with patch.object(engine, "_solve", wraps=engine._solve) as solve:
+        engine.hours([LOS_ANGELES])
+    solve.assert_called_once()
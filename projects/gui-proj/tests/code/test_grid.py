@@ -0,0 +1,112 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from grid import ShipmentGrid, query_page
+from store import ShipmentStore
+
+SHIPMENTS = ShipmentStore()
+SHIPMENTS.update(
+    {
+        "A": {"shipment_id": "A", "status": "In Transit", "eta": 5.0},
+        "B": {"shipment_id": "B", "status": "Delivered", "eta": None},
+        "C": {"shipment_id": "C", "status": "In Transit", "eta": 1.0},
+        "D": {"shipment_id": "D", "status": "In Transit", "eta": 3.0},
+    }
+)
+SORT_KEYS = {"eta": lambda shipment: shipment["eta"]}
+
+
+def ids(page):
+    return [shipment["shipment_id"] for shipment in page]
+
+
+@pytest.mark.parametrize(
+    "descending, page, expected_ids",
+    [
+        (False, 1, ["C", "D"]),
+        (False, 2, ["A", "B"]),  # Missing ETA is listed last
+        (True, 1, ["A", "D"]),
+        (True, 2, ["C", "B"]),
+    ],
+)
+def test_query_page_sorts_and_paginates(descending, page, expected_ids):
+    rows, total = query_page(
+        SHIPMENTS, "All", "", SORT_KEYS, "eta", descending, page, 2
+    )
+    assert ids(rows) == expected_ids
+    assert total == 4
+
+
+def test_query_page_filters_before_paginating():
+    rows, total = query_page(SHIPMENTS, "In Transit", "", SORT_KEYS, None, False, 1, 10)
+    assert ids(rows) == ["A", "C", "D"]
+    assert total == 3
+
+
+@pytest.fixture
+def grid():
+    with patch("grid.ui"):
+        yield ShipmentGrid(
+            lambda shipment: {"id": shipment["shipment_id"]}, SORT_KEYS, 2
+        )
+
+
+def test_grid_sends_only_the_current_page(grid):
+    grid.pagination["sortBy"] = "eta"
+    grid.pagination["descending"] = False
+    grid.invalidate()
+
+    assert grid.render(SHIPMENTS, "All", "") == 2
+    assert grid.table.rows == [{"id": "C"}, {"id": "D"}]
+    assert grid.table.pagination["rowsNumber"] == 4
+
+    # Nothing changed since, so nothing is sent
+    assert grid.render(SHIPMENTS, "All", "") == 0
+
+
+def test_new_grid_sends_the_first_page(grid):
+    assert grid.render(SHIPMENTS, "All", "") == 2
+    assert grid.table.pagination["rowsNumber"] == 4
+
+
+def test_filter_change_goes_back_to_the_first_page(grid):
+    grid.render(SHIPMENTS, "All", "")
+    grid._on_request(MagicMock(args={"pagination": {"page": 2}}))
+
+    grid.invalidate()
+    assert grid.render(SHIPMENTS, "Delivered", "") == 1
+    assert grid.table.pagination["page"] == 1
+
+
+def test_grid_answers_page_requests(grid):
+    grid.pagination["sortBy"] = "eta"
+    grid.invalidate()
+    grid.render(SHIPMENTS, "All", "")
+
+    grid._on_request(
+        MagicMock(
+            args={"pagination": {"page": 2, "sortBy": "eta", "descending": False}}
+        )
+    )
+    assert grid.table.rows == [{"id": "A"}, {"id": "B"}]
+
+
+@pytest.mark.asyncio
+async def test_grid_streams_a_search_result_as_one_page(grid):
+    grid.pagination["sortBy"] = "eta"
+    grid.pagination["descending"] = False
+
+    assert await grid.stream(SHIPMENTS, "All", "", {"A": None, "B": None}) == 2
+    assert grid.table.rows == [{"id": "A"}, {"id": "B"}]
+    assert grid.table.pagination["rowsNumber"] == 2
+    assert grid.render(SHIPMENTS, "All", "") == 0
+
+
+@pytest.mark.asyncio
+async def test_grid_streams_a_search_result_from_the_first_page(grid):
+    grid.render(SHIPMENTS, "All", "")
+    grid._on_request(MagicMock(args={"pagination": {"page": 2}}))
+
+    assert await grid.stream(SHIPMENTS, "All", "A", {"A": None}) == 1
+    assert grid.table.pagination["page"] == 1
@@ -0,0 +1,159 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from history import ShipmentHistory, parse_time
+
+
+def event(shipment_id, minute, lat, lon, status="In Transit"):
+    return {
+        "shipment_id": shipment_id,
+        "status": status,
+        "latitude": lat,
+        "longitude": lon,
+        "timestamp": f"2024-01-01T10:{minute:02d}:00+00:00",
+    }
+
+
+def at_minute(minute):
+    return parse_time(f"2024-01-01T10:{minute:02d}:00+00:00")
+
+
+@pytest.fixture
+def history():
+    return ShipmentHistory(points=3, window_s=3600, capacity=1)
+
+
+def test_parse_time():
+    assert parse_time("1970-01-01T00:01:00+00:00") == 60
+    assert parse_time("yesterday") is None
+    assert parse_time(None) is None
+
+
+def test_trail_keeps_the_latest_points_in_order(history):
+    for minute in range(5):
+        history.record({"A": event("A", minute, 40 + minute, -74)})
+
+    times, lat, lon = history.trail("A")
+
+    assert times.tolist() == [at_minute(2), at_minute(3), at_minute(4)]
+    assert lat.tolist() == [42, 43, 44]
+    assert lon.tolist() == [-74, -74, -74]
+
+
+def test_rows_grow_with_the_fleet(history):
+    history.record({shipment_id: event(shipment_id, 0, 1, 2) for shipment_id in "ABC"})
+
+    assert len(history) == 3
+    assert history.times.shape == (4, 3)
+    assert history.trail("C")[1].tolist() == [1]
+    assert history.trail("D")[0].size == 0
+
+
+def test_old_entries_and_shipments_are_evicted():
+    history = ShipmentHistory(points=4, window_s=600)
+    history.record({"A": event("A", 0, 40, -74), "B": event("B", 0, 34, -118)})
+    history.record({"A": event("A", 5, 41, -74)})
+    history.record({"A": event("A", 15, 42, -74)})
+
+    assert history.trail("A")[1].tolist() == [41, 42]
+    assert len(history) == 1
+    assert history.span() == (at_minute(5), at_minute(15))
+
+    history.record({"C": event("C", 16, 51, 0)})
+    assert history.rows["C"] == 1  # B's row is reused
+
+
+def test_trails_are_separated_by_nan(history):
+    history.record({"A": event("A", 0, 40, -74), "B": event("B", 0, 34, -118)})
+    history.record({"A": event("A", 1, 41, -73)})
+
+    lat, lon, shipment_ids = history.trails()
+
+    assert shipment_ids == ["A", "B"]
+    np.testing.assert_array_equal(
+        lat.reshape(2, 4),
+        [[np.nan, 40, 41, np.nan], [np.nan, np.nan, 34, np.nan]],
+    )
+    assert lon.shape == lat.shape
+
+
+def test_trails_filter_by_latest_status_and_recency(history):
+    history.record({"A": event("A", 0, 40, -74), "B": event("B", 1, 34, -118)})
+    history.record({"C": event("C", 2, 51, 0, status="Delivered")})
+
+    assert history.trails("Delivered")[2] == ["C"]
+    assert history.trails("Lost")[2] == []
+    assert sorted(history.trails(limit=2)[2]) == ["B", "C"]
+    lat, _, _ = history.trails(since=at_minute(1))
+    assert sorted(lat[~np.isnan(lat)].tolist()) == [34, 51]
+
+
+def test_at_replays_the_fleet_at_an_instant(history):
+    history.record({"A": event("A", 0, 40, -74), "B": event("B", 5, 34, -118)})
+    history.record({"A": event("A", 10, 41, -73, status="Delivered")})
+
+    shipment_ids, lat, lon, statuses = history.at(at_minute(7))
+
+    assert shipment_ids == ["A", "B"]
+    assert lat.tolist() == [40, 34]
+    assert lon.tolist() == [-74, -118]
+    assert statuses == ["In Transit", "In Transit"]
+    assert history.at(at_minute(10), "Delivered")[0] == ["A"]
+    assert history.at(at_minute(0) - 1)[0] == []
+
+
+def test_events_without_time_or_position(history):
+    with patch("history.time.time", return_value=at_minute(3)):
+        history.record({"A": {"status": "In Transit", "timestamp": "soon"}})
+
+    times, lat, lon = history.trail("A")
+    assert times.tolist() == [at_minute(3)]
+    assert np.isnan(lat[0]) and np.isnan(lon[0])
+
+
+def test_forget_frees_the_row(history):
+    history.record({"A": event("A", 0, 40, -74)})
+    history.forget("A")
+    history.forget("A")
+
+    assert len(history) == 0
+    assert history.span() is None
+    assert history.at(at_minute(1))[0] == []
+
+
+def test_trails_skip_forgotten_and_evicted_shipments(history):
+    history.record({"A": event("A", 0, 40, -74), "B": event("B", 1, 34, -118)})
+    history.forget("A")
+
+    assert history.trails()[2] == ["B"]
+    history.evict(at_minute(2))
+    assert history.trails()[2] == []
+
+
+def test_statuses_past_the_code_table_are_unknown(history):
+    with patch("history.np.iinfo") as iinfo:
+        iinfo.return_value.max = 2
+        history.record({"A": event("A", 0, 40, -74, status="In Transit")})
+        history.record({"A": event("A", 1, 40, -74, status="Delivered")})
+        history.record({"A": event("A", 2, 40, -74, status="Lost")})
+
+    assert history.at(at_minute(2))[3] == [None]
+    assert history.trails("Delivered")[2] == []
+    assert len(history.statuses) == 3
+
+
+def test_many_distinct_statuses_fit(history):
+    for minute in range(300):
+        history.record({"A": event("A", minute % 60, 40, -74, status=f"S{minute}")})
+
+    assert history.trails("S299")[2] == ["A"]
+
+
+def test_coordinates_are_read_as_numbers(history):
+    history.record({"A": {**event("A", 0, "40.5", -74), "longitude": ""}})
+
+    _, lat, lon = history.trail("A")
+    assert lat.tolist() == [40.5]
+    assert np.isnan(lon[0])
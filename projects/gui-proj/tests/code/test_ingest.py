@@ -0,0 +1,195 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from kafka import TopicPartition
+
+from ingest import ConsumerThread, fold_batch
+from ordering import EventOrdering
+
+
+def make_consumer(polls):
+    """Return a mock consumer whose poll results come from ``polls``, then stay empty."""
+    polls = list(polls)
+    consumer = MagicMock()
+    consumer.poll.side_effect = lambda timeout_ms, max_records: (
+        polls.pop(0) if polls else {}
+    )
+    consumer.highwater.return_value = None
+    return consumer
+
+
+@pytest.mark.asyncio
+async def test_consumer_thread_yields_batches():
+    consumer = make_consumer([{"tp0": [1, 2], "tp1": [3]}, {}, {"tp0": [4]}])
+    thread = ConsumerThread(
+        consumer, asyncio.get_running_loop(), poll_timeout_ms=10, linger_ms=0
+    )
+    thread.start()
+
+    batches = []
+    async for batch in thread.batches():
+        batches.append(batch)
+        if len(batches) == 2:
+            thread.stop()
+
+    thread.join(timeout=1)
+    assert batches == [[1, 2, 3], [4]]
+    assert not thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_consumer_thread_yields_empty_batches_while_idle():
+    consumer = make_consumer([{"tp0": [1]}])
+    thread = ConsumerThread(
+        consumer,
+        asyncio.get_running_loop(),
+        poll_timeout_ms=10,
+        linger_ms=0,
+        idle_tick_s=0.05,
+    )
+    thread.start()
+
+    batches = []
+    async for batch in thread.batches():
+        batches.append(batch)
+        if len(batches) == 3:
+            thread.stop()
+
+    thread.join(timeout=1)
+    assert batches[0] == [1]
+    assert batches[1:3] == [[], []]
+
+
+@pytest.mark.asyncio
+async def test_consumer_thread_tracks_lag_per_partition():
+    partition = TopicPartition("shipment_updates", 2)
+    consumer = make_consumer([{partition: [MagicMock(offset=41)]}])
+    consumer.highwater.return_value = 100
+    thread = ConsumerThread(
+        consumer, asyncio.get_running_loop(), poll_timeout_ms=10, linger_ms=0
+    )
+    thread.start()
+
+    async for _ in thread.batches():
+        thread.stop()
+
+    thread.join(timeout=1)
+    assert thread.lag == {("shipment_updates", 2): 58}
+
+
+@pytest.mark.asyncio
+async def test_consumer_thread_applies_backpressure():
+    consumer = make_consumer([{"tp0": [n]} for n in range(10)])
+    thread = ConsumerThread(
+        consumer,
+        asyncio.get_running_loop(),
+        max_in_flight=2,
+        poll_timeout_ms=10,
+        linger_ms=0,
+    )
+    thread.start()
+
+    await asyncio.sleep(0.2)
+    # Two batches are queued and the thread is blocked on the third
+    assert thread.queue.qsize() == 2
+    assert consumer.poll.call_count == 3
+
+    thread.stop()
+    await asyncio.to_thread(thread.join, 1)
+    assert not thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_consumer_thread_forwards_errors():
+    consumer = MagicMock()
+    consumer.poll.side_effect = ConnectionError("broker down")
+    thread = ConsumerThread(consumer, asyncio.get_running_loop(), poll_timeout_ms=10)
+    thread.start()
+
+    with pytest.raises(ConnectionError):
+        async for _ in thread.batches():
+            pass
+    thread.join(timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_consumer_thread_fills_batches_up_to_max_records():
+    consumer = make_consumer([{"tp0": [1, 2]}, {"tp0": [3]}, {"tp0": [4, 5]}])
+    thread = ConsumerThread(
+        consumer,
+        asyncio.get_running_loop(),
+        poll_timeout_ms=10,
+        max_records=3,
+        linger_ms=1000,
+    )
+    thread.start()
+
+    batch = await anext(thread.batches())
+    thread.stop()
+    await asyncio.to_thread(thread.join, 1)
+
+    assert batch == [1, 2, 3]
+    assert consumer.poll.call_args_list[1].kwargs["max_records"] == 1
+
+
+@pytest.mark.asyncio
+async def test_consumer_thread_backlog_counts_lag_and_queued_batches():
+    thread = ConsumerThread(MagicMock(), asyncio.get_running_loop(), max_records=50)
+    thread.lag = {("shipment_updates", 0): 120, ("shipment_updates", 1): 30}
+    thread.queue.put_nowait([1, 2, 3])
+
+    assert thread.backlog() == 200
+
+
+def test_fold_batch_keeps_latest_event_per_shipment():
+    batch = [
+        MagicMock(value={"shipment_id": "A", "status": "In Transit"}),
+        MagicMock(value={"shipment_id": "B", "status": "In Transit"}),
+        MagicMock(value={"status": "Delivered"}),
+        MagicMock(value={"shipment_id": "A", "status": "Delivered"}),
+    ]
+
+    updates, invalid = fold_batch(batch, lambda event: "shipment_id" in event)
+
+    assert updates == {
+        "A": {"shipment_id": "A", "status": "Delivered"},
+        "B": {"shipment_id": "B", "status": "In Transit"},
+    }
+    assert invalid == [{"status": "Delivered"}]
+
+
+def test_fold_batch_drops_stale_and_duplicate_events():
+    def record(shipment_id, timestamp, offset):
+        value = {"shipment_id": shipment_id, "timestamp": timestamp}
+        return MagicMock(value=value, partition=0, offset=offset)
+
+    ordering = EventOrdering()
+    ordering.accept({"shipment_id": "A", "timestamp": "12:00"}, 0, 1)
+    batch = [
+        record("A", "11:00", 2),
+        record("A", "12:00", 1),
+        record("B", "12:00", 3),
+        record("B", "11:00", 4),
+    ]
+
+    updates, invalid = fold_batch(batch, lambda event: True, ordering)
+
+    assert updates == {"B": {"shipment_id": "B", "timestamp": "12:00"}}
+    assert invalid == []
+    assert ordering.dropped == {"stale": 2, "duplicate": 1}
+
+
+def test_fold_batch_keeps_tombstones_as_deletes():
+    batch = [
+        MagicMock(value={"shipment_id": "A", "status": "In Transit"}),
+        MagicMock(value=None, key=b"A"),
+        MagicMock(value=None, key=b"B"),
+        MagicMock(value={"shipment_id": "B", "status": "Delivered"}),
+        MagicMock(value=None, key=None),
+    ]
+
+    updates, invalid = fold_batch(batch, lambda event: True)
+
+    assert updates == {"A": None, "B": {"shipment_id": "B", "status": "Delivered"}}
+    assert [event.reason for event in invalid] == ["tombstone without a key"]
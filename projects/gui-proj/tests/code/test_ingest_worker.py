@@ -0,0 +1,152 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from decoding import InvalidShipment, ShipmentEvent
+from ingest_worker import run_worker
+from sharedview import SharedView
+
+
+async def as_batches(*batches):
+    """Yield each argument as one batch from a mocked `ConsumerThread`."""
+    for batch in batches:
+        yield batch
+
+
+def record(value, offset):
+    return MagicMock(value=value, topic="shipment_updates", partition=0, offset=offset)
+
+
+def event(shipment_id, timestamp, status="In Transit", latitude=40.7):
+    return ShipmentEvent(shipment_id, status, "NY", timestamp, latitude, -74.0)
+
+
+@pytest.mark.asyncio
+async def test_run_worker_writes_batches_to_the_view(tmp_path):
+    view = SharedView(str(tmp_path / "shipments.db"))
+    mock_consumer = MagicMock()
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    mock_thread.batches.return_value = as_batches(
+        [record(event("SHP-1", "12:00"), 0), record(InvalidShipment("bad", b""), 1)],
+        [record(event("SHP-1", "11:00", "Delivered"), 2)],  # Stale
+    )
+
+    with patch("ingest_worker.ConsumerThread", return_value=mock_thread):
+        await run_worker(mock_consumer, view)
+
+    mock_consumer.subscribe.assert_called_once_with(["shipment_updates"])
+    mock_thread.stop.assert_called_once()
+    reader = SharedView(view.path)
+    (shipment,) = reader.changes().values()
+    assert (shipment.status, shipment.timestamp) == ("In Transit", "12:00")
+    assert shipment.eta_hours > 0
+    assert reader.offsets() == {("shipment_updates", 0): 3}
+
+
+@pytest.mark.asyncio
+async def test_run_worker_deletes_tombstoned_shipments(tmp_path):
+    view = SharedView(str(tmp_path / "shipments.db"))
+    view.write({"SHP-2": None}, {})  # Deleted before the worker started
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    tombstone = record(None, 1)
+    tombstone.key = b"SHP-1"
+    mock_thread.batches.return_value = as_batches(
+        [record(event("SHP-1", "12:00"), 0)],
+        [tombstone],
+        [record(event("SHP-1", "11:00"), 2)],  # Recreated after the delete
+    )
+
+    with patch("ingest_worker.ConsumerThread", return_value=mock_thread):
+        await run_worker(MagicMock(), view)
+
+    changes = SharedView(view.path).changes()
+    assert changes["SHP-2"] is None
+    assert changes["SHP-1"].timestamp == "11:00"
+
+
+@pytest.mark.asyncio
+async def test_run_worker_releases_held_pings_on_idle_ticks(tmp_path):
+    view = SharedView(str(tmp_path / "shipments.db"))
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+
+    async def quiet_topic():
+        yield [record(event("SHP-1", "12:00"), 0)]
+        yield [record(event("SHP-1", "12:01", latitude=41.0), 1)]  # Held back
+        clock.return_value = 110.0
+        yield []  # The topic went quiet
+
+    mock_thread.batches.return_value = quiet_topic()
+
+    with (
+        patch("ingest_worker.ConsumerThread", return_value=mock_thread),
+        patch("lanes.time.monotonic", return_value=100.0) as clock,
+    ):
+        await run_worker(MagicMock(), view)
+
+    (shipment,) = SharedView(view.path).changes().values()
+    assert (shipment.timestamp, shipment.latitude) == ("12:01", 41.0)
+
+
+@pytest.mark.asyncio
+async def test_run_worker_keeps_offsets_before_held_pings(tmp_path):
+    view = SharedView(str(tmp_path / "shipments.db"))
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    mock_thread.batches.return_value = as_batches(
+        [record(event("SHP-1", "12:00"), 0)],
+        [
+            record(event("SHP-1", "12:01", latitude=41.0), 1),  # Held back
+            record(event("SHP-2", "12:01"), 2),
+        ],
+    )
+
+    with (
+        patch("ingest_worker.ConsumerThread", return_value=mock_thread),
+        patch("lanes.time.monotonic", return_value=100.0),
+    ):
+        await run_worker(MagicMock(), view)
+
+    reader = SharedView(view.path)
+    assert set(reader.changes()) == {"SHP-1", "SHP-2"}
+    assert reader.offsets() == {("shipment_updates", 0): 1}
+
+
+@pytest.mark.asyncio
+async def test_run_worker_resumes_from_the_view(tmp_path):
+    view = SharedView(str(tmp_path / "shipments.db"))
+    view.write({"SHP-1": event("SHP-1", "12:00")}, {("shipment_updates", 0): 3})
+    mock_consumer = MagicMock()
+    mock_consumer.partitions_for_topic.return_value = {0}
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    mock_thread.batches.return_value = as_batches([record(event("SHP-1", "11:00"), 3)])
+
+    with patch("ingest_worker.ConsumerThread", return_value=mock_thread):
+        await run_worker(mock_consumer, SharedView(view.path))
+
+    mock_consumer.subscribe.assert_not_called()
+    mock_consumer.seek.assert_called_once()
+    assert SharedView(view.path).changes()["SHP-1"].timestamp == "12:00"
+
+
+@pytest.mark.asyncio
+async def test_run_worker_rate_limits_location_pings(tmp_path):
+    view = SharedView(str(tmp_path / "shipments.db"))
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    moved = ShipmentEvent("SHP-1", "In Transit", "NY", "12:01", 41.0, -74.0)
+    mock_thread.batches.return_value = as_batches(
+        [record(event("SHP-1", "12:00"), 0)],
+        [record(moved, 1)],  # Too soon after the first position
+        [record(event("SHP-2", "12:02", "Delivered"), 2)],
+    )
+
+    with patch("ingest_worker.ConsumerThread", return_value=mock_thread):
+        await run_worker(MagicMock(), view)
+
+    shipments = SharedView(view.path).changes()
+    assert shipments["SHP-1"].timestamp == "12:00"
+    assert shipments["SHP-2"].status == "Delivered"
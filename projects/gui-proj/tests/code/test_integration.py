@@ -2,7 +2,35 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from main import consume_shipment_updates, shutdown, update_ui
+from lanes import PriorityLanes
+from main import (
+    consume_shipment_updates,
+    format_shipment_row,
+    make_notifications,
+    shutdown,
+    update_ui,
+)
+from render import RenderPool
+from rows import ShipmentRows
+from sessions import Session, SessionHub
+from store import ShipmentStore
+
+
+def make_hub(view=None):
+    """Return a hub with one session that has real notifications."""
+    session = Session(
+        view or MagicMock(), MagicMock(), make_notifications(), MagicMock()
+    )
+    session.refresh = MagicMock()
+    hub = SessionHub()
+    hub.add(session)
+    return hub
+
+
+async def as_batches(*batches):
+    """Yield each argument as one batch from a mocked `ConsumerThread`."""
+    for batch in batches:
+        yield batch
 
 
 @pytest.mark.asyncio
@@ -11,7 +39,9 @@ async def test_integration_consume_and_update_ui():
     Test the integration between consuming shipment updates and updating the UI.
     """
     mock_consumer = MagicMock()
-    mock_consumer.__iter__.return_value = iter(
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    mock_thread.batches.return_value = as_batches(
         [
             MagicMock(
                 value={
@@ -38,21 +68,25 @@ async def test_integration_consume_and_update_ui():
 
     mock_ui = MagicMock()
     mock_shipments = {}
+    hub = make_hub()
+    (session,) = hub.sessions
 
     with (
         patch("main.consumer", mock_consumer),
+        patch("main.ConsumerThread", return_value=mock_thread),
+        patch("main.lanes", PriorityLanes()),
         patch("main.ui", mock_ui),
         patch("main.shipments", mock_shipments),
         patch("main.update_ui", new_callable=AsyncMock),
+        patch("notify.ui", mock_ui),
+        patch("main.hub", hub),
     ):
         await consume_shipment_updates()
         assert len(mock_shipments) == 2
-        assert mock_ui.notify.call_count == 2
+        session.notifications.flush()
+        assert mock_ui.notify.call_count == 1
         mock_ui.notify.assert_any_call(
-            "Shipment 1 updated: In Transit at NY", type="info"
-        )
-        mock_ui.notify.assert_any_call(
-            "Shipment 2 updated: Delivered at CA", type="info"
+            "2 shipments updated in the last second", type="info"
         )
 
 
@@ -62,33 +96,38 @@ async def test_integration_ui_refresh():
     Test the integration of UI refresh logic with mocked data.
     """
     mock_ui = MagicMock()
-    mock_shipments = {
-        1: {
-            "shipment_id": 1,
-            "status": "In Transit",
-            "location": "NY",
-            "timestamp": "2023-01-01",
-            "latitude": "40.730610",
-            "longitude": "-73.935242",
-        },
-        2: {
-            "shipment_id": 2,
-            "status": "Delivered",
-            "location": "CA",
-            "timestamp": "2023-01-02",
-            "latitude": "34.052235",
-            "longitude": "-118.243683",
-        },
-    }
+    mock_shipments = ShipmentStore()
+    mock_shipments.update(
+        {
+            1: {
+                "shipment_id": 1,
+                "status": "In Transit",
+                "location": "NY",
+                "timestamp": "2023-01-01",
+                "latitude": "40.730610",
+                "longitude": "-73.935242",
+            },
+            2: {
+                "shipment_id": 2,
+                "status": "Delivered",
+                "location": "CA",
+                "timestamp": "2023-01-02",
+                "latitude": "34.052235",
+                "longitude": "-118.243683",
+            },
+        }
+    )
+
+    session = Session(
+        ShipmentRows(MagicMock(), format_shipment_row), MagicMock(), MagicMock()
+    )
 
     with (
-        patch("main.ui", mock_ui),
+        patch("rows.ui", mock_ui),
         patch("main.shipments", mock_shipments),
-        patch("main.selected_status", "All"),
     ):
-        await update_ui()
-        assert mock_ui.loading.called
-        assert mock_ui.label.call_count == len(mock_shipments) + 1  # Header + shipments
+        await update_ui(session)
+        assert mock_ui.label.call_count == len(mock_shipments)
 
 
 def test_integration_shutdown():
@@ -101,9 +140,13 @@ def test_integration_shutdown():
     with (
         patch("main.consumer", mock_consumer),
         patch("main.ui", mock_ui),
+        patch("main.checkpointer"),
+        patch("main.render_pool") as mock_pool,
+        patch("main.hub", make_hub()),
     ):
         shutdown()
         mock_consumer.close.assert_called_once()
+        mock_pool.shutdown.assert_called_once()
         mock_ui.notify.assert_called_once_with(
             "Application shutting down...", type="info"
         )
@@ -116,7 +159,9 @@ async def test_ui_full_lifecycle():
     """
     mock_ui = MagicMock()
     mock_consumer = MagicMock()
-    mock_consumer.__iter__.return_value = iter(
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    mock_thread.batches.return_value = as_batches(
         [
             MagicMock(
                 value={
@@ -140,33 +185,40 @@ async def test_ui_full_lifecycle():
             ),
         ]
     )
-    mock_shipments = {}
-    mock_selected_status = "All"
+    mock_shipments = ShipmentStore()
+    hub = make_hub(ShipmentRows(MagicMock(), format_shipment_row))
+    (session,) = hub.sessions
+    mock_checkpointer = MagicMock()
+    mock_checkpointer.load.return_value = []
 
     with (
         patch("main.ui", mock_ui),
+        patch("rows.ui", mock_ui),
         patch("main.consumer", mock_consumer),
+        patch("main.checkpointer", mock_checkpointer),
+        patch("main.render_pool", RenderPool(0)),
+        patch("main.ConsumerThread", return_value=mock_thread),
+        patch("main.lanes", PriorityLanes()),
         patch("main.shipments", mock_shipments),
-        patch("main.selected_status", mock_selected_status),
         patch("main.update_ui", new_callable=AsyncMock),
+        patch("notify.ui", mock_ui),
+        patch("main.hub", hub),
     ):
         # Test UI initialization
-        await update_ui()
-        assert mock_ui.loading.called
-        assert mock_ui.label.call_count == len(mock_shipments) + 1  # Header + shipments
+        await update_ui(session)
+        assert mock_ui.label.call_count == len(mock_shipments)
 
         # Test UI updates
         await consume_shipment_updates()
         assert len(mock_shipments) == 2
-        assert mock_ui.notify.call_count == 2
-        mock_ui.notify.assert_any_call(
-            "Shipment 1 updated: In Transit at NY", type="info"
-        )
+        session.notifications.flush()
+        assert mock_ui.notify.call_count == 1
         mock_ui.notify.assert_any_call(
-            "Shipment 2 updated: Delivered at CA", type="info"
+            "2 shipments updated in the last second", type="info"
         )
 
         # Test UI shutdown
         shutdown()
+        mock_checkpointer.save.assert_called_once_with(mock_shipments)
         mock_consumer.close.assert_called_once()
         mock_ui.notify.assert_called_with("Application shutting down...", type="info")
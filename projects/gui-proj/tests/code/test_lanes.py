@@ -0,0 +1,164 @@
+from unittest.mock import patch
+
+import pytest
+
+from decoding import ShipmentEvent
+from lanes import PriorityLanes, is_ping
+from ordering import EventOrdering
+from store import ShipmentStore
+
+
+def event(shipment_id, timestamp, latitude=40.0, status="In Transit", mode="road"):
+    return ShipmentEvent(
+        shipment_id, status, "NY", timestamp, latitude, -74.0, mode=mode
+    )
+
+
+@pytest.fixture
+def clock():
+    with patch("lanes.time.monotonic", return_value=100.0) as monotonic:
+        yield monotonic
+
+
+@pytest.fixture
+def store():
+    store = ShipmentStore()
+    store.update({"A": event("A", "1"), "B": event("B", "1")})
+    return store
+
+
+def admit(lanes, store, *events, backlog=0):
+    admitted = lanes.admit({e.shipment_id: e for e in events}, store, backlog)
+    store.update(admitted)
+    return list(admitted)
+
+
+def test_is_ping_only_for_moves():
+    assert is_ping(event("A", "1"), event("A", "2", latitude=41.0))
+    assert not is_ping(event("A", "1"), event("A", "2", status="Delivered"))
+    assert not is_ping(event("A", "1"), event("A", "2", mode="air"))
+
+
+def test_new_shipments_and_status_changes_take_the_fast_lane(clock, store):
+    lanes = PriorityLanes(min_interval_s=10)
+    admit(lanes, store, event("A", "2", latitude=41.0))
+
+    assert admit(
+        lanes,
+        store,
+        event("A", "3", latitude=41.1, status="Delivered"),
+        event("C", "3"),
+    ) == ["A", "C"]
+
+
+def test_pings_are_rate_limited_and_the_latest_is_released_later(clock, store):
+    lanes = PriorityLanes(min_interval_s=10)
+    assert admit(lanes, store, event("A", "2", latitude=41.0)) == ["A"]
+
+    clock.return_value = 105.0
+    assert admit(lanes, store, event("A", "3", latitude=41.5)) == []
+    assert admit(lanes, store, event("A", "4", latitude=42.0)) == []
+    assert lanes.dropped["superseded"] == 1
+
+    clock.return_value = 110.0
+    assert admit(lanes, store, event("B", "5", latitude=39.0)) == ["B", "A"]
+    assert store["A"].timestamp == "4"
+    assert lanes.held == {}
+
+
+def test_held_ping_is_dropped_when_a_status_change_overtakes_it(clock, store):
+    lanes = PriorityLanes(min_interval_s=10)
+    admit(lanes, store, event("A", "2", latitude=41.0))
+    admit(lanes, store, event("A", "3", latitude=41.5))
+
+    admit(lanes, store, event("A", "4", latitude=41.6, status="Delivered"))
+    clock.return_value = 200.0
+
+    assert admit(lanes, store, event("B", "5", latitude=39.0)) == ["B"]
+    assert store["A"].status == "Delivered"
+    assert lanes.dropped["superseded"] == 1
+
+
+def test_pings_that_barely_move_are_dropped(clock, store):
+    lanes = PriorityLanes(min_interval_s=0, min_distance_km=1.0)
+
+    assert admit(lanes, store, event("A", "2", latitude=40.001)) == []
+    assert admit(lanes, store, event("A", "3", latitude=40.1)) == ["A"]
+    assert lanes.dropped["still"] == 1
+
+
+def test_pings_are_shed_as_the_backlog_grows(clock, store):
+    lanes = PriorityLanes(min_interval_s=5, shed_backlog=1000, max_interval_s=30)
+    admit(lanes, store, event("A", "2", latitude=41.0))
+
+    clock.return_value = 110.0
+    assert admit(lanes, store, event("A", "3", latitude=42.0), backlog=4000) == []
+    assert lanes.interval_s == 20
+
+    lanes.admit({}, store, backlog=10**6)
+    assert lanes.interval_s == 30
+    lanes.admit({}, store, backlog=0)
+    assert lanes.interval_s == 5
+
+
+def test_forget_drops_held_pings(clock, store):
+    lanes = PriorityLanes(min_interval_s=10)
+    admit(lanes, store, event("A", "2", latitude=41.0))
+    admit(lanes, store, event("A", "3", latitude=42.0))
+
+    lanes.forget("A")
+    del store["A"]
+    clock.return_value = 200.0
+
+    assert admit(lanes, store) == []
+
+
+def test_deletes_take_the_fast_lane_and_drop_held_pings(clock, store):
+    lanes = PriorityLanes(min_interval_s=10)
+    admit(lanes, store, event("A", "2", latitude=41.0))
+    admit(lanes, store, event("A", "3", latitude=42.0))
+
+    assert lanes.admit({"A": None}, store) == {"A": None}
+    assert lanes.held == {}
+    assert lanes.dropped["superseded"] == 1
+
+
+def test_committable_offsets_stop_at_the_earliest_held_ping(clock, store):
+    lanes = PriorityLanes(min_interval_s=10)
+    ordering = EventOrdering()
+    admit(lanes, store, event("A", "2", latitude=41.0), event("B", "2", latitude=41.0))
+    for shipment_id, timestamp, partition, offset in [
+        ("A", "3", 0, 7),
+        ("A", "4", 0, 9),
+        ("B", "3", 1, 3),
+    ]:
+        ping = event(shipment_id, timestamp, latitude=42.0 + offset)
+        assert ordering.accept(ping, partition, offset)
+        assert admit(lanes, store, ping) == []
+    offsets = {
+        ("shipment_updates", 0): 12,
+        ("shipment_updates", 1): 5,
+        ("shipment_updates", 2): 8,
+    }
+
+    # Only the latest ping of A is held, so its partition stops there
+    assert lanes.committable(offsets, ordering) == {
+        ("shipment_updates", 0): 9,
+        ("shipment_updates", 1): 3,
+        ("shipment_updates", 2): 8,
+    }
+
+
+def test_apply_times_past_the_longest_interval_are_swept(clock, store):
+    lanes = PriorityLanes(min_interval_s=10, max_interval_s=60)
+    admit(lanes, store, event("A", "2", latitude=41.0))
+    admit(lanes, store, event("B", "2", latitude=41.0))
+    clock.return_value = 150.0
+    admit(lanes, store, event("A", "3", latitude=42.0))
+    admit(lanes, store, event("A", "4", latitude=43.0))  # Held
+
+    clock.return_value = 200.0
+    admit(lanes, store)
+
+    assert list(lanes.applied) == ["A"]
+    assert store["A"].timestamp == "4"
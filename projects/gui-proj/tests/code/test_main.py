@@ -1,20 +1,54 @@
+import asyncio
+import json
 import signal
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import numpy as np
 import pytest
 
+from clusters import SpatialGrid
+from decoding import JsonDecoder, ShipmentEvent
+from history import ShipmentHistory
+from ingest import fold_batch
+from lanes import PriorityLanes
 from main import (
+    apply_updates,
     calculate_eta,
     consume_shipment_updates,
-    debounce_update,
     filter_shipments,
+    follow_shared_view,
     is_valid_shipment,
+    replay,
+    schedule_update,
+    serve_metrics,
     set_status_filter,
+    shipments,
+    show_trails,
     shutdown,
     update_shipment_list,
     update_shipment_map,
     update_ui,
 )
+from ordering import EventOrdering
+from refresh import RefreshScheduler
+from sessions import Session, SessionHub
+from sharedview import SharedView
+from store import ShipmentStore
+
+
+async def as_batches(*batches):
+    """Yield each argument as one batch from a mocked `ConsumerThread`."""
+    for batch in batches:
+        yield batch
+
+
+def make_session(status="All", term=""):
+    """Create a session with mocked elements and the given filters."""
+    session = Session(MagicMock(), MagicMock(), MagicMock(), MagicMock())
+    session.status = status
+    session.term = term
+    session.refresh = MagicMock()
+    return session
 
 
 @pytest.mark.parametrize(
@@ -59,27 +93,44 @@ def test_is_valid_shipment(event, expected_validity):
 
 @pytest.mark.asyncio
 async def test_set_status_filter():
-    with (
-        patch("main.update_shipment_list", new_callable=AsyncMock) as mock_update_list,
-        patch("main.update_shipment_map", new_callable=AsyncMock) as mock_update_map,
-    ):
-        set_status_filter("Delivered")
-        assert mock_update_list.called
-        assert mock_update_map.called
+    session = make_session()
+    set_status_filter(session, "Delivered")
+    assert session.status == "Delivered"
+    session.view.invalidate.assert_called_once()
+    session.map.invalidate.assert_called_once()
+    session.refresh.request.assert_called_once_with(True)
 
 
 @pytest.mark.asyncio
 async def test_filter_shipments():
-    with patch("main.ui") as mock_ui:
-        filter_shipments("123")
-        assert mock_ui.loading.called
-        assert mock_ui.label.call_count == 2  # Header + one matching shipment
+    store = ShipmentStore()
+    store.update(
+        {
+            shipment_id: ShipmentEvent(shipment_id, "In Transit", "NY", "2023-01-01")
+            for shipment_id in ("SHP-123", "SHP-124", "SHP-200")
+        }
+    )
+    session = make_session()
+    session.view.stream = AsyncMock()
+    session.search.delay_s = 0
+
+    with patch("main.shipments", store):
+        superseded = filter_shipments(session, "SHP-1")
+        await filter_shipments(session, "SHP-12")
+
+    assert superseded.cancelled()
+    assert session.term == "SHP-12"
+    session.view.stream.assert_awaited_once_with(
+        store, "All", "SHP-12", {"SHP-123": None, "SHP-124": None}
+    )
 
 
 @pytest.mark.asyncio
 async def test_consume_shipment_updates():
     mock_consumer = MagicMock()
-    mock_consumer.__iter__.return_value = iter(
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    mock_thread.batches.return_value = as_batches(
         [
             MagicMock(
                 value={
@@ -91,20 +142,194 @@ async def test_consume_shipment_updates():
             ),
         ]
     )
+    session = make_session()
+    hub = SessionHub()
+    hub.add(session)
     with (
         patch("main.consumer", mock_consumer),
-        patch("main.ui.notify") as mock_notify,
-        patch("main.debounce_update", new_callable=AsyncMock),
+        patch("main.ConsumerThread", return_value=mock_thread),
+        patch("main.lanes", PriorityLanes()),
+        patch("main.hub", hub),
+        patch("main.schedule_update") as mock_schedule,
+    ):
+        await consume_shipment_updates()
+        session.notifications.add_many.assert_called()
+        mock_schedule.assert_called_once_with(session)
+
+
+@pytest.mark.asyncio
+async def test_consume_shipment_updates_restores_snapshot():
+    restored = [ShipmentEvent("SHP-9", "Delivered", "LA", "2023-01-02")]
+    mock_consumer = MagicMock()
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    mock_thread.batches.return_value = as_batches()
+    mock_checkpointer = MagicMock()
+    mock_checkpointer.load.return_value = restored
+    store = ShipmentStore()
+    session = make_session()
+    hub = SessionHub()
+    hub.add(session)
+    with (
+        patch("main.consumer", mock_consumer),
+        patch("main.ConsumerThread", return_value=mock_thread),
+        patch("main.lanes", PriorityLanes()),
+        patch("main.checkpointer", mock_checkpointer),
+        patch("main.shipments", store),
+        patch("main.ordering", EventOrdering()),
+        patch("main.hub", hub),
+        patch("main.schedule_update") as mock_schedule,
+    ):
+        await consume_shipment_updates()
+
+        mock_checkpointer.position.assert_called_once_with(
+            mock_consumer, "shipment_updates"
+        )
+        assert store["SHP-9"] is restored[0]
+        session.view.mark_changed.assert_called_once_with({"SHP-9": restored[0]})
+        session.notifications.add_many.assert_not_called()
+        mock_schedule.assert_called_once_with(session)
+
+
+@pytest.mark.asyncio
+async def test_consume_shipment_updates_deletes_tombstoned_shipments():
+    event = ShipmentEvent("SHP-1", "In Transit", "NY", "2023-01-01", 40.7, -74.0)
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    mock_thread.batches.return_value = as_batches(
+        [MagicMock(value=event, partition=0, offset=0)],
+        [MagicMock(value=None, key=b"SHP-1", partition=0, offset=1)],
+    )
+    store = ShipmentStore()
+    ordering = EventOrdering()
+    lanes = PriorityLanes()
+    recorded = ShipmentHistory()
+    session = make_session()
+    hub = SessionHub()
+    hub.add(session)
+    with (
+        patch("main.consumer", MagicMock()),
+        patch("main.ConsumerThread", return_value=mock_thread),
+        patch("main.lanes", lanes),
+        patch("main.checkpointer", MagicMock(**{"load.return_value": []})),
+        patch("main.shipments", store),
+        patch("main.ordering", ordering),
+        patch("main.history", recorded),
+        patch("main.hub", hub),
+        patch("main.schedule_update"),
     ):
         await consume_shipment_updates()
-        mock_notify.assert_called()
+
+    assert len(store) == 0
+    session.map.mark_changed.assert_called_with({"SHP-1": None})
+    assert "SHP-1" not in ordering.versions
+    assert "SHP-1" not in lanes.applied
+    assert len(recorded) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("latitude", ["nan", "inf", "-91"])
+async def test_events_without_finite_coordinates_are_rejected(latitude):
+    payload = {
+        "shipment_id": "SHP-1",
+        "status": "In Transit",
+        "location": "NY",
+        "timestamp": "2023-01-01",
+        "latitude": latitude,
+        "longitude": -74.0,
+    }
+    batch = [MagicMock(value=JsonDecoder()(json.dumps(payload).encode()))]
+    updates, invalid = fold_batch(batch, is_valid_shipment, EventOrdering())
+    store = ShipmentStore()
+    session = make_session()
+    hub = SessionHub(SpatialGrid())
+    hub.add(session)
+    with (
+        patch("main.shipments", store),
+        patch("main.history", ShipmentHistory()),
+        patch("main.hub", hub),
+        patch("main.schedule_update"),
+    ):
+        await apply_updates(updates, invalid)
+
+    assert (updates, len(invalid), len(store)) == ({}, 1, 0)
+    session.notifications.add_many.assert_any_call("invalid", invalid)
 
 
 @pytest.mark.asyncio
-async def test_debounce_update():
+async def test_consume_shipment_updates_creates_the_consumer_on_start():
+    mock_consumer = MagicMock()
+    mock_thread = MagicMock()
+    mock_thread.batches.return_value = as_batches()
+    with (
+        patch("main.consumer", None),
+        patch("main.make_consumer", return_value=mock_consumer) as mock_make,
+        patch("main.ConsumerThread", return_value=mock_thread) as mock_thread_cls,
+        patch("main.checkpointer", MagicMock(**{"load.return_value": []})),
+    ):
+        await consume_shipment_updates()
+
+    mock_make.assert_called_once()
+    assert mock_thread_cls.call_args.args[0] is mock_consumer
+
+
+@pytest.mark.asyncio
+async def test_follow_shared_view_stops_loading_on_an_empty_view(tmp_path):
+    path = str(tmp_path / "shipments.db")
+    store = ShipmentStore()
+    hub = SessionHub()
+    hub.loading = True
+    with patch("main.shipments", store), patch("main.hub", hub):
+        task = asyncio.create_task(follow_shared_view(path))
+        async with asyncio.timeout(5):
+            while hub.loading:
+                await asyncio.sleep(0.01)
+            SharedView(path).write(
+                {"SHP-1": ShipmentEvent("SHP-1", "In Transit", "NY", "2023-01-01")},
+                {},
+            )
+            while store.get("SHP-1") is None:
+                await asyncio.sleep(0.01)
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_consume_shipment_updates_skips_unaffected_sessions():
+    mock_thread = MagicMock()
+    mock_thread.backlog.return_value = 0
+    mock_thread.batches.return_value = as_batches(
+        [MagicMock(value=ShipmentEvent("SHP-1", "In Transit", "NY", "2023-01-01"))]
+    )
+    watching = make_session("In Transit")
+    elsewhere = make_session("Delivered")
+    hub = SessionHub()
+    hub.add(watching)
+    hub.add(elsewhere)
+    with (
+        patch("main.consumer", MagicMock()),
+        patch("main.ConsumerThread", return_value=mock_thread),
+        patch("main.lanes", PriorityLanes()),
+        patch("main.checkpointer", MagicMock(**{"load.return_value": []})),
+        patch("main.shipments", ShipmentStore()),
+        patch("main.ordering", EventOrdering()),
+        patch("main.hub", hub),
+        patch("main.schedule_update") as mock_schedule,
+    ):
+        await consume_shipment_updates()
+
+        mock_schedule.assert_called_once_with(watching)
+        elsewhere.view.mark_changed.assert_called_once_with({})
+
+
+@pytest.mark.asyncio
+async def test_schedule_update():
+    session = make_session()
     with patch("main.update_ui", new_callable=AsyncMock) as mock_update_ui:
-        await debounce_update()
-        mock_update_ui.assert_called_once()
+        session.refresh = RefreshScheduler(lambda: mock_update_ui(session))
+        first = schedule_update(session)
+        assert schedule_update(session, immediate=True) is first
+        await first
+        mock_update_ui.assert_awaited_once_with(session)
 
 
 @pytest.mark.asyncio
@@ -113,36 +338,125 @@ async def test_update_ui():
         patch("main.update_shipment_list", new_callable=AsyncMock) as mock_update_list,
         patch("main.update_shipment_map", new_callable=AsyncMock) as mock_update_map,
     ):
-        await update_ui()
-        assert mock_update_list.called
-        assert mock_update_map.called
+        session = make_session()
+        await update_ui(session)
+        mock_update_list.assert_awaited_once_with(session)
+        mock_update_map.assert_awaited_once_with(session)
 
 
 @pytest.mark.asyncio
 async def test_update_shipment_list():
-    with patch("main.ui") as mock_ui:
-        await update_shipment_list()
-        assert mock_ui.loading.called
-        assert mock_ui.label.called
+    session = make_session("Delivered", "SHP")
+    await update_shipment_list(session)
+    session.view.snapshot.assert_called_once_with(shipments, "Delivered", "SHP")
+    job = session.view.snapshot.return_value
+    session.view.prepare.assert_called_once_with(job)
+    session.view.apply.assert_called_once_with(session.view.prepare.return_value)
 
 
 @pytest.mark.asyncio
 async def test_update_shipment_map():
-    with patch("main.shipment_map") as mock_map:
-        await update_shipment_map()
-        assert mock_map.figure is not None
+    session = make_session("Delivered")
+    await update_shipment_map(session)
+    session.map.snapshot.assert_called_once_with(shipments, "Delivered")
+    session.map.apply.assert_called_once_with(session.map.prepare.return_value)
+    session.map.show_trails.assert_not_called()
+
+
+@pytest.fixture
+def recorded():
+    recorded = ShipmentHistory()
+    recorded.record(
+        {
+            "A": {
+                "status": "In Transit",
+                "latitude": 40,
+                "longitude": -74,
+                "timestamp": "2024-01-01T10:00:00+00:00",
+            },
+            "B": {
+                "status": "Delivered",
+                "latitude": 34,
+                "longitude": -118,
+                "timestamp": "2024-01-01T11:00:00+00:00",
+            },
+        }
+    )
+    with patch("main.history", recorded):
+        yield recorded
+
+
+@pytest.mark.asyncio
+async def test_update_shipment_map_draws_trails(recorded):
+    session = make_session("Delivered")
+    session.trails = True
+    await update_shipment_map(session)
+    lat, _ = session.map.show_trails.call_args.args
+    assert lat[~np.isnan(lat)].tolist() == [34]
+
+
+def test_show_trails(recorded):
+    session = make_session()
+    show_trails(session, True)
+    assert session.trails
+    lat, _ = session.map.show_trails.call_args.args
+    assert sorted(lat[~np.isnan(lat)].tolist()) == [34, 40]
+
+    show_trails(session, False)
+    assert not session.trails
+    session.map.show_trails.assert_called_with([], [])
+
+
+def test_replay(recorded):
+    session = make_session()
+    replay(session, 500)
+    assert session.replay_at == recorded.span()[0] + 1800
+    lat, _, shipment_ids = session.map.show_replay.call_args.args
+    assert (shipment_ids, lat.tolist()) == (["A"], [40])
+
+    set_status_filter(session, "Delivered")
+    assert session.map.show_replay.call_args.args[2] == []
+
+    replay(session, 1000)
+    assert session.replay_at is None
+    session.map.show_replay.assert_called_with()
 
 
 def test_shutdown():
+    hub = SessionHub()
+    hub.add(make_session())
+    mock_consumer = MagicMock()
     with (
-        patch("main.consumer.close") as mock_close,
+        patch("main.consumer", mock_consumer),
         patch("main.ui.notify") as mock_notify,
+        patch("main.checkpointer"),
+        patch("main.render_pool") as mock_pool,
+        patch("main.hub", hub),
     ):
         shutdown()
-        mock_close.assert_called_once()
+        mock_consumer.close.assert_called_once()
+        mock_pool.shutdown.assert_called_once()
         mock_notify.assert_called_once_with("Application shutting down...", type="info")
 
 
+def test_serve_metrics_exposes_the_pipeline():
+    response = serve_metrics()
+
+    assert response.media_type.startswith("text/plain")
+    body = response.body.decode()
+    for name in (
+        "shipment_decode_seconds",
+        "shipment_validate_seconds",
+        "shipment_eta_seconds",
+        "shipment_upsert_seconds",
+        "refresh_wait_seconds",
+        "update_shipment_list_seconds",
+        "update_shipment_map_seconds",
+        "shipment_consumer_lag",
+    ):
+        assert f"# TYPE {name} " in body
+
+
 def test_signal_handlers():
     with patch("main.shutdown") as mock_shutdown:
         # Test SIGINT handler
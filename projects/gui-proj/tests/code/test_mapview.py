@@ -0,0 +1,212 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from clusters import SpatialGrid
+from mapview import ShipmentMap
+from store import ShipmentStore
+
+
+def shipment(shipment_id, lat, lon, status="In Transit"):
+    return {
+        "shipment_id": shipment_id,
+        "status": status,
+        "latitude": str(lat),
+        "longitude": str(lon),
+    }
+
+
+@pytest.fixture
+def store():
+    store = ShipmentStore()
+    store.update({"A": shipment("A", 40, -74), "B": shipment("B", 34, -118)})
+    return store
+
+
+@pytest.fixture
+def shipment_map():
+    with patch("mapview.ui"):
+        yield ShipmentMap(capacity=1, level_of_detail=False)
+
+
+@pytest.fixture
+def lod_map():
+    with patch("mapview.ui"):
+        yield ShipmentMap(level_of_detail=True, points_scale=8)
+
+
+def plot_calls(shipment_map):
+    return [call.args[0] for call in shipment_map.plot.run_plot_method.call_args_list]
+
+
+def test_new_shipments_are_appended(store, shipment_map):
+    assert shipment_map.render(store, "All") == 2
+    assert plot_calls(shipment_map) == ["extendTraces"]
+    assert sorted(shipment_map.figure["data"][0]["lat"]) == [34, 40]
+
+    store["C"] = shipment("C", 51, 0)
+    shipment_map.mark_changed(["C"])
+    assert shipment_map.render(store, "All") == 1
+
+    name, update, traces = shipment_map.plot.run_plot_method.call_args.args
+    assert name == "extendTraces"
+    assert update == {"lat": [[51.0]], "lon": [[0.0]], "text": [["C"]]}
+    assert traces == [0]
+
+
+def test_moved_and_removed_shipments_are_restyled(store, shipment_map):
+    shipment_map.render(store, "All")
+    slot_a = shipment_map.slots["A"]
+
+    store["A"] = shipment("A", 41, -73)
+    store["B"] = shipment("B", 34, -118, status="Delivered")
+    shipment_map.mark_changed(["A", "B"])
+    assert shipment_map.render(store, "In Transit") == 2
+
+    name, update, _ = shipment_map.plot.run_plot_method.call_args.args
+    assert name == "restyle"
+    assert update["lat"][0][slot_a] == 41
+    assert None in update["lat"][0]  # The removed point
+    assert update["text"][0][shipment_map.slots["A"]] == "A"
+    assert set(shipment_map.slots) == {"A"}
+
+
+def test_moved_shipments_keep_their_labels(store, shipment_map):
+    shipment_map.render(store, "All")
+
+    store["A"] = shipment("A", 41, -73)
+    shipment_map.mark_changed(["A"])
+    assert shipment_map.render(store, "All") == 1
+
+    name, update, _ = shipment_map.plot.run_plot_method.call_args.args
+    assert name == "restyle"
+    assert set(update) == {"lat", "lon"}
+
+
+def test_new_shipments_get_labels_when_others_move(store, shipment_map):
+    shipment_map.render(store, "All")
+
+    store.update({"A": shipment("A", 41, -73), "C": shipment("C", 42, -70)})
+    shipment_map.mark_changed(["A", "C"])
+    assert shipment_map.render(store, "All") == 2
+
+    name, update, _ = shipment_map.plot.run_plot_method.call_args.args
+    assert name == "restyle"
+    assert update["text"] == [["A", "B", "C"]]
+    assert update["lat"] == [[41.0, 34.0, 42.0]]
+
+
+def test_unchanged_shipments_send_nothing(store, shipment_map):
+    shipment_map.render(store, "All")
+    shipment_map.mark_changed(["A"])
+
+    assert shipment_map.render(store, "All") == 0
+    assert plot_calls(shipment_map) == ["extendTraces"]
+
+
+def test_layout_change_sends_the_figure(store, shipment_map):
+    shipment_map.render(store, "All")
+    shipment_map.set_layout(title={"text": "Fleet"})
+    shipment_map.render(store, "All")
+
+    shipment_map.plot.update.assert_called_once()
+    assert np.array_equal(
+        shipment_map.figure["data"][0]["lon"],
+        shipment_map.lon[: len(shipment_map.text)],
+    )
+
+
+def test_zoomed_out_map_shows_clusters(store, lod_map):
+    lod_map.mark_changed(store)
+    assert lod_map.render(store, "All") == 0
+
+    name, update, traces = lod_map.plot.run_plot_method.call_args.args
+    assert (name, traces) == ("restyle", [1])
+    assert sorted(update["text"][0]) == ["1", "1"]
+    assert lod_map.slots == {}
+
+
+def test_zoomed_in_map_plots_shipments_in_view(store, lod_map):
+    lod_map.mark_changed(store)
+    lod_map.render(store, "All")
+    lod_map._on_relayout(
+        MagicMock(
+            args={
+                "geo.projection.scale": 16,
+                "geo.center.lat": 40,
+                "geo.center.lon": -74,
+            }
+        )
+    )
+
+    assert set(lod_map.slots) == {"A"}
+    # The cluster trace is emptied
+    clusters = [
+        call.args[1]
+        for call in lod_map.plot.run_plot_method.call_args_list
+        if call.args[2] == [1]
+    ]
+    assert clusters[-1]["lat"] == [[]]
+
+    store["A"] = shipment("A", 10, 10)  # Moves out of view
+    lod_map.mark_changed(["A"])
+    lod_map.render(store, "All")
+    assert lod_map.slots == {}
+
+
+def test_shared_spatial_index_is_left_to_its_owner(store):
+    spatial = SpatialGrid()
+    spatial.update(store, store)
+    with patch("mapview.ui"):
+        shared_map = ShipmentMap(level_of_detail=True, spatial=spatial)
+
+    store["C"] = shipment("C", 10, 10)
+    shared_map.mark_changed(store)
+    with patch.object(spatial, "update") as mock_update:
+        shared_map.render(store, "All")
+
+    assert shared_map.spatial is spatial
+    mock_update.assert_not_called()
+    _, update, _ = shared_map.plot.run_plot_method.call_args.args
+    assert sorted(update["text"][0]) == ["1", "1"]
+
+
+def test_points_prepared_before_a_zoom_are_dropped(store, lod_map):
+    lod_map.scale, lod_map.center = 16, (40, -74)
+    lod_map.mark_changed(store)
+    payload = lod_map.prepare(lod_map.snapshot(store, "All"))
+
+    lod_map._on_relayout(MagicMock(args={"geo.projection.scale": 1}))
+    assert lod_map.apply(payload) == 0
+    assert lod_map.slots == {}
+    assert lod_map.changed == {"A"}
+
+
+def test_trails_are_drawn_as_lines(shipment_map):
+    shipment_map.show_trails(np.array([40, 41, np.nan]), np.array([-74, -73, np.nan]))
+
+    name, update, traces = shipment_map.plot.run_plot_method.call_args.args
+    assert (name, traces) == ("restyle", [2])
+    assert update == {"lat": [[40.0, 41.0, None]], "lon": [[-74.0, -73.0, None]]}
+    assert shipment_map.figure["data"][2]["mode"] == "lines"
+
+
+def test_replay_hides_the_live_points(store, shipment_map):
+    shipment_map.render(store, "All")
+    shipment_map.show_replay(np.array([40.0]), np.array([-74.0]), ["A"])
+
+    (_, points, traces), (_, visible, shown) = [
+        call.args for call in shipment_map.plot.run_plot_method.call_args_list[-2:]
+    ]
+    assert (points, traces) == (
+        {"lat": [[40.0]], "lon": [[-74.0]], "text": [["A"]]},
+        [3],
+    )
+    assert (visible, shown) == ({"visible": [False, False, True]}, [0, 1, 3])
+
+    shipment_map.show_replay()
+    _, visible, _ = shipment_map.plot.run_plot_method.call_args.args
+    assert visible == {"visible": [True, True, False]}
+    assert shipment_map.figure["data"][3]["lat"] == []
+    assert shipment_map.figure["data"][0]["visible"]
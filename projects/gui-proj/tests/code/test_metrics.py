@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from metrics import Histogram, LogSampler, Metrics, timed
+
+
+@pytest.mark.parametrize("sub_buckets", [8, 64])
+def test_histogram_quantiles_stay_within_the_bucket_resolution(sub_buckets):
+    histogram = Histogram(
+        "h", "", lowest_s=1e-6, highest_s=10.0, sub_buckets=sub_buckets
+    )
+    values = [n * 1e-5 for n in range(1, 10001)]  # 10 us to 100 ms
+    for value in values:
+        histogram.record(value)
+
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        assert histogram.quantile(q) == pytest.approx(exact, rel=2 / sub_buckets)
+    assert histogram.count == len(values)
+    assert histogram.sum == pytest.approx(sum(values))
+
+
+def test_histogram_bucket_bounds_round_trip():
+    histogram = Histogram("h", "", sub_buckets=16)
+    for units in (0, 1, 15, 16, 17, 31, 32, 33, 1000, 123456):
+        low, high = histogram._bounds(histogram._index(units))
+        assert low <= units < high
+
+
+def test_histogram_clamps_values_out_of_range():
+    histogram = Histogram("h", "", lowest_s=1e-3, highest_s=1.0)
+    histogram.record(-1)
+    histogram.record(100)
+
+    assert histogram.quantile(0.5) == pytest.approx(0.0005)
+    assert histogram.quantile(1.0) <= 100
+    assert Histogram("empty", "").quantile(0.99) == 0.0
+
+
+def test_timers_record_into_the_histogram():
+    histogram = Histogram("h", "")
+    with histogram.time():
+        time.sleep(0.01)
+    assert timed(histogram, lambda x: x * 2)(21) == 42
+
+    assert histogram.count == 2
+    assert 0.01 <= histogram.max < 0.1
+
+
+def test_exposition_follows_the_prometheus_text_format():
+    metrics = Metrics()
+    metrics.histogram("stage_seconds", "A stage.").record(0.002)
+    metrics.counter("events_total", "Events.").inc(3)
+    metrics.counter("dropped_total", "Dropped.", lambda: {(("reason", "stale"),): 2})
+    metrics.gauge("lag", "Lag.", lambda: {(("topic", "t"), ("partition", 0)): 7})
+
+    text = metrics.exposition()
+
+    assert "# TYPE stage_seconds summary\n" in text
+    assert 'stage_seconds{quantile="0.99"} 0.002' in text
+    assert "stage_seconds_count 1\n" in text
+    assert (
+        "# HELP events_total Events.\n# TYPE events_total counter\nevents_total 3\n"
+        in text
+    )
+    assert 'dropped_total{reason="stale"} 2\n' in text
+    assert 'lag{topic="t",partition="0"} 7\n' in text
+    assert text.endswith("\n")
+
+
+def test_metrics_are_registered_once():
+    metrics = Metrics()
+    metrics.counter("events_total", "Events.")
+    with pytest.raises(ValueError):
+        metrics.counter("events_total", "Events.")
+
+
+@pytest.mark.parametrize(
+    "every, expected",
+    [(1, list(range(10))), (3, [2, 5, 8]), (0, [])],
+)
+def test_log_sampler_picks_every_nth_event_across_batches(every, expected):
+    sampler = LogSampler(every)
+    picked = []
+    for batch in ([0, 1], [2, 3, 4, 5], [], [6, 7, 8, 9]):
+        picked.extend(sampler.pick(batch))
+
+    assert picked == expected
+    assert sampler.seen == 10
@@ -0,0 +1,83 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from notify import NotificationAggregator, TokenBucket
+
+
+@pytest.fixture
+def aggregator():
+    with patch("notify.ui") as mock_ui:
+        aggregator = NotificationAggregator(
+            {
+                "updated": ("{count} shipments updated", "info", str),
+                "invalid": ("{count} invalid", "warning", lambda e: f"bad: {e}"),
+            },
+            rate=1,
+            burst=1,
+        )
+        aggregator.ui = mock_ui
+        yield aggregator
+
+
+def test_flush_coalesces_events_into_one_toast(aggregator):
+    for n in range(312):
+        aggregator.add("updated", n)
+    for n in range(4):
+        aggregator.add("invalid", n)
+
+    message = aggregator.flush()
+
+    assert message == "312 shipments updated, 4 invalid in the last second"
+    aggregator.ui.notify.assert_called_once_with(message, type="warning")
+    assert aggregator.totals == {"updated": 312, "invalid": 4}
+
+
+def test_flush_without_events_shows_nothing(aggregator):
+    assert aggregator.flush() is None
+    aggregator.ui.notify.assert_not_called()
+
+
+def test_rate_limited_category_keeps_counting(aggregator):
+    aggregator.add("updated", 1)
+    aggregator.flush()
+
+    aggregator.add("updated", 2)
+    aggregator.add("invalid", 3)
+    assert aggregator.flush() == "1 invalid in the last second"
+
+    aggregator.add("updated", 4)
+    aggregator.buckets["updated"].tokens = 1
+    assert aggregator.flush() == "2 shipments updated in the last second"
+
+
+def test_flush_writes_recent_events_to_the_drill_down_log(aggregator):
+    aggregator.log = MagicMock()
+    aggregator.add("invalid", {"status": "?"})
+    aggregator.flush()
+
+    aggregator.log.push.assert_called_once_with("bad: {'status': '?'}")
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() and bucket.take()
+    assert not bucket.take()
+
+    bucket.updated -= 0.1
+    assert bucket.take()
+
+
+def test_add_many_counts_all_events_at_once(aggregator):
+    aggregator.add_many("updated", [])
+    assert aggregator.flush() is None
+
+    aggregator.add_many("updated", ["a", "b", "c"])
+    aggregator.log = MagicMock()
+
+    assert aggregator.flush() == "3 shipments updated in the last second"
+    assert [call.args[0] for call in aggregator.log.push.call_args_list] == [
+        "a",
+        "b",
+        "c",
+    ]
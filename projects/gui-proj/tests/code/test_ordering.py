@@ -0,0 +1,59 @@
+import pytest
+
+from ordering import EventOrdering
+
+
+def event(timestamp, shipment_id="SHP-1"):
+    return {"shipment_id": shipment_id, "timestamp": timestamp}
+
+
+def test_accepts_newer_events():
+    ordering = EventOrdering()
+
+    assert ordering.accept(event("2023-01-01T12:00:00"), 0, 1)
+    assert ordering.accept(event("2023-01-01T12:05:00"), 0, 2)
+    assert ordering.accept(event("2023-01-01T12:00:00", "SHP-2"), 0, 3)
+    assert ordering.dropped == {"stale": 0, "duplicate": 0}
+
+
+def test_drops_stale_events():
+    ordering = EventOrdering()
+    ordering.accept(event("2023-01-01T12:05:00"), 0, 1)
+
+    # Produced earlier but read later
+    assert not ordering.accept(event("2023-01-01T12:00:00"), 0, 2)
+    assert ordering.dropped == {"stale": 1, "duplicate": 0}
+    assert ordering.versions["SHP-1"] == ("2023-01-01T12:05:00", 0, 1)
+
+
+@pytest.mark.parametrize(
+    "partition, offset, accepted",
+    [
+        (0, 5, False),  # Redelivered
+        (0, 4, False),  # Replayed from an earlier offset
+        (0, 6, True),
+        (1, 2, True),  # Moved partition, ordered by timestamp only
+    ],
+)
+def test_orders_same_timestamp_by_offset(partition, offset, accepted):
+    ordering = EventOrdering()
+    ordering.accept(event("2023-01-01T12:00:00"), 0, 5)
+
+    assert ordering.accept(event("2023-01-01T12:00:00"), partition, offset) is accepted
+    assert ordering.dropped["duplicate"] == (not accepted)
+
+
+def test_same_timestamp_without_offsets_is_a_duplicate():
+    ordering = EventOrdering()
+
+    assert ordering.accept(event("2023-01-01T12:00:00"))
+    assert not ordering.accept(event("2023-01-01T12:00:00"))
+    assert ordering.dropped == {"stale": 0, "duplicate": 1}
+
+
+def test_forget():
+    ordering = EventOrdering()
+    ordering.accept(event("2023-01-01T12:00:00"))
+    ordering.forget("SHP-1")
+
+    assert ordering.accept(event("2023-01-01T12:00:00"))
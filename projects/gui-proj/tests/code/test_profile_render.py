@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from profile_render import (
+    SCENARIOS,
+    RecordingUI,
+    RefreshCost,
+    growth,
+    json_size,
+    profile,
+    summarize,
+)
+
+
+def test_json_size_counts_arrays_as_lists_and_skips_callables():
+    assert json_size({"lat": np.array([1.5, 2.0])}) == len('{"lat":[1.5,2.0]}')
+    assert json_size({"handler": print}) == len('{"handler":null}')
+
+
+def test_recording_ui_counts_elements_and_messages():
+    ui = RecordingUI()
+    with ui.column() as column:
+        label = ui.label("SHP1 | In Transit")
+    ui.take()
+
+    label.set_text("SHP1 | Delivered")
+    label.classes("bold")
+    column.remove(label)
+
+    assert label.text == "SHP1 | Delivered"
+    elements, messages, sent = ui.take()
+    assert (elements, messages) == (0, 3)
+    assert sent > len("SHP1 | Delivered")
+    assert ui.take() == (0, 0, 0)
+
+
+def test_table_assignments_are_sent():
+    ui = RecordingUI()
+    table = ui.table(columns=[], rows=[])
+    ui.take()
+
+    table.rows = [{"shipment_id": "SHP1"}] * 10
+
+    assert ui.take()[2] >= 10 * json_size({"shipment_id": "SHP1"})
+
+
+def test_plotly_update_sends_the_whole_figure():
+    ui = RecordingUI()
+    figure = {"data": [{"lat": np.zeros(100)}]}
+    plot = ui.plotly(figure)
+    ui.take()
+
+    plot.update()
+
+    assert ui.take()[2] == json_size(figure)
+    assert ui.figure_bytes == json_size(figure)
+
+
+def test_growth_flags_what_scales_with_the_fleet():
+    small = {"batch": {"elements": 0, "bytes": 7000}}
+    large = {"batch": {"elements": 100, "bytes": 700000}}
+
+    assert growth(small, large) == {"batch": {"elements": 100, "bytes": 100}}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("view", ["grid", "rows"])
+async def test_profile_runs_every_scenario_headless(view):
+    costs = await profile(200, view=view, refreshes=2, batch_size=50)
+
+    summary = summarize(costs)
+    assert list(summary) == list(SCENARIOS)
+    assert all(isinstance(cost, RefreshCost) for cost in costs)
+    assert summary["initial"]["bytes"] > 0
+    assert summary["batch"]["figure_bytes"] > 0
+    if view == "rows":
+        assert summary["initial"]["elements"] == 200
+    else:
+        assert summary["initial"]["elements"] == 0
@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+import pytest
+
+from refresh import RefreshScheduler
+
+
+class Renderer:
+    """Count renders and take a fixed time for each."""
+
+    def __init__(self, cost_s=0.0):
+        self.cost_s = cost_s
+        self.times = []
+
+    async def __call__(self):
+        self.times.append(time.monotonic())
+        await asyncio.sleep(self.cost_s)
+
+
+@pytest.mark.asyncio
+async def test_first_request_renders_on_the_leading_edge():
+    render = Renderer()
+    scheduler = RefreshScheduler(render, min_interval=0.5, max_wait=1.0)
+    requested = time.monotonic()
+
+    await scheduler.request()
+
+    assert len(render.times) == 1
+    assert render.times[0] - requested < 0.05
+
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced_into_one_trailing_render():
+    render = Renderer()
+    scheduler = RefreshScheduler(render, min_interval=0.05, max_wait=1.0)
+    await scheduler.request()
+
+    for _ in range(20):
+        task = scheduler.request()
+        await asyncio.sleep(0.001)
+    await task
+
+    assert len(render.times) == 2
+    assert scheduler.requests == 21
+
+
+@pytest.mark.asyncio
+async def test_steady_stream_does_not_starve_the_refresh():
+    render = Renderer()
+    scheduler = RefreshScheduler(render, min_interval=0.02, max_wait=0.1)
+    started = time.monotonic()
+
+    while time.monotonic() - started < 0.5:
+        scheduler.request()
+        await asyncio.sleep(0.005)
+    await scheduler.task
+
+    # Rendered regularly, at most max_wait apart, not once at the end
+    gaps = [b - a for a, b in zip(render.times, render.times[1:])]
+    assert len(render.times) >= 4
+    assert max(gaps) < 0.1 + 0.05
+    assert scheduler.renders < scheduler.requests / 4
+
+
+@pytest.mark.asyncio
+async def test_interval_follows_render_cost():
+    render = Renderer(cost_s=0.05)
+    scheduler = RefreshScheduler(
+        render, min_interval=0.01, max_wait=2.0, render_share=0.25
+    )
+
+    await scheduler.request()
+
+    assert scheduler.interval == pytest.approx(0.2, rel=0.3)
+    scheduler.request()
+    assert scheduler.due() - time.monotonic() > 0.1
+    scheduler.cancel()
+
+
+@pytest.mark.asyncio
+async def test_immediate_request_skips_the_wait_and_shares_the_task():
+    render = Renderer()
+    scheduler = RefreshScheduler(render, min_interval=0.5, max_wait=1.0)
+    await scheduler.request()
+
+    pending = scheduler.request()
+    assert scheduler.request(immediate=True) is pending
+    started = time.monotonic()
+    await pending
+
+    assert len(render.times) == 2
+    assert render.times[1] - started < 0.05
+
+
+@pytest.mark.asyncio
+async def test_failed_render_is_logged_and_later_requests_still_render():
+    calls = []
+
+    async def render():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    scheduler = RefreshScheduler(render, min_interval=0.01)
+    await scheduler.request()
+    await scheduler.request(immediate=True)
+
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancel_drops_pending_requests():
+    render = Renderer()
+    scheduler = RefreshScheduler(render, min_interval=0.5)
+    await scheduler.request()
+    task = scheduler.request()
+
+    scheduler.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert scheduler.due() is None
+    assert len(render.times) == 1
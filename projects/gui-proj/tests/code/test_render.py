@@ -0,0 +1,75 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from render import RenderPool
+from rows import ShipmentRows
+from store import ShipmentStore
+
+
+def shipment(shipment_id, status="In Transit"):
+    return {"shipment_id": shipment_id, "status": status, "location": "NY"}
+
+
+@pytest.fixture
+def store():
+    store = ShipmentStore()
+    store.update({n: shipment(n) for n in range(5)})
+    return store
+
+
+@pytest.mark.asyncio
+async def test_rows_are_formatted_on_a_worker_thread(store):
+    threads = set()
+
+    def format_row(shipment):
+        threads.add(threading.current_thread().name)
+        return str(shipment["shipment_id"])
+
+    pool = RenderPool(1)
+    rows = ShipmentRows(MagicMock(), format_row)
+    with patch("rows.ui"):
+        assert await pool.render(rows, store, "All", "") == 5
+    pool.shutdown()
+
+    assert len(rows.labels) == 5
+    assert all(name.startswith("render") for name in threads)
+
+
+@pytest.mark.asyncio
+async def test_inline_pool_prepares_on_the_event_loop(store):
+    threads = set()
+
+    def format_row(shipment):
+        threads.add(threading.current_thread())
+        return str(shipment["shipment_id"])
+
+    rows = ShipmentRows(MagicMock(), format_row)
+    with patch("rows.ui"):
+        await RenderPool(0).render(rows, store, "All", "")
+
+    assert threads == {threading.current_thread()}
+
+
+def test_snapshot_is_not_affected_by_later_store_changes(store):
+    rows = ShipmentRows(MagicMock(), lambda s: s["status"])
+    job = rows.snapshot(store, "All", "")
+    store[0] = shipment(0, "Delivered")
+    del store[1]
+
+    _, prepared = rows.prepare(job)
+
+    assert prepared[0] == "In Transit"
+    assert prepared[1] == "In Transit"
+
+
+def test_payload_prepared_before_invalidation_is_dropped(store):
+    rows = ShipmentRows(MagicMock(), lambda s: str(s["shipment_id"]))
+    payload = rows.prepare(rows.snapshot(store, "All", ""))
+
+    rows.invalidate()
+    with patch("rows.ui"):
+        assert rows.apply(payload) == 0
+        assert rows.labels == {}
+        assert rows.render(store, "All", "") == 5
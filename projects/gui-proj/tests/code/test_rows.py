@@ -0,0 +1,115 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from rows import ShipmentRows
+from store import ShipmentStore
+
+
+def format_row(shipment):
+    return f"{shipment['shipment_id']} | {shipment['status']}"
+
+
+def make_store(shipments):
+    store = ShipmentStore()
+    store.update(shipments)
+    return store
+
+
+@pytest.fixture
+def mock_ui():
+    with patch("rows.ui") as mock_ui:
+        mock_ui.label.side_effect = lambda text: MagicMock(text=text)
+        yield mock_ui
+
+
+def test_render_inserts_matching_rows(mock_ui):
+    shipments = make_store(
+        {
+            "A": {"shipment_id": "A", "status": "In Transit"},
+            "B": {"shipment_id": "B", "status": "Delivered"},
+        }
+    )
+    rows = ShipmentRows(MagicMock(), format_row)
+
+    assert rows.render(shipments, "In Transit", "") == 1
+    mock_ui.label.assert_called_once_with("A | In Transit")
+    assert set(rows.labels) == {"A"}
+
+
+def test_render_only_touches_changed_rows(mock_ui):
+    shipments = make_store(
+        {
+            shipment_id: {"shipment_id": shipment_id, "status": "In Transit"}
+            for shipment_id in ("A", "B", "C")
+        }
+    )
+    rows = ShipmentRows(MagicMock(), format_row)
+    rows.render(shipments, "In Transit", "")
+    mock_ui.label.reset_mock()
+
+    # Nothing changed, nothing is rendered
+    assert rows.render(shipments, "In Transit", "") == 0
+
+    shipments["D"] = {"shipment_id": "D", "status": "In Transit"}
+    shipments["B"] = {"shipment_id": "B", "status": "Delivered"}
+    rows.mark_changed(["B", "D"])
+    label_b = rows.labels["B"]
+
+    assert rows.render(shipments, "In Transit", "") == 2
+    mock_ui.label.assert_called_once_with("D | In Transit")
+    rows.container.remove.assert_called_once_with(label_b)
+    assert set(rows.labels) == {"A", "C", "D"}
+
+
+def test_render_patches_changed_text(mock_ui):
+    shipments = make_store(
+        {"A": {"shipment_id": "A", "status": "In Transit", "location": "NY"}}
+    )
+    rows = ShipmentRows(MagicMock(), lambda s: f"{s['shipment_id']} | {s['location']}")
+    rows.render(shipments, "In Transit", "")
+
+    shipments["A"] = {"shipment_id": "A", "status": "In Transit", "location": "NJ"}
+    rows.mark_changed(["A"])
+    rows.render(shipments, "In Transit", "")
+
+    rows.labels["A"].set_text.assert_called_once_with("A | NJ")
+    assert mock_ui.label.call_count == 1
+
+
+def test_invalidate_rechecks_every_row(mock_ui):
+    shipments = make_store(
+        {
+            "A": {"shipment_id": "A", "status": "In Transit"},
+            "B": {"shipment_id": "B", "status": "Delivered"},
+        }
+    )
+    rows = ShipmentRows(MagicMock(), format_row)
+    rows.render(shipments, "All", "")
+
+    rows.invalidate()
+    assert rows.render(shipments, "In Transit", "") == 1
+    assert set(rows.labels) == {"A"}
+
+
+@pytest.mark.asyncio
+async def test_stream_shows_exactly_the_matching_rows_in_chunks():
+    container = MagicMock()
+    store = ShipmentStore()
+    store.update(
+        {
+            n: {"shipment_id": n, "status": "In Transit", "location": "NY"}
+            for n in range(10)
+        }
+    )
+    rows = ShipmentRows(container, lambda s: str(s["shipment_id"]))
+    with patch("rows.ui"):
+        rows.render(store, "All", "")
+        rows.labels[1].text = "1"
+
+        with patch("rows.ShipmentRows.patch", wraps=rows.patch) as mock_patch:
+            patched = await rows.stream(store, "All", "1", {1: None}, chunk_size=3)
+
+    assert set(rows.labels) == {1}
+    assert patched == 9
+    assert mock_patch.call_count == 4
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from decoding import ShipmentEvent
+from search import SearchPipeline
+from store import ShipmentStore
+
+
+def event(shipment_id, status="In Transit"):
+    return ShipmentEvent(shipment_id, status, "NY", "2023-01-01")
+
+
+@pytest.fixture
+def store():
+    store = ShipmentStore()
+    store.update(
+        {
+            f"SHP-{n}": event(f"SHP-{n}", "Delivered" if n % 2 else "In Transit")
+            for n in range(1000)
+        }
+    )
+    return store
+
+
+@pytest.mark.asyncio
+async def test_extended_term_refines_the_previous_result(store):
+    search = SearchPipeline(chunk_size=7)
+
+    first = await search.query(store, "All", "SHP-1")
+    second = await search.query(store, "All", "SHP-12")
+
+    assert (search.searched, search.refined) == (1, 1)
+    assert set(second) == set(store.select("All", "SHP-12"))
+    assert set(second) < set(first)
+
+
+@pytest.mark.asyncio
+async def test_other_term_or_status_searches_the_store(store):
+    search = SearchPipeline()
+    await search.query(store, "All", "SHP-12")
+
+    assert set(await search.query(store, "All", "SHP-3")) == set(
+        store.select("All", "SHP-3")
+    )
+    assert set(await search.query(store, "Delivered", "SHP-3")) == set(
+        store.select("Delivered", "SHP-3")
+    )
+    assert (search.searched, search.refined) == (3, 0)
+
+
+@pytest.mark.asyncio
+async def test_changes_keep_the_result_current(store):
+    search = SearchPipeline()
+    await search.query(store, "In Transit", "SHP-1")
+    store["SHP-10"] = moved = event("SHP-10", "Delivered")
+    store["SHP-1000"] = added = event("SHP-1000")
+
+    search.mark_changed({"SHP-10": moved, "SHP-1000": added}, "In Transit", "SHP-1")
+    result = await search.query(store, "In Transit", "SHP-10")
+
+    assert search.refined == 1
+    assert "SHP-10" not in result
+    assert "SHP-1000" in result
+    assert set(result) == set(store.select("In Transit", "SHP-10"))
+
+
+@pytest.mark.asyncio
+async def test_changes_during_refinement_are_applied(store):
+    search = SearchPipeline(chunk_size=10)
+    await search.query(store, "All", "SHP")
+    refining = asyncio.create_task(search.query(store, "All", "SHP-9"))
+    await asyncio.sleep(0)
+
+    store["SHP-9999"] = added = event("SHP-9999")
+    search.mark_changed({"SHP-9999": added}, "All", "SHP")
+    result = await refining
+
+    assert "SHP-9999" in result
+
+
+@pytest.mark.asyncio
+async def test_changes_under_other_filters_drop_the_result(store):
+    search = SearchPipeline()
+    await search.query(store, "All", "SHP-1")
+
+    search.mark_changed({}, "Delivered", "SHP-1")
+    await search.query(store, "All", "SHP-12")
+
+    assert (search.searched, search.refined) == (2, 0)
+
+
+@pytest.mark.asyncio
+async def test_submit_debounces_and_cancels_superseded_queries():
+    search = SearchPipeline(delay_s=0.01)
+    seen = []
+
+    async def run(term):
+        seen.append(term)
+
+    for term in ("S", "SH", "SHP"):
+        task = search.submit(term, run)
+    await task
+
+    assert seen == ["SHP"]
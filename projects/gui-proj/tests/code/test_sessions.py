@@ -0,0 +1,117 @@
+from unittest.mock import MagicMock
+
+from decoding import ShipmentEvent
+from sessions import Session, SessionHub
+from store import ShipmentStore
+
+
+def make_session(status="All", term=""):
+    session = Session(MagicMock(), MagicMock(), MagicMock())
+    session.status = status
+    session.term = term
+    return session
+
+
+def publish(hub, store, *events, invalid=(), notify=True):
+    updates = {event["shipment_id"]: event for event in events}
+    previous = {shipment_id: store.get(shipment_id) for shipment_id in updates}
+    store.update(updates)
+    return hub.publish(store, updates, previous, invalid, notify)
+
+
+def test_publish_marks_only_matching_sessions():
+    hub = SessionHub()
+    everything = make_session()
+    in_transit = make_session("In Transit")
+    delivered = make_session("Delivered")
+    searching = make_session("In Transit", "SHP-2")
+    for session in (everything, in_transit, delivered, searching):
+        hub.add(session)
+    event = ShipmentEvent("SHP-1", "In Transit", "NY", "2023-01-01")
+
+    affected = publish(hub, ShipmentStore(), event)
+
+    assert set(affected) == {everything, in_transit, searching}
+    in_transit.view.mark_changed.assert_called_once_with({"SHP-1": event})
+    delivered.view.mark_changed.assert_called_once_with({})
+    # The map is not searched, the list is
+    searching.map.mark_changed.assert_called_once_with({"SHP-1": event})
+    searching.view.mark_changed.assert_called_once_with({})
+    assert list(in_transit.notifications.add_many.call_args.args[1]) == [event]
+    assert list(delivered.notifications.add_many.call_args.args[1]) == []
+
+
+def test_publish_refreshes_sessions_a_shipment_leaves():
+    hub = SessionHub()
+    in_transit = make_session("In Transit")
+    hub.add(in_transit)
+    store = ShipmentStore()
+    publish(hub, store, ShipmentEvent("SHP-1", "In Transit", "NY", "2023-01-01"))
+    delivered = ShipmentEvent("SHP-1", "Delivered", "LA", "2023-01-02")
+
+    affected = publish(hub, store, delivered)
+
+    assert affected == [in_transit]
+    in_transit.view.mark_changed.assert_called_with({"SHP-1": delivered})
+
+
+def test_publish_refreshes_sessions_a_shipment_is_deleted_from():
+    hub = SessionHub()
+    in_transit = make_session("In Transit")
+    delivered = make_session("Delivered")
+    hub.add(in_transit)
+    hub.add(delivered)
+    store = ShipmentStore()
+    publish(hub, store, ShipmentEvent("SHP-1", "In Transit", "NY", "2023-01-01"))
+    previous = {"SHP-1": store["SHP-1"]}
+    store.update({"SHP-1": None})
+
+    affected = hub.publish(store, {"SHP-1": None}, previous)
+
+    assert affected == [in_transit]
+    in_transit.view.mark_changed.assert_called_with({"SHP-1": None})
+    in_transit.notifications.add_many.assert_called_with("updated", [])
+
+
+def test_publish_counts_invalid_events_everywhere_unless_quiet():
+    hub = SessionHub()
+    delivered = make_session("Delivered")
+    hub.add(delivered)
+
+    assert publish(hub, ShipmentStore(), invalid=["bad"]) == []
+    delivered.notifications.add_many.assert_any_call("invalid", ["bad"])
+
+    delivered.notifications.reset_mock()
+    publish(
+        hub,
+        ShipmentStore(),
+        ShipmentEvent("SHP-1", "Delivered", "LA", "2023-01-02"),
+        invalid=["bad"],
+        notify=False,
+    )
+    delivered.notifications.add_many.assert_not_called()
+
+
+def test_publish_updates_the_shared_spatial_index_once():
+    spatial = MagicMock()
+    hub = SessionHub(spatial)
+    hub.add(make_session())
+    hub.add(make_session())
+    store = ShipmentStore()
+
+    publish(hub, store, ShipmentEvent("SHP-1", "In Transit", "NY", "2023-01-01"))
+
+    spatial.update.assert_called_once()
+
+
+def test_removed_session_is_closed_and_skipped():
+    hub = SessionHub()
+    session = make_session()
+    session.refresh = MagicMock()
+    hub.add(session)
+
+    hub.remove(session)
+
+    session.refresh.cancel.assert_called_once()
+    assert publish(hub, ShipmentStore(), ShipmentEvent("SHP-1", "x", "y", "z")) == []
+    session.view.mark_changed.assert_not_called()
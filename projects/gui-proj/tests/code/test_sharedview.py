@@ -0,0 +1,70 @@
+import pytest
+
+from decoding import ShipmentEvent
+from sharedview import SharedView
+
+OFFSETS = {("shipment_updates", 0): 10, ("shipment_updates", 1): 4}
+
+
+def event(shipment_id, status="In Transit", timestamp="2023-01-01T12:00:00"):
+    return ShipmentEvent(shipment_id, status, "NY", timestamp, 40.7, -74.0, mode="air")
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "shipments.db")
+
+
+def test_readers_see_each_change_once(path):
+    writer = SharedView(path)
+    replicas = [SharedView(path), SharedView(path)]
+
+    writer.write({"SHP-1": event("SHP-1"), 2: event(2)}, OFFSETS)
+    for replica in replicas:
+        assert replica.changes() == {"SHP-1": event("SHP-1"), 2: event(2)}
+        assert replica.changes() == {}
+
+    writer.write({2: event(2, "Delivered")}, {("shipment_updates", 1): 5})
+    for replica in replicas:
+        assert replica.changes() == {2: event(2, "Delivered")}
+
+    late_replica = SharedView(path)
+    assert late_replica.changes() == {
+        "SHP-1": event("SHP-1"),
+        2: event(2, "Delivered"),
+    }
+    assert late_replica.offsets() == {**OFFSETS, ("shipment_updates", 1): 5}
+
+
+def test_deletes_reach_the_readers(path):
+    writer = SharedView(path)
+    replica = SharedView(path)
+    writer.write({"SHP-1": event("SHP-1"), 2: event(2)}, OFFSETS)
+    replica.changes()
+
+    writer.write({"SHP-1": None}, OFFSETS)
+    assert replica.changes() == {"SHP-1": None}
+    assert SharedView(path).changes() == {"SHP-1": None, 2: event(2)}
+
+
+def test_view_survives_reopening(path):
+    view = SharedView(path)
+    view.write({"SHP-1": event("SHP-1")}, OFFSETS)
+    view.close()
+
+    reopened = SharedView(path)
+    assert reopened.offsets() == OFFSETS
+    assert reopened.changes() == {"SHP-1": event("SHP-1")}
+
+
+@pytest.mark.asyncio
+async def test_follow_yields_written_changes(path):
+    writer = SharedView(path)
+    follower = SharedView(path).follow(interval_s=0.01)
+
+    writer.write({"SHP-1": event("SHP-1")}, {})
+    assert await anext(follower) == {"SHP-1": event("SHP-1")}
+
+    writer.write({"SHP-2": event("SHP-2")}, {})
+    assert await anext(follower) == {"SHP-2": event("SHP-2")}
+    await follower.aclose()
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import time
+
+import pytest
+from kafka import TopicPartition
+
+from decoding import ShipmentEvent, make_decoder
+from ingest import ConsumerThread
+from simulate import HUBS, FakeConsumer, ShipmentSimulator
+
+
+def test_simulator_is_reproducible():
+    assert ShipmentSimulator(50, seed=3).messages(200) == ShipmentSimulator(
+        50, seed=3
+    ).messages(200)
+    assert ShipmentSimulator(50, seed=3).messages(200) != ShipmentSimulator(
+        50, seed=4
+    ).messages(200)
+
+
+def test_initial_events_place_every_shipment_at_a_hub():
+    events = list(ShipmentSimulator(100).initial())
+
+    assert len({event["shipment_id"] for event in events}) == 100
+    for event in events:
+        assert event["status"] == "In Transit"
+        assert (event["latitude"], event["longitude"]) == pytest.approx(
+            HUBS[event["location"]]
+        )
+        assert (event["destination_lat"], event["destination_lon"]) != HUBS[
+            event["location"]
+        ]
+
+
+def test_events_move_shipments_forward_in_time():
+    simulator = ShipmentSimulator(20, burst_share=0.0)
+    last = {event["shipment_id"]: event["timestamp"] for event in simulator.initial()}
+
+    statuses = set()
+    for event in simulator.events(2000):
+        assert event["timestamp"] > last[event["shipment_id"]]
+        last[event["shipment_id"]] = event["timestamp"]
+        statuses.add(event["status"])
+
+    assert statuses == {"In Transit", "Out for Delivery", "Delivered"}
+
+
+def test_bursts_update_consecutive_shipments_at_once():
+    simulator = ShipmentSimulator(100, burst_share=1.0, burst_size=10)
+
+    events = list(simulator.events(25))
+
+    assert len(events) == 25
+    assert len({event["timestamp"] for event in events[:10]}) == 1
+    first = int(events[0]["shipment_id"][3:])
+    assert [event["shipment_id"] for event in events[:10]] == [
+        f"SHP{(first + n) % 100:07d}" for n in range(10)
+    ]
+
+
+def test_messages_decode_into_shipment_events():
+    ((key, value),) = ShipmentSimulator(1).messages()
+
+    event = make_decoder("json")(value)
+
+    assert isinstance(event, ShipmentEvent)
+    assert key == event.shipment_id.encode()
+    assert json.loads(value)["mode"] == event.mode
+
+
+def test_fake_consumer_keeps_each_shipment_on_one_partition():
+    consumer = FakeConsumer(ShipmentSimulator(30).messages(300), partitions=3)
+
+    polled = consumer.poll(max_records=1000)
+
+    assert sum(map(len, polled.values())) == 300
+    for partition, records in polled.items():
+        assert [record.offset for record in records] == list(range(len(records)))
+        assert consumer.highwater(partition) == len(records)
+    owners = {}
+    for partition, records in polled.items():
+        for record in records:
+            assert owners.setdefault(record.key, partition) == partition
+    assert consumer.poll() == {}
+
+
+def test_fake_consumer_polls_decoded_records_in_order():
+    messages = ShipmentSimulator(10).messages(50)
+    consumer = FakeConsumer(messages, make_decoder("json"))
+
+    first = consumer.poll(max_records=20)
+    rest = list(consumer)
+
+    (records,) = first.values()
+    assert len(records) == 20
+    assert all(isinstance(record.value, ShipmentEvent) for record in records)
+    assert [record.offset for record in rest] == list(range(20, 50))
+
+
+def test_fake_consumer_throttles_to_its_rate():
+    consumer = FakeConsumer(ShipmentSimulator(10).messages(1000), rate=200)
+
+    started = time.monotonic()
+    count = sum(len(records) for records in consumer.poll(timeout_ms=10).values())
+    time.sleep(0.1)
+    count += sum(len(records) for records in consumer.poll().values())
+
+    assert count <= (time.monotonic() - started) * 200 + 1
+    assert count >= 10
+
+
+def test_fake_consumer_seeks_and_reports_topic_partitions():
+    consumer = FakeConsumer(ShipmentSimulator(10).messages(40), partitions=2)
+    partition = TopicPartition(consumer.topic, 0)
+
+    consumer.seek(partition, consumer.highwater(partition))
+
+    assert consumer.partitions_for_topic(consumer.topic) == {0, 1}
+    assert consumer.partitions_for_topic("other") == set()
+    assert set(consumer.poll(max_records=100)) == {TopicPartition(consumer.topic, 1)}
+    assert consumer.delivered == consumer.total
+
+
+@pytest.mark.asyncio
+async def test_fake_consumer_drives_the_consumer_thread():
+    consumer = FakeConsumer(
+        ShipmentSimulator(20).messages(120), make_decoder("json"), partitions=2
+    )
+    thread = ConsumerThread(
+        consumer, asyncio.get_running_loop(), max_records=50, linger_ms=0
+    )
+    thread.start()
+
+    received = 0
+    async for batch in thread.batches():
+        received += len(batch)
+        if received == consumer.total:
+            break
+    thread.stop()
+    await asyncio.to_thread(thread.join)
+
+    assert received == 120
+    assert set(thread.lag.values()) == {0}
@@ -0,0 +1,157 @@
+import pickle
+from unittest.mock import MagicMock
+
+import pytest
+from kafka import TopicPartition
+
+from decoding import ShipmentEvent
+from snapshot import (
+    SNAPSHOT_VERSION,
+    Checkpointer,
+    read_snapshot,
+    seek_to_offsets,
+    write_snapshot,
+)
+
+OFFSETS = {("shipment_updates", 0): 42, ("shipment_updates", 2): 7}
+
+
+def event(shipment_id, status="In Transit"):
+    return ShipmentEvent(
+        shipment_id, status, "NY", "2023-01-01T12:00:00", 40.7, -74.0, eta_hours=1.5
+    )
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "shipments.snapshot")
+
+
+def test_snapshot_round_trip(path):
+    shipments = [
+        event("SHP-1"),
+        event(2, "Delivered"),
+        {
+            "shipment_id": "SHP-3",
+            "status": "In Transit",
+            "location": "LA",
+            "timestamp": "t",
+        },
+    ]
+
+    write_snapshot(path, shipments, OFFSETS)
+    restored, offsets = read_snapshot(path)
+
+    assert restored == [
+        event("SHP-1"),
+        event(2, "Delivered"),
+        ShipmentEvent("SHP-3", "In Transit", "LA", "t"),
+    ]
+    assert offsets == OFFSETS
+
+
+def test_read_snapshot_maps_changed_fields(path):
+    with open(path, "wb") as f:
+        pickle.dump(
+            {
+                "version": SNAPSHOT_VERSION,
+                "fields": ("status", "shipment_id", "retired", "location", "timestamp"),
+                "rows": [("Delivered", "SHP-1", "x", "NY", "t")],
+                "offsets": {},
+            },
+            f,
+        )
+
+    restored, _ = read_snapshot(path)
+
+    assert restored == [ShipmentEvent("SHP-1", "Delivered", "NY", "t")]
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        None,
+        b"not a snapshot",
+        pickle.dumps({"version": SNAPSHOT_VERSION + 1}),
+    ],
+)
+def test_read_snapshot_ignores_missing_and_unusable_files(path, content):
+    if content is not None:
+        with open(path, "wb") as f:
+            f.write(content)
+
+    assert read_snapshot(path) is None
+
+
+def test_seek_to_offsets():
+    consumer = MagicMock()
+    consumer.partitions_for_topic.return_value = {2, 0, 1}
+
+    seek_to_offsets(consumer, "shipment_updates", OFFSETS)
+
+    consumer.assign.assert_called_once_with(
+        [TopicPartition("shipment_updates", partition) for partition in (0, 1, 2)]
+    )
+    assert consumer.seek.call_args_list == [
+        ((TopicPartition("shipment_updates", 0), 42),),
+        ((TopicPartition("shipment_updates", 2), 7),),
+    ]
+
+
+def test_position_without_snapshot_subscribes(path):
+    consumer = MagicMock()
+    checkpointer = Checkpointer(path)
+
+    assert checkpointer.load() == []
+    checkpointer.position(consumer, "shipment_updates")
+    consumer.subscribe.assert_called_once_with(["shipment_updates"])
+    consumer.assign.assert_not_called()
+
+
+def test_checkpointer_resumes_where_it_saved(path):
+    checkpointer = Checkpointer(path)
+    checkpointer.track(
+        [
+            MagicMock(topic="shipment_updates", partition=0, offset=40),
+            MagicMock(topic="shipment_updates", partition=2, offset=6),
+            MagicMock(topic="shipment_updates", partition=0, offset=41),
+        ]
+    )
+    checkpointer.save({"SHP-1": event("SHP-1")})
+
+    consumer = MagicMock()
+    consumer.partitions_for_topic.return_value = {0, 2}
+    restarted = Checkpointer(path)
+
+    assert restarted.load() == [event("SHP-1")]
+    assert restarted.offsets == OFFSETS
+    restarted.position(consumer, "shipment_updates")
+    consumer.subscribe.assert_not_called()
+    assert consumer.seek.call_count == 2
+
+
+def test_checkpointer_stores_held_back_offsets(path):
+    checkpointer = Checkpointer(
+        path, hold_back=lambda offsets: {key: 1 for key in offsets}
+    )
+    checkpointer.track([MagicMock(topic="shipment_updates", partition=0, offset=40)])
+
+    checkpointer.save({})
+
+    assert read_snapshot(path)[1] == {("shipment_updates", 0): 1}
+    assert checkpointer.offsets == {("shipment_updates", 0): 41}
+
+
+@pytest.mark.asyncio
+async def test_maybe_save_writes_in_the_background_when_due(path):
+    checkpointer = Checkpointer(path, interval_s=60)
+    shipments = {"SHP-1": event("SHP-1")}
+
+    assert checkpointer.maybe_save(shipments) is None
+
+    checkpointer.saved_at -= 60
+    saving = checkpointer.maybe_save(shipments)
+    assert checkpointer.maybe_save(shipments) is None  # Already writing
+    await saving
+
+    assert read_snapshot(path)[0] == [event("SHP-1")]
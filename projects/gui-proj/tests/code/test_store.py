@@ -0,0 +1,161 @@
+import json
+import tracemalloc
+
+import pytest
+
+from constants import STATUS_OPTIONS
+from decoding import JsonDecoder
+from eta import EtaEngine
+from store import ShipmentStore
+
+
+def shipment(shipment_id, status="In Transit"):
+    return {"shipment_id": shipment_id, "status": status}
+
+
+@pytest.fixture
+def store():
+    store = ShipmentStore()
+    store.update(
+        {
+            "SHP-1001": shipment("SHP-1001"),
+            "SHP-1002": shipment("SHP-1002", "Delivered"),
+            "SHP-2001": shipment("SHP-2001"),
+            "XYZ-1001": shipment("XYZ-1001", "Out for Delivery"),
+        }
+    )
+    return store
+
+
+def test_store_reads_like_a_dict(store):
+    assert len(store) == 4
+    assert store["SHP-1002"]["status"] == "Delivered"
+    assert "XYZ-1001" in store
+    assert store.get("missing") is None
+    assert list(store) == ["SHP-1001", "SHP-1002", "SHP-2001", "XYZ-1001"]
+
+
+@pytest.mark.parametrize(
+    "status, term, expected_ids",
+    [
+        ("All", "", {"SHP-1001", "SHP-1002", "SHP-2001", "XYZ-1001"}),
+        ("In Transit", "", {"SHP-1001", "SHP-2001"}),
+        ("All", "1", {"SHP-1001", "SHP-1002", "SHP-2001", "XYZ-1001"}),
+        ("All", "100", {"SHP-1001", "SHP-1002", "XYZ-1001"}),
+        ("All", "-1001", {"SHP-1001", "XYZ-1001"}),
+        ("In Transit", "1001", {"SHP-1001"}),
+        ("All", "SHP-3", set()),
+        ("Unknown", "", set()),
+    ],
+)
+def test_select(store, status, term, expected_ids):
+    assert set(store.select(status, term)) == expected_ids
+    assert expected_ids == {
+        shipment_id
+        for shipment_id, shipment in store.items()
+        if ShipmentStore.matches(shipment, status, term)
+    }
+
+
+def test_upsert_moves_shipment_between_statuses(store):
+    store["SHP-1001"] = shipment("SHP-1001", "Delivered")
+
+    assert store.select("In Transit") == ["SHP-2001"]
+    assert set(store.select("Delivered")) == {"SHP-1001", "SHP-1002"}
+
+
+def test_delete_removes_shipment_from_indexes(store):
+    del store["XYZ-1001"]
+
+    assert store.select("Out for Delivery") == []
+    assert store.search("XYZ") == []
+    assert store.search("1001") == ["SHP-1001"]
+
+
+def test_deleted_shipments_can_come_back(store):
+    del store["SHP-1001"]
+    store["SHP-1001"] = shipment("SHP-1001", "Delivered")
+
+    assert store.search("1001") == ["SHP-1001", "XYZ-1001"]
+    assert store.search("1").count("SHP-1001") == 1
+
+
+def test_index_is_rebuilt_once_most_shipments_are_deleted(store):
+    store.update({"SHP-1001": None, "SHP-1002": None})
+    assert len(store._by_ngram["SHP"]) == 3  # Deletes are skipped lazily
+
+    del store["SHP-2001"]
+
+    assert "SHP" not in store._by_ngram
+    assert store.search("1") == ["XYZ-1001"]
+
+
+def test_update_removes_shipments_set_to_none(store):
+    store.update({"XYZ-1001": None, "SHP-1001": shipment("SHP-1001", "Delivered")})
+    store.update({"missing": None})
+
+    assert store.get("XYZ-1001") is None
+    assert store.select("Out for Delivery") == []
+    assert not ShipmentStore.matches(None)
+
+
+def test_search_handles_integer_ids():
+    store = ShipmentStore()
+    store.update({1: shipment(1), 12: shipment(12), 2: shipment(2)})
+
+    assert set(store.search("1")) == {1, 12}
+
+
+def test_memory_per_shipment():
+    # Decoded events, their store entries and cached ETAs must fit a
+    # fixed budget per shipment, e.g. under 1 GB for a million
+    count = 20_000
+    budget = 1024
+    decode = JsonDecoder()
+    payloads = [
+        json.dumps(
+            {
+                "shipment_id": f"SHP-{i:07d}",
+                "status": STATUS_OPTIONS[1 + i % 3],
+                "location": f"Hub {i % 50}",
+                "timestamp": "2023-01-01T12:00:00",
+                "latitude": i % 180 - 90 + 0.5,
+                "longitude": i % 360 - 180 + 0.5,
+            }
+        ).encode()
+        for i in range(count)
+    ]
+
+    tracemalloc.start()
+    try:
+        store = ShipmentStore()
+        eta_engine = EtaEngine()
+        for _ in range(2):  # Replacing shipments must not grow the store
+            updates = {}
+            for payload in payloads:
+                event = decode(payload)
+                updates[event.shipment_id] = event
+            eta_engine.annotate(updates.values())
+            store.update(updates)
+            del updates, event
+            used = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    assert len(store) == count
+    assert used / count < budget
+
+
+def test_upsert_shares_ids_and_interns_fields(store):
+    original_id = next(iter(store))
+    # Equal strings that are not the objects the store already holds;
+    # equal literals would be one shared constant
+    replacement = shipment(
+        "".join(["SHP-", "1001"]),  # noqa: FLY002
+        "".join(["Deliv", "ered"]),  # noqa: FLY002
+    )
+    store["SHP-1001"] = replacement
+
+    assert store["SHP-1001"] is replacement
+    assert replacement["shipment_id"] is original_id
+    assert replacement["status"] is store["SHP-1002"]["status"]
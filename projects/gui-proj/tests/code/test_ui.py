@@ -2,6 +2,11 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+import main
+import ui
+from rows import ShipmentRows
+from sessions import Session
+from store import ShipmentStore
 from ui import calculate_eta, update_shipment_list
 
 
@@ -10,11 +15,11 @@ from ui import calculate_eta, update_shipment_list
     [
         (
             {"latitude": "40.730610", "longitude": "-73.935242"},
-            "0.0 hours",  # Close to NYC
+            "0.1 hours",  # Close to NYC
         ),
         (
             {"latitude": "34.052235", "longitude": "-118.243683"},
-            "40.8 hours",  # Los Angeles
+            "65.6 hours",  # Los Angeles
         ),
         ({}, "Unknown ETA"),  # Missing data
     ],
@@ -26,50 +31,37 @@ def test_calculate_eta(shipment, expected_eta):
 @pytest.mark.asyncio
 async def test_update_shipment_list():
     mock_ui = MagicMock()
-    mock_ui.loading = MagicMock()
-    mock_ui.label = MagicMock()
     mock_shipment_table = MagicMock()
-    mock_shipments = {
-        1: {
-            "shipment_id": 1,
-            "status": "in_transit",
-            "location": "NY",
-            "timestamp": "2023-01-01",
-        },
-        2: {
-            "shipment_id": 2,
-            "status": "delivered",
-            "location": "CA",
-            "timestamp": "2023-01-02",
-        },
-    }
+    mock_shipments = ShipmentStore()
+    mock_shipments.update(
+        {
+            1: {
+                "shipment_id": 1,
+                "status": "in_transit",
+                "location": "NY",
+                "timestamp": "2023-01-01",
+            },
+            2: {
+                "shipment_id": 2,
+                "status": "delivered",
+                "location": "CA",
+                "timestamp": "2023-01-02",
+            },
+        }
+    )
+    shipment_view = ShipmentRows(mock_shipment_table, lambda s: str(s["shipment_id"]))
+    session = Session(shipment_view, MagicMock(), MagicMock())
 
     with (
-        patch("ui.ui", mock_ui),
-        patch("ui.shipment_table", mock_shipment_table),
-        patch("ui.shipments", mock_shipments),
-        patch("ui.selected_status", "All"),
-        patch("ui.calculate_eta", return_value="5.0 hours"),
+        patch("rows.ui", mock_ui),
+        patch("main.shipments", mock_shipments),
     ):
-        await update_shipment_list()
+        await update_shipment_list(session)
 
-    mock_shipment_table.clear.assert_called_once()
-    assert mock_ui.label.call_count == len(mock_shipments) + 1  # +1 for the header
+    mock_shipment_table.clear.assert_not_called()
+    assert mock_ui.label.call_count == len(mock_shipments)
 
 
-def test_ui_elements():
-    with patch("ui.ui") as mock_ui:
-        # Test label creation
-        mock_label = MagicMock()
-        mock_ui.label.return_value = mock_label
-        mock_label.classes.assert_called_with("text-2xl font-bold")
-
-        # Test select creation
-        mock_select = MagicMock()
-        mock_ui.select.return_value = mock_select
-        mock_select.on_change.assert_called()
-
-        # Test button creation
-        mock_button = MagicMock()
-        mock_ui.button.return_value = mock_button
-        mock_button.on_click.assert_called()
+def test_ui_shares_the_dashboard_state():
+    assert ui.eta_engine is main.eta_engine
+    assert ui.update_shipment_list is main.update_shipment_list